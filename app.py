@@ -1,11 +1,27 @@
+import time
+_import_start = time.perf_counter()
+
 import streamlit as st
 import json
 import os
+import sys
 from datetime import datetime, timedelta
 from PIL import Image
 import tempfile
-from src.FitIdentification import image_to_json, add_to_wardrobe
-from src.Wardrobe import OutfitSuggestionCrew
+from tools import telemetry, lazy_loader, llm_policy, prefetch, precompute
+from tools.item_slots import slot_of, SLOT_KEYS
+from tools.wear_index import get_wear_index
+from tools.analytics import get_analytics
+from tools.user_store import get_store
+from tools.json_store import read_versioned, write_json, update_json, WriteConflict, CorruptJSON
+from tools.db_manager import remove_item, update_item
+
+# The AI, weather and calendar layers (crewai, pyowm, mistralai, googleapiclient) are only
+# imported through lazy_loader when a feature needs them, keeping the first page load light.
+lazy_loader.record("app start-up imports", (time.perf_counter() - _import_start) * 1000)
+
+# Report import timings with `streamlit run app.py -- --import-report` or FITIFY_IMPORT_REPORT=1
+IMPORT_REPORT = "--import-report" in sys.argv or os.getenv("FITIFY_IMPORT_REPORT") == "1"
 
 # Page configuration
 st.set_page_config(
@@ -15,45 +31,138 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
+# Each user's data lives in its own shard, picked with ?user=<id>; without it the
+# original single-user files under data/ are used
+user_id = st.query_params.get("user") or None
+try:
+    store = get_store(user_id).ensure()
+except ValueError as e:
+    st.error(f"Error: {str(e)}")
+    st.stop()
+
+# Switching users in the same browser session must not carry the previous user's data over
+if st.session_state.get('user_id', user_id) != user_id:
+    st.session_state.clear()
+st.session_state.user_id = user_id
+
+# Initialize session state from the saved settings, so the page defaults and the prefetch
+# use the same preferred context as the nightly precompute
 if 'user_settings' not in st.session_state:
-    st.session_state.user_settings = {
-        'name': 'User',
-        'laundry_cycle_days': 7,
-        'location': 'Chicago, US',
-        'preferred_formality': 'Casual',
-        'preferred_activity': 'General'
-    }
+    st.session_state.user_settings = store.load_settings()
+
+def reload_wardrobe():
+    """Load the wardrobe from disk, remembering its version for save_wardrobe's conflict check"""
+    try:
+        wardrobe_data, version = read_versioned(store.wardrobe_path, default=lambda: {"items": []})
+    except CorruptJSON as e:
+        st.error(f"⚠️ Your wardrobe file was unreadable, so it was set aside at {e.moved_to}. Starting from an empty wardrobe.")
+        wardrobe_data, version = read_versioned(store.wardrobe_path, default=lambda: {"items": []})
+    st.session_state.wardrobe_items = wardrobe_data.get("items", [])
+    st.session_state.wardrobe_file_version = version
 
 if 'wardrobe_items' not in st.session_state:
+    reload_wardrobe()
+
+if 'outfit_history' not in st.session_state:
+    # Load the saved history so logging a new outfit appends to it instead of replacing it
     try:
-        with open("data/wardrobe.json", "r") as f:
-            wardrobe_data = json.load(f)
-            st.session_state.wardrobe_items = wardrobe_data["items"]
+        with open(store.history_path, "r") as f:
+            st.session_state.outfit_history = json.load(f)
     except FileNotFoundError:
-        st.session_state.wardrobe_items = []
+        st.session_state.outfit_history = []
 
-if 'outfit_history' not in st.session_state:
-    st.session_state.outfit_history = []
+if 'analytics_checked' not in st.session_state:
+    # Counters are maintained incrementally; this only rebuilds them if the files were edited by hand
+    get_analytics(store).ensure_consistent(st.session_state.wardrobe_items, st.session_state.outfit_history)
+    st.session_state.analytics_checked = True
 
 def save_user_settings():
     """Save user settings to a JSON file"""
-    with open("data/user_settings.json", "w") as f:
-        json.dump(st.session_state.user_settings, f, indent=2)
+    write_json(store.settings_path, st.session_state.user_settings)
 
 def load_user_settings():
     """Load user settings from JSON file"""
-    try:
-        with open("data/user_settings.json", "r") as f:
-            st.session_state.user_settings = json.load(f)
-    except FileNotFoundError:
-        pass
+    st.session_state.user_settings = store.load_settings()
 
 def save_wardrobe():
-    """Save wardrobe items to JSON file"""
+    """Save wardrobe items to JSON file, unless another session changed it since we loaded it.
+
+    Returns False (and reloads the latest wardrobe) on a conflict so the user can retry.
+    """
     wardrobe_data = {"items": st.session_state.wardrobe_items}
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(wardrobe_data, f, indent=2)
+    try:
+        st.session_state.wardrobe_file_version = write_json(
+            store.wardrobe_path, wardrobe_data, expected_version=st.session_state.get('wardrobe_file_version')
+        )
+        return True
+    except WriteConflict:
+        st.warning("⚠️ Your wardrobe was changed in another session. Reloaded the latest version, please try again.")
+        reload_wardrobe()
+        return False
+
+def new_outfit_crew():
+    """Create an outfit crew for the current wardrobe, importing the AI layer on first use"""
+    return outfit_crew_factory()()
+
+def outfit_crew_factory():
+    """Return a function building an outfit crew for the current wardrobe, safe to call off the script thread"""
+    wardrobe_items = st.session_state.wardrobe_items
+    calendar_ids = st.session_state.user_settings.get('calendar_ids')
+    user_store = store
+
+    def build():
+        wardrobe_module = lazy_loader.load("src.Wardrobe")
+        return wardrobe_module.OutfitSuggestionCrew(wardrobe_items, calendar_ids=calendar_ids, store=user_store)
+    return build
+
+def sync_prefetch(location, formality, activity):
+    """Generate the preferred-context suggestion in the background while the user looks at the page.
+
+    The prefetch is cancelled as soon as the user picks a different context.
+    """
+    settings = st.session_state.user_settings
+    preferred = (settings['location'], settings.get('preferred_formality', 'Casual'), settings.get('preferred_activity', 'General'))
+    current = st.session_state.get('prefetch')
+    if (location, formality, activity) != preferred:
+        if current is not None:
+            current.cancel()
+            st.session_state.prefetch = None
+        return
+
+    key = preferred + (st.session_state.get('wardrobe_file_version'),)
+    if current is not None and current.key == key and not current.expired():
+        return
+    if current is not None:
+        current.cancel()
+    if len(st.session_state.wardrobe_items) < 3:
+        return
+    build_crew = outfit_crew_factory()
+    st.session_state.prefetch = prefetch.start(
+        key, lambda cancelled: build_crew().prefetch_outfit(location, formality, activity, cancelled)
+    )
+
+def take_prefetched(location, formality, activity):
+    """The prefetched suggestion for this context, waiting for it if it is still running, or None.
+
+    Each prefetch is used once, so asking again generates a fresh outfit. The wait ends when the
+    suggestion deadline, counted from the prefetch's start, runs out; the prefetch is then cancelled.
+    """
+    current = st.session_state.get('prefetch')
+    key = (location, formality, activity, st.session_state.get('wardrobe_file_version'))
+    if current is None or current.key != key or current.consumed or current.expired():
+        return None
+    current.consumed = True
+    deadline = lazy_loader.load("src.Wardrobe").SUGGEST_DEADLINE_SECONDS
+    # A deadline of 0 means the pipeline waits for the LLM however long it takes, and so does this
+    remaining = max(deadline - (time.monotonic() - current.started_at), 0) if deadline else None
+    suggestion = current.result(timeout=remaining)
+    # A prefetch that fell back to local rules is worth retrying now that the user is waiting anyway
+    if not suggestion or suggestion.get('error') or suggestion.get('degraded'):
+        return None
+    # The prefetch only looked the overnight entry up; it is used up now that it is shown
+    if suggestion.get('precomputed') and not precompute.claim(store, suggestion['weather']['date']):
+        return None
+    return suggestion
 
 def add_clothing_item(uploaded_file):
     """Add a new clothing item to the wardrobe, enforcing a strict ID naming convention."""
@@ -66,7 +175,9 @@ def add_clothing_item(uploaded_file):
             
             # Process the image to get its properties
             with st.spinner("Analyzing clothing item..."):
-                item_data = image_to_json(tmp_path)
+                item_data = lazy_loader.load("src.FitIdentification").image_to_json(
+                    tmp_path, store, existing_ids={item['id'] for item in st.session_state.wardrobe_items}
+                )
 
             # Enforce the strict ID naming convention (top#, bottom#, shoe#)
             item_type = item_data.get('type', '').lower()
@@ -83,26 +194,29 @@ def add_clothing_item(uploaded_file):
                 os.unlink(tmp_path) # Clean up temp file
                 return False
 
-            # Find the highest number for the given prefix to determine the next ID
-            max_num = 0
-            for item in st.session_state.wardrobe_items:
-                if item['id'].startswith(prefix):
-                    try:
-                        # Extract number from IDs like "top1", "shoe12"
-                        num = int(item['id'][len(prefix):])
-                        if num > max_num:
-                            max_num = num
-                    except (ValueError, IndexError):
-                        # Ignore malformed IDs
-                        continue
-            
-            # Set the new, standardized ID
-            new_id = f"{prefix}{max_num + 1}"
-            item_data['id'] = new_id
-            
+            def assign_id_and_add(wardrobe_data):
+                # Find the highest number for the given prefix to determine the next ID.
+                # This runs under the file lock, so two sessions can't hand out the same ID.
+                max_num = 0
+                for item in wardrobe_data["items"]:
+                    if item['id'].startswith(prefix):
+                        try:
+                            # Extract number from IDs like "top1", "shoe12"
+                            num = int(item['id'][len(prefix):])
+                            if num > max_num:
+                                max_num = num
+                        except (ValueError, IndexError):
+                            # Ignore malformed IDs
+                            continue
+
+                # Set the new, standardized ID
+                item_data['id'] = f"{prefix}{max_num + 1}"
+                wardrobe_data["items"].append(item_data)
+
             # Add the item with the new ID to the wardrobe
-            st.session_state.wardrobe_items.append(item_data)
-            save_wardrobe()
+            update_json(store.wardrobe_path, assign_id_and_add, default=lambda: {"items": []})
+            reload_wardrobe()
+            get_analytics(store).item_added(item_data)
             
             # Clean up temporary file
             os.unlink(tmp_path)
@@ -140,9 +254,21 @@ def display_wardrobe_item(item, show_actions=True, unique_key=""):
         if show_actions:
             # Use unique key to prevent duplicate widget errors
             button_key = f"remove_{item['id']}_{unique_key}"
+            price = st.number_input(
+                "Price ($)",
+                min_value=0.0,
+                value=float(item.get('price') or 0.0),
+                key=f"price_{item['id']}_{unique_key}",
+                help="Used for cost-per-wear stats"
+            )
+            if price != float(item.get('price') or 0.0):
+                item['price'] = price
+                update_item(item, store)
+                reload_wardrobe()
+
             if st.button(f"Remove {item['id']}", key=button_key):
-                st.session_state.wardrobe_items = [i for i in st.session_state.wardrobe_items if i['id'] != item['id']]
-                save_wardrobe()
+                remove_item(item['id'], store)
+                reload_wardrobe()
                 st.rerun()
 
 def filter_items_by_type(items, item_type):
@@ -158,6 +284,11 @@ def display_outfit_suggestion(suggestion, wardrobe_items):
         st.warning("No outfit suggestion available.")
         return
 
+    if isinstance(suggestion, dict) and suggestion.get('degraded'):
+        st.warning(f"⚠️ {suggestion.get('degraded_reason', 'AI stylist unavailable')}, so this outfit was picked by quick local rules.")
+    if isinstance(suggestion, dict) and suggestion.get('precomputed'):
+        st.caption("🌙 Prepared overnight for today's forecast.")
+
     # Intelligently find the 'outfits' list from various possible structures
     outfits = []
     if isinstance(suggestion, dict):
@@ -243,6 +374,9 @@ def display_outfit_suggestion(suggestion, wardrobe_items):
         temp = raw_data.get('temperature', 'N/A')
         conditions = raw_data.get('conditions', 'N/A')
         st.info(f"🌤️ Weather: {temp}°F, {conditions}")
+        narrative = (suggestion['weather'].get('analysis') or {}).get('narrative')
+        if narrative:
+            st.caption(narrative)
     
     # Recommendations
     if 'suggestions' in suggestion and isinstance(suggestion['suggestions'], dict):
@@ -262,44 +396,52 @@ def main_page():
     st.title("🏠 Dashboard")
     st.write(f"Welcome back, {st.session_state.user_settings['name']}!")
     
-    # Statistics
+    # Statistics (read from the materialized counters, no wardrobe scan)
+    analytics = get_analytics(store)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Items", len(st.session_state.wardrobe_items))
+        st.metric("Total Items", analytics.data["total_items"])
     
     with col2:
-        tops = filter_items_by_type(st.session_state.wardrobe_items, "t-shirt") + \
-               filter_items_by_type(st.session_state.wardrobe_items, "shirt") + \
-               filter_items_by_type(st.session_state.wardrobe_items, "sweater")
-        st.metric("Tops", len(tops))
+        st.metric("Tops", analytics.count_by_slot("top"))
     
     with col3:
-        pants = filter_items_by_type(st.session_state.wardrobe_items, "pants")
-        st.metric("Pants", len(pants))
+        st.metric("Bottoms", analytics.count_by_slot("bottom"))
     
     with col4:
-        shoes = filter_items_by_type(st.session_state.wardrobe_items, "shoes")
-        st.metric("Shoes", len(shoes))
+        st.metric("Shoes", analytics.count_by_slot("shoes"))
     
     # Quick outfit suggestion
     st.subheader("🎯 Quick Outfit Suggestion")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        formality = st.selectbox("Formality", ["Casual", "Business Casual", "Formal"], key="quick_formality")
+        # Default to the preferred context, which is what the nightly precompute prepared
+        formality = st.selectbox(
+            "Formality", ["Casual", "Business Casual", "Formal"], key="quick_formality",
+            index=["Casual", "Business Casual", "Formal"].index(st.session_state.user_settings.get('preferred_formality', 'Casual'))
+        )
     with col2:
-        activity = st.selectbox("Activity", ["General", "Work", "School", "Exercise", "Social"], key="quick_activity")
+        activity = st.selectbox(
+            "Activity", ["General", "Work", "School", "Exercise", "Social"], key="quick_activity",
+            index=["General", "Work", "School", "Exercise", "Social"].index(st.session_state.user_settings.get('preferred_activity', 'General'))
+        )
+    sync_prefetch(st.session_state.user_settings['location'], formality, activity)
     with col3:
         if st.button("Generate Outfit", key="quick_generate"):
             if len(st.session_state.wardrobe_items) >= 3:
                 try:
-                    outfit_crew = OutfitSuggestionCrew(st.session_state.wardrobe_items)
-                    suggestion = outfit_crew.suggest_outfit(
-                        location=st.session_state.user_settings['location'],
-                        formality=formality,
-                        activity=activity
-                    )
+                    location = st.session_state.user_settings['location']
+                    suggestion = take_prefetched(location, formality, activity)
+                    if suggestion is None:
+                        outfit_crew = new_outfit_crew()
+                        # Served from the nightly precompute when it still fits today's weather
+                        suggestion = outfit_crew.precomputed_outfit(location, formality, activity) or outfit_crew.suggest_outfit(
+                            location=location,
+                            formality=formality,
+                            activity=activity
+                        )
                     st.session_state.current_suggestion = suggestion
                     st.rerun()
                 except Exception as e:
@@ -371,6 +513,52 @@ def wardrobe_page():
         else:
             st.info("No items match your current filters.")
 
+def valid_alternatives(alternatives, wardrobe_items):
+    """Keep only alternative ids that exist in the wardrobe and fill the slot they are listed under"""
+    items_by_id = {item['id']: item for item in wardrobe_items}
+    valid = {}
+    for slot in SLOT_KEYS:
+        ids = alternatives.get(slot, []) if isinstance(alternatives, dict) else []
+        valid[slot] = [i for i in ids if i in items_by_id and slot_of(items_by_id[i]) == slot]
+    return valid
+
+def next_alternative(slot, current_outfit):
+    """Pop the next precomputed alternative for a slot, or None when the list has run out"""
+    queue = st.session_state.generator_alternatives.get(slot, [])
+    while queue:
+        item_id = queue.pop(0)
+        if item_id != current_outfit.get(slot):
+            return item_id
+    return None
+
+def swap_with_llm(slot, current_outfit, location, formality, activity):
+    """Ask the outfit crew for a new item in one slot, keeping the other two pieces"""
+    def current(other_slot):
+        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get(other_slot)), None)
+        return [item] if item else []
+
+    # Don't wait on a backend the circuit breaker already knows is failing
+    if llm_policy.breaker.is_open():
+        return None
+
+    outfit_crew = new_outfit_crew()
+    common = dict(location=location, formality=formality, activity=activity, context=st.session_state.generator_snapshot)
+    try:
+        if slot == 'top':
+            response = outfit_crew.suggest_tops(current_bottoms=current('bottom'), current_shoes=current('shoes'), **common)
+        elif slot == 'bottom':
+            response = outfit_crew.suggest_bottoms(current_tops=current('top'), current_shoes=current('shoes'), **common)
+        else:
+            response = outfit_crew.suggest_shoes(current_tops=current('top'), current_bottoms=current('bottom'), **common)
+    except Exception as e:
+        print(f"Warning: Could not swap {slot}: {str(e)}")
+        return None
+
+    candidates = response.get('suggestions', {}).get(SLOT_KEYS[slot], [])
+    candidate_ids = [c.get('item_id') if isinstance(c, dict) else c for c in candidates]
+    # Find an item that is different from the current one
+    return next((item_id for item_id in candidate_ids if item_id and item_id != current_outfit.get(slot)), None)
+
 def outfit_generator_page():
     """Outfit generation page with item swapping functionality"""
     st.title("🎨 Outfit Generator")
@@ -380,28 +568,40 @@ def outfit_generator_page():
         st.session_state.generator_outfit = None
     if 'generator_context' not in st.session_state:
         st.session_state.generator_context = {}
+    if 'generator_snapshot' not in st.session_state:
+        st.session_state.generator_snapshot = None
+    if 'generator_alternatives' not in st.session_state:
+        st.session_state.generator_alternatives = {}
 
     # --- Outfit Context ---
     st.subheader("⚙️ Outfit Context")
     col1, col2, col3 = st.columns(3)
     with col1:
-        formality = st.selectbox("Formality Level", ["Casual", "Business Casual", "Formal"], key="outfit_formality")
+        formality = st.selectbox(
+            "Formality Level", ["Casual", "Business Casual", "Formal"], key="outfit_formality",
+            index=["Casual", "Business Casual", "Formal"].index(st.session_state.user_settings.get('preferred_formality', 'Casual'))
+        )
     with col2:
-        activity = st.selectbox("Activity", ["General", "Work", "School", "Exercise", "Social"], key="outfit_activity")
+        activity = st.selectbox(
+            "Activity", ["General", "Work", "School", "Exercise", "Social"], key="outfit_activity",
+            index=["General", "Work", "School", "Exercise", "Social"].index(st.session_state.user_settings.get('preferred_activity', 'General'))
+        )
     with col3:
         location = st.text_input("Location", value=st.session_state.user_settings['location'], key="outfit_location")
+    sync_prefetch(location, formality, activity)
 
     # --- Generate Button ---
     if st.button("✨ Generate Outfit", key="generate_full_outfit"):
         if len(st.session_state.wardrobe_items) >= 3:
             try:
-                outfit_crew = OutfitSuggestionCrew(st.session_state.wardrobe_items)
                 with st.spinner("Generating your perfect outfit..."):
-                    suggestion = outfit_crew.suggest_outfit(
-                        location=location,
-                        formality=formality,
-                        activity=activity
-                    )
+                    suggestion = take_prefetched(location, formality, activity)
+                    if suggestion is None:
+                        suggestion = new_outfit_crew().suggest_outfit(
+                            location=location,
+                            formality=formality,
+                            activity=activity
+                        )
                 
                 # Intelligently find and parse the first valid outfit from the response
                 outfits = []
@@ -417,20 +617,23 @@ def outfit_generator_page():
                     if 'items' in outfit_data and isinstance(outfit_data['items'], list):
                         for item_id in outfit_data['items']:
                             item_details = next((item for item in st.session_state.wardrobe_items if item['id'] == item_id), None)
-                            if item_details:
-                                item_type = item_details.get('type', '').lower()
-                                if item_type in ['shirt', 't-shirt', 'sweater', 'parka', 'top'] and 'top' not in parsed_outfit:
-                                    parsed_outfit['top'] = item_id
-                                elif item_type in ['pants', 'shorts', 'bottom'] and 'bottom' not in parsed_outfit:
-                                    parsed_outfit['bottom'] = item_id
-                                elif item_type == 'shoes' and 'shoes' not in parsed_outfit:
-                                    parsed_outfit['shoes'] = item_id
+                            slot = slot_of(item_details) if item_details else None
+                            if slot and slot not in parsed_outfit:
+                                parsed_outfit[slot] = item_id
                     else: # Handle old format
                         parsed_outfit = {'top': outfit_data.get('top'), 'bottom': outfit_data.get('bottom'), 'shoes': outfit_data.get('shoes')}
 
                 if parsed_outfit:
                     st.session_state.generator_outfit = parsed_outfit
+                    # Keep weather, calendar and filtered items so swaps only pay for generation
+                    st.session_state.generator_snapshot = suggestion.get('context')
+                    # Ranked per-slot alternatives make swaps a local lookup
+                    st.session_state.generator_alternatives = valid_alternatives(
+                        suggestion.get('suggestions', {}).get('alternatives', {}),
+                        st.session_state.wardrobe_items
+                    )
                     st.session_state.generator_context = {
+                        'degraded_reason': suggestion.get('degraded_reason') if suggestion.get('degraded') else None,
                         'weather': suggestion.get('weather'),
                         'recommendations': suggestion.get('recommendations', suggestion.get('suggestions', {}).get('recommendations', []))
                     }
@@ -474,98 +677,177 @@ def outfit_generator_page():
         
         # --- Swap Buttons ---
         b_col1, b_col2, b_col3 = st.columns(3)
-        outfit_crew = OutfitSuggestionCrew(st.session_state.wardrobe_items)
-
-        with b_col1:
-            if st.button("🔄 Swap Top", key="swap_top"):
-                with st.spinner("Finding a new top..."):
-                    # Safely build context for the AI
-                    current_bottoms = []
-                    if current_outfit.get('bottom'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('bottom')), None)
-                        if item:
-                            current_bottoms.append(item)
-
-                    current_shoes = []
-                    if current_outfit.get('shoes'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('shoes')), None)
-                        if item:
-                            current_shoes.append(item)
-
-                    suggestions = outfit_crew.suggest_tops(location=location, formality=formality, activity=activity, current_bottoms=current_bottoms, current_shoes=current_shoes)
-                    # Correctly parse the suggestions from the response
-                    new_tops = suggestions.get('tops', [])
-                    # Find a top that is different from the current one
-                    new_top_id = next((top for top in new_tops if top != current_outfit.get('top')), None)
-                    
-                    if new_top_id:
-                        st.session_state.generator_outfit['top'] = new_top_id
-                        st.rerun()
-                    else:
-                        st.warning("No other suitable tops found.")
-
-        with b_col2:
-            if st.button("🔄 Swap Bottom", key="swap_bottom"):
-                with st.spinner("Finding new bottoms..."):
-                    # Safely build context
-                    current_tops = []
-                    if current_outfit.get('top'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('top')), None)
-                        if item:
-                            current_tops.append(item)
-                    
-                    current_shoes = []
-                    if current_outfit.get('shoes'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('shoes')), None)
-                        if item:
-                            current_shoes.append(item)
-
-                    suggestions = outfit_crew.suggest_bottoms(location=location, formality=formality, activity=activity, current_tops=current_tops, current_shoes=current_shoes)
-                    new_bottoms = suggestions.get('bottoms', [])
-                    new_bottom_id = next((b for b in new_bottoms if b != current_outfit.get('bottom')), None)
-                    
-                    if new_bottom_id:
-                        st.session_state.generator_outfit['bottom'] = new_bottom_id
-                        st.rerun()
-                    else:
-                        st.warning("No other suitable bottoms found.")
-
-        with b_col3:
-            if st.button("🔄 Swap Shoes", key="swap_shoes"):
-                with st.spinner("Finding new shoes..."):
-                    # Safely build context
-                    current_tops = []
-                    if current_outfit.get('top'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('top')), None)
-                        if item:
-                            current_tops.append(item)
-
-                    current_bottoms = []
-                    if current_outfit.get('bottom'):
-                        item = next((i for i in st.session_state.wardrobe_items if i['id'] == current_outfit.get('bottom')), None)
-                        if item:
-                            current_bottoms.append(item)
-
-                    suggestions = outfit_crew.suggest_shoes(location=location, formality=formality, activity=activity, current_tops=current_tops, current_bottoms=current_bottoms)
-                    new_shoes = suggestions.get('shoes', [])
-                    new_shoe_id = next((s for s in new_shoes if s != current_outfit.get('shoes')), None)
-
-                    if new_shoe_id:
-                        st.session_state.generator_outfit['shoes'] = new_shoe_id
+        for column, slot, label in ((b_col1, 'top', "Top"), (b_col2, 'bottom', "Bottom"), (b_col3, 'shoes', "Shoes")):
+            with column:
+                if st.button(f"🔄 Swap {label}", key=f"swap_{slot}"):
+                    new_item_id = next_alternative(slot, current_outfit)
+                    if new_item_id is None:
+                        with st.spinner(f"Finding a new {label.lower()}..."):
+                            new_item_id = swap_with_llm(slot, current_outfit, location, formality, activity)
+
+                    if new_item_id:
+                        st.session_state.generator_outfit[slot] = new_item_id
                         st.rerun()
                     else:
-                        st.warning("No other suitable shoes found.")
+                        st.warning(f"No other suitable {SLOT_KEYS[slot]} found.")
         
         # --- Display Context ---
         context = st.session_state.generator_context
+        if context.get('degraded_reason'):
+            st.warning(f"⚠️ {context['degraded_reason']}, so this outfit was picked by quick local rules.")
         if context.get('weather'):
             weather_data = context['weather'].get('raw_data', {})
             st.info(f"🌤️ Weather: {weather_data.get('temperature', 'N/A')}°F, {weather_data.get('conditions', 'N/A')}")
+            narrative = (context['weather'].get('analysis') or {}).get('narrative')
+            if narrative:
+                st.caption(narrative)
         if context.get('recommendations'):
             st.write("**💡 Recommendations:**")
             for rec in context['recommendations']:
                 st.write(f"• {rec}")
 
+    week_plan_section()
+
+def week_plan_section():
+    """Plan outfits for the coming days from one forecast, one calendar query and one LLM call"""
+    st.markdown("---")
+    st.subheader("🗓️ Plan the Week")
+    col1, col2 = st.columns(2)
+    with col1:
+        days = st.slider("Days", min_value=2, max_value=7, value=7, key="plan_days")
+    with col2:
+        plan_formality = st.selectbox("Formality", ["From calendar", "Casual", "Business Casual", "Formal"], key="plan_formality")
+
+    if st.button("🗓️ Plan Outfits", key="plan_week"):
+        if len(st.session_state.wardrobe_items) >= 3:
+            try:
+                outfit_crew = new_outfit_crew()
+                with st.spinner(f"Planning {days} days of outfits..."):
+                    st.session_state.week_plan = outfit_crew.plan_week(
+                        location=st.session_state.user_settings['location'],
+                        days=days,
+                        formality=None if plan_formality == "From calendar" else plan_formality,
+                        laundry_cycle_days=st.session_state.user_settings.get('laundry_cycle_days', 7)
+                    )
+            except Exception as e:
+                st.error(f"Error planning outfits: {str(e)}")
+        else:
+            st.warning("You need at least 3 items in your wardrobe (top, bottom, shoes) to plan outfits.")
+
+    plan = st.session_state.get('week_plan')
+    if not plan:
+        return
+    if plan.get('error'):
+        st.error(plan['error'])
+        return
+    if plan.get('degraded'):
+        st.warning(f"⚠️ {plan.get('degraded_reason', 'AI stylist unavailable')}, so this plan was picked by quick local rules.")
+
+    items_by_id = {item['id']: item for item in st.session_state.wardrobe_items}
+    for day in plan['days']:
+        raw_data = day['weather'].get('raw_data', {})
+        label = datetime.fromisoformat(day['date']).strftime("%A %b %d")
+        with st.expander(f"{label} · {raw_data.get('temperature', 'N/A')}°F, {raw_data.get('conditions', 'N/A')}"):
+            if day['weather'].get('estimated'):
+                st.caption("Beyond the forecast range, weather estimated from the last forecast day.")
+            st.write(f"**{day['outfit']['name']}** ({day['outfit']['formality_level']})")
+            columns = st.columns(3)
+            for column, item_id in zip(columns, day['outfit']['items']):
+                with column:
+                    item = items_by_id.get(item_id)
+                    if item:
+                        display_wardrobe_item(item, show_actions=False, unique_key=f"plan_{day['date']}_{item_id}")
+                    else:
+                        st.write(f"*{item_id} (in the laundry)*")
+            if day['reused']:
+                st.caption("Worn again before laundry day: " + ", ".join(day['reused']))
+            if day['outfit'].get('style_notes'):
+                st.caption(day['outfit']['style_notes'])
+
+    if plan.get('recommendations'):
+        st.write("**💡 Recommendations:**")
+        for rec in plan['recommendations']:
+            st.write(f"• {rec}")
+
+def trip_page():
+    """Packing list for a trip, solved locally from the destinations' forecasts"""
+    st.title("🧳 Trip")
+    st.write("Pack the fewest items that still give you a suitable outfit every day of your trip.")
+
+    stop_count = st.number_input("Destinations", min_value=1, max_value=4, value=1, key="trip_stop_count")
+    stops = []
+    start = datetime.now().date()
+    for index in range(int(stop_count)):
+        col1, col2 = st.columns(2)
+        with col1:
+            location = st.text_input(
+                f"Destination {index + 1}",
+                value=st.session_state.user_settings['location'] if index == 0 else "",
+                key=f"trip_location_{index}"
+            )
+        with col2:
+            dates = st.date_input(
+                "Dates", value=(start, start + timedelta(days=2)), key=f"trip_dates_{index}"
+            )
+        if location and isinstance(dates, (list, tuple)) and len(dates) == 2:
+            stops.append((location, dates[0], dates[1]))
+            start = dates[1] + timedelta(days=1)
+
+    trip_formality = st.selectbox("Formality", ["From calendar", "Casual", "Business Casual", "Formal"], key="trip_formality")
+
+    if st.button("🧳 Pack", key="pack_trip"):
+        if not stops:
+            st.warning("Add at least one destination with a start and end date.")
+        elif len(st.session_state.wardrobe_items) < 3:
+            st.warning("You need at least 3 items in your wardrobe (top, bottom, shoes) to pack for a trip.")
+        else:
+            try:
+                with st.spinner("Packing..."):
+                    st.session_state.trip_plan = new_outfit_crew().plan_trip(
+                        stops, formality=None if trip_formality == "From calendar" else trip_formality
+                    )
+            except Exception as e:
+                st.error(f"Error packing for the trip: {str(e)}")
+
+    plan = st.session_state.get('trip_plan')
+    if not plan:
+        return
+    if plan.get('error'):
+        st.error(plan['error'])
+        return
+
+    items_by_id = {item['id']: item for item in st.session_state.wardrobe_items}
+    st.subheader(f"🧳 Packing List ({len(plan['packing_list'])} items)")
+    if plan.get('explanation'):
+        st.info(plan['explanation'])
+    for gap in plan['gaps']:
+        st.warning(f"⚠️ {gap}")
+    for slot in ("top", "bottom", "shoes"):
+        packed = plan['by_slot'].get(slot, [])
+        if not packed:
+            continue
+        wears = plan['max_wears'].get(slot)
+        st.write(f"**{SLOT_KEYS[slot].title()}** ({len(packed)})" + (f", each worn up to {wears} times" if wears else ""))
+        columns = st.columns(4)
+        for index, item_id in enumerate(packed):
+            with columns[index % 4]:
+                item = items_by_id.get(item_id)
+                if item:
+                    display_wardrobe_item(item, show_actions=False, unique_key=f"trip_{item_id}")
+
+    st.subheader("📅 Day by Day")
+    for day in plan['days']:
+        raw_data = day['weather'].get('raw_data', {})
+        names = [
+            " ".join(str(items_by_id[item_id].get(field, "")) for field in ("color", "form", "type")) if item_id in items_by_id else item_id
+            for item_id in day['items']
+        ]
+        estimated = " (estimated)" if day['weather'].get('estimated') else ""
+        st.write(
+            f"**{datetime.fromisoformat(day['date']).strftime('%a %b %d')}** · {day['location']} · "
+            f"{raw_data.get('temperature', 'N/A')}°F, {raw_data.get('conditions', 'N/A')}{estimated} — {', '.join(names)}"
+        )
+
 def settings_page():
     """Settings page for user preferences"""
     st.title("⚙️ Settings")
@@ -617,6 +899,14 @@ def settings_page():
     )
     st.session_state.user_settings['preferred_activity'] = preferred_activity
     
+    # Calendars used for formality and activity detection
+    calendar_ids = st.text_input(
+        "Google Calendars",
+        value=", ".join(st.session_state.user_settings.get('calendar_ids', ['primary'])),
+        help="Comma-separated calendar IDs to check for events, e.g. primary, work@group.calendar.google.com"
+    )
+    st.session_state.user_settings['calendar_ids'] = [c.strip() for c in calendar_ids.split(",") if c.strip()] or ['primary']
+    
     # Save button
     if st.button("💾 Save Settings"):
         save_user_settings()
@@ -641,9 +931,10 @@ def settings_page():
         if st.button("🗑️ Clear All Data"):
             if st.checkbox("I understand this will delete all my wardrobe data"):
                 st.session_state.wardrobe_items = []
-                save_wardrobe()
-                st.success("All wardrobe data cleared!")
-                st.rerun()
+                if save_wardrobe():
+                    get_analytics(store).rebuild([], st.session_state.outfit_history)
+                    st.success("All wardrobe data cleared!")
+                    st.rerun()
     
     # App information
     st.subheader("ℹ️ App Information")
@@ -694,11 +985,12 @@ def outfit_history_page():
             "notes": notes
         }
         
-        st.session_state.outfit_history.append(outfit_log)
-        
-        # Save to file
-        with open("data/outfit_history.json", "w") as f:
-            json.dump(st.session_state.outfit_history, f, indent=2)
+        # Append on disk under the file lock so logs from other sessions aren't overwritten
+        st.session_state.outfit_history = update_json(
+            store.history_path, lambda history: history.append(outfit_log), default=list
+        )
+        get_wear_index(store).record_outfit(outfit_log)
+        get_analytics(store).outfit_logged(outfit_log)
         
         st.success("Outfit logged successfully!")
         st.rerun()
@@ -711,7 +1003,7 @@ def outfit_history_page():
     else:
         # Load history from file
         try:
-            with open("data/outfit_history.json", "r") as f:
+            with open(store.history_path, "r") as f:
                 st.session_state.outfit_history = json.load(f)
         except FileNotFoundError:
             pass
@@ -734,6 +1026,90 @@ def outfit_history_page():
                     if outfit.get('notes'):
                         st.write(f"**Notes:** {outfit['notes']}")
 
+def wardrobe_stats():
+    """Wear and cost analytics from the materialized counters"""
+    analytics = get_analytics(store)
+    data = analytics.data
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Items", data["total_items"])
+    with col2:
+        st.metric("Outfit items worn", data["total_wears"])
+    with col3:
+        st.metric("Item types", len(data["items_by_type"]))
+
+    if not data["total_items"]:
+        st.info("Add items to your wardrobe to see analytics.")
+        return
+
+    st.subheader("👕 Items by Type")
+    st.bar_chart(data["items_by_type"])
+
+    if data["wears_by_type"]:
+        st.subheader("🔁 Wear Frequency by Type")
+        st.bar_chart(data["wears_by_type"])
+
+    ranking = analytics.wear_ranking()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("⭐ Most Worn")
+        for item_id, wears in ranking[:5]:
+            st.write(f"• {item_id}: {wears} wears")
+    with col2:
+        st.subheader("💤 Least Worn")
+        for item_id, wears in list(reversed(ranking))[:5]:
+            st.write(f"• {item_id}: {wears} wears")
+
+    costs = analytics.cost_per_wear()
+    st.subheader("💲 Cost per Wear")
+    if costs:
+        st.dataframe(
+            [{"Item": item_id, "Cost per wear ($)": round(cost, 2), "Wears": wears} for item_id, cost, wears in costs],
+            use_container_width=True
+        )
+    else:
+        st.info("Set prices on your wardrobe items to see cost per wear.")
+
+def llm_stats():
+    """LLM call telemetry: latency, token usage and parse success per stage"""
+    records = telemetry.load_records()
+    if not records:
+        st.info("No LLM calls recorded yet. Generate an outfit or add an item to collect metrics.")
+        return
+
+    st.subheader("⏱️ Latency and Tokens by Stage")
+    stats = telemetry.stage_stats(records)
+    rows = []
+    for stage, s in sorted(stats.items()):
+        rows.append({
+            "Stage": stage,
+            "Calls": s["calls"],
+            "p50 (ms)": s["p50_ms"],
+            "p95 (ms)": s["p95_ms"],
+            "Prompt tokens": s["prompt_tokens"],
+            "Completion tokens": s["completion_tokens"],
+            "Est. cost ($)": s.get("cost_usd", 0),
+            "Retries": s["retries"],
+            "Hedged": s.get("hedged", 0),
+            "Errors": s["errors"],
+            "Parse success": f"{s['parse_success_rate']:.0%}" if s["parse_success_rate"] is not None else "N/A"
+        })
+    st.dataframe(rows, use_container_width=True)
+
+    st.subheader("📋 Recent Calls")
+    st.dataframe(list(reversed(records[-50:])), use_container_width=True)
+
+def stats_page():
+    """Wardrobe analytics and LLM telemetry"""
+    st.title("📈 Stats")
+
+    wardrobe_tab, llm_tab = st.tabs(["👗 Wardrobe", "🤖 LLM Calls"])
+    with wardrobe_tab:
+        wardrobe_stats()
+    with llm_tab:
+        llm_stats()
+
 # Main navigation
 def main():
     # Sidebar navigation
@@ -743,7 +1119,7 @@ def main():
     # Navigation
     page = st.sidebar.selectbox(
         "Navigate",
-        ["🏠 Dashboard", "👕 Wardrobe", "🎨 Outfit Generator", "📅 History", "⚙️ Settings"]
+        ["🏠 Dashboard", "👕 Wardrobe", "🎨 Outfit Generator", "🧳 Trip", "📅 History", "📈 Stats", "⚙️ Settings"]
     )
     
     # Display selected page
@@ -753,10 +1129,19 @@ def main():
         wardrobe_page()
     elif page == "🎨 Outfit Generator":
         outfit_generator_page()
+    elif page == "🧳 Trip":
+        trip_page()
     elif page == "📅 History":
         outfit_history_page()
+    elif page == "📈 Stats":
+        stats_page()
     elif page == "⚙️ Settings":
         settings_page()
 
+    if IMPORT_REPORT:
+        with st.sidebar.expander("⏱️ Import times"):
+            for name, elapsed_ms in lazy_loader.timings().items():
+                st.write(f"{name}: {elapsed_ms} ms")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,23 +7,46 @@ from mistralai import Mistral
 from dotenv import load_dotenv
 import os
 import json
+import asyncio
+import threading
+import weakref
+import httpx
 import base64
 import shutil
+import hashlib
 from datetime import datetime
+from tools import telemetry, cassette, llm_policy
+from tools.json_store import read_json
+from tools.db_manager import add_item
+from tools.user_store import get_store
+from tools.model_routes import get_route
 
-def ensure_wardrobe_folder():
+# Concurrent requests per client; idle connections are kept alive for reuse
+MAX_CONNECTIONS = int(os.getenv("MISTRAL_MAX_CONNECTIONS", "8"))
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_client = None
+# The httpx.Client behind _client, kept so reset_clients can close its connections
+_http_client = None
+# event loop -> (Mistral client, the httpx.AsyncClient it sends through)
+_async_clients = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+# classify_images runs every batch on this one loop, so its async client and pool outlive a batch
+_loop = None
+
+def ensure_wardrobe_folder(images_dir="wardrobe"):
     """Ensure the wardrobe folder exists"""
-    if not os.path.exists("wardrobe"):
-        os.makedirs("wardrobe")
+    if not os.path.exists(images_dir):
+        os.makedirs(images_dir)
 
-def save_image(image_path, item_id):
+def save_image(image_path, item_id, images_dir="wardrobe"):
     """Save image to wardrobe folder with unique name"""
-    ensure_wardrobe_folder()
+    ensure_wardrobe_folder(images_dir)
     # Get file extension
     _, ext = os.path.splitext(image_path)
     # Create new filename with timestamp and item_id
     new_filename = f"{item_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
-    new_path = os.path.join("wardrobe", new_filename)
+    new_path = os.path.join(images_dir, new_filename)
     # Copy the image to wardrobe folder
     shutil.copy2(image_path, new_path)
     return new_path
@@ -32,18 +55,71 @@ def encode_image_base64(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode("utf-8")
 
-def image_to_json(path):
+def _http_limits():
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+
+def _new_client(**http_clients):
     load_dotenv()
+    return Mistral(
+        api_key=os.getenv("MISTRAL_API_KEY"),
+        server_url=os.getenv("MISTRAL_SERVER_URL"),
+        **http_clients
+    )
+
+def get_client():
+    """Return the process-wide Mistral client, whose pooled connections stay open between images"""
+    global _client, _http_client
+    with _client_lock:
+        if _client is None:
+            _http_client = httpx.Client(limits=_http_limits(), timeout=HTTP_TIMEOUT)
+            _client = _new_client(client=_http_client)
+        return _client
+
+def get_async_client():
+    """Return the async Mistral client for the running event loop.
+
+    httpx async connections belong to the loop that opened them, so each loop gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            http_client = httpx.AsyncClient(limits=_http_limits(), timeout=HTTP_TIMEOUT)
+            entry = _async_clients[loop] = (_new_client(async_client=http_client), http_client)
+        return entry[0]
+
+async def aclose_async_client():
+    """Close the running loop's async client and its connections.
 
-    # Initialize the Mistral AI client
-    client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
+    Callers running image_to_json_async on their own loop should await this before the loop ends.
+    """
+    with _client_lock:
+        entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
 
-    # Define the prompt for outfit suggestions
-    with open("data/wardrobe.json", "r") as f:
-        wardrobe = json.load(f)
+def _background_loop():
+    """Return the long-lived event loop classify_images runs on, starting its thread on first use"""
+    global _loop
+    with _client_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="pixtral-loop", daemon=True).start()
+        return _loop
 
-    existing_ids = [item["id"] for item in wardrobe["items"]]
-    prompt = """
+def reset_clients():
+    """Close the pooled clients so the next call builds them from the current environment (see tools/benchmark.py)"""
+    global _client, _http_client
+    with _client_lock:
+        http_client, _client, _http_client = _http_client, None, None
+        loop = _loop
+    if http_client is not None:
+        http_client.close()
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(aclose_async_client(), loop).result()
+
+def _build_prompt(existing_ids):
+    return """
     Describe the clothing item in the image you see in the following JSON format:
     {
         "id": "name1",
@@ -57,24 +133,29 @@ def image_to_json(path):
 
     Do not include any additional text or explanations, just the JSON object.
     Do not make the id the same as the following:
-    """ + "\n".join(existing_ids)
+    """ + "\n".join(sorted(existing_ids))
 
-    # Encode the image to base64
-    image_base64 = encode_image_base64(path)
+def _messages(prompt, image_base64):
+    return [
+        {"role": "user", 
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": "data:image/png;base64," + image_base64},     
+            ] 
+        } 
+    ]
 
-    # Get outfit suggestions from the Mistral AI model
-    response = client.chat.complete(
-        model="pixtral-12b-2409",
-        messages = [
-            {"role": "user", 
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": "data:image/png;base64," + image_base64},     
-                ] 
-            } 
-        ]
-    )
+def _cassette_request(prompt, image_base64):
+    return {'prompt': prompt, 'image': hashlib.sha256(image_base64.encode("utf-8")).hexdigest()}
+
+def _existing_ids(store, existing_ids):
+    # Callers holding the wardrobe in memory pass its ids; only fall back to reading the file
+    if existing_ids is not None:
+        return existing_ids
+    wardrobe = read_json(store.wardrobe_path, default=lambda: {"items": []})
+    return {item["id"] for item in wardrobe["items"]}
 
+def _parse_item(response, call):
     json_resp = response.choices[0].message.content
     try:
         if isinstance(json_resp, str):
@@ -98,7 +179,9 @@ def image_to_json(path):
                 json_resp_str = json_resp_str[:-3]
             json_resp_str = json_resp_str.strip()
             item_data = json.loads(json_resp_str)
+        call.set_parsed(True)
     except json.JSONDecodeError as e:
+        call.set_parsed(False)
         print(f"Error parsing outfit suggestions: {str(e)}")
         print(f"Raw json_resp: {json_resp}")
         # Return a default outfit suggestion
@@ -111,19 +194,94 @@ def image_to_json(path):
             "notes": "default",
             "count": 1
         }
+    return item_data
+
+def image_to_json(path, store=None, existing_ids=None):
+    """Classify one clothing image and copy it into the user's image folder.
+
+    existing_ids is the set of ids already in the wardrobe; pass it from the in-memory
+    wardrobe to skip re-reading the wardrobe file.
+    """
+    store = store or get_store()
+    prompt = _build_prompt(_existing_ids(store, existing_ids))
+
+    # Encode the image to base64
+    image_base64 = encode_image_base64(path)
+
+    # Get outfit suggestions from the Mistral AI model
+    route = get_route('image_classification')
+    with telemetry.track('image_classification', agent='Pixtral', model=route['model']) as call:
+        response = cassette.call(
+            'pixtral',
+            _cassette_request(prompt, image_base64),
+            lambda: llm_policy.call(
+                'image_classification',
+                lambda: get_client().chat.complete(messages=_messages(prompt, image_base64), **route),
+                call, hedge=True
+            ),
+            encode=cassette.encode_chat_response,
+            decode=cassette.decode_chat_response
+        )
+        call.set_usage(response)
+        item_data = _parse_item(response, call)
     
     # Save the image and add its path to the item data
-    image_path = save_image(path, item_data["id"])
+    image_path = save_image(path, item_data["id"], store.images_dir)
     item_data["image"] = image_path
     
     return item_data
 
-def add_to_wardrobe(path):
-    with open("data/wardrobe.json", "r") as f:
-        wardrobe = json.load(f)
-    wardrobe["items"].append(image_to_json(path))
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(wardrobe, f, indent=2)
+async def image_to_json_async(path, store=None, existing_ids=None):
+    """Async image_to_json, for callers that already run an event loop (see aclose_async_client)"""
+    store = store or get_store()
+    prompt = _build_prompt(_existing_ids(store, existing_ids))
+    image_base64 = await asyncio.to_thread(encode_image_base64, path)
+
+    route = get_route('image_classification')
+    with telemetry.track('image_classification', agent='Pixtral', model=route['model']) as call:
+        response = await cassette.call_async(
+            'pixtral',
+            _cassette_request(prompt, image_base64),
+            lambda: llm_policy.call_async(
+                'image_classification',
+                lambda: get_async_client().chat.complete_async(messages=_messages(prompt, image_base64), **route),
+                call, hedge=True
+            ),
+            encode=cassette.encode_chat_response,
+            decode=cassette.decode_chat_response
+        )
+        call.set_usage(response)
+        item_data = _parse_item(response, call)
+
+    item_data["image"] = await asyncio.to_thread(save_image, path, item_data["id"], store.images_dir)
+    return item_data
+
+def classify_images(paths, store=None, existing_ids=None):
+    """Classify many images concurrently over one pooled connection set, at most MAX_CONNECTIONS at a time.
+
+    Batches run on one long-lived background loop rather than a new asyncio.run loop each, so the
+    async client is created once and its connections stay open between batches.
+    """
+    store = store or get_store()
+    existing_ids = _existing_ids(store, existing_ids)
+
+    async def run():
+        limit = asyncio.Semaphore(MAX_CONNECTIONS)
+
+        async def classify(path):
+            async with limit:
+                return await image_to_json_async(path, store, existing_ids)
+
+        return await asyncio.gather(*(classify(path) for path in paths))
+
+    return asyncio.run_coroutine_threadsafe(run(), _background_loop()).result()
+
+def add_to_wardrobe(path, store=None):
+    store = store or get_store()
+    # Classify first: the wardrobe file is only locked for the append, never during the LLM call
+    item_data = image_to_json(path, store)
+    # db_manager keeps the analytics counters in step with the wardrobe
+    add_item(item_data, store)
 
 if __name__ == "__main__":
     add_to_wardrobe("data/shirt.png")
@@ -8,23 +8,99 @@ from typing import List, Dict, Any
 import os
 from dotenv import load_dotenv
 import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 import requests
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import datetime, timedelta, timezone
 import pyowm
-from tools.calendar_manager import CalendarManager
+from tools.calendar_manager import get_calendar_manager, event_start, occurs_on
+from tools.event_classifier import get_classifier
+from tools.retrieval import prune_items
+from tools.wear_index import get_wear_index
+from tools.user_store import get_store
+from tools.model_routes import get_route
+from tools.weather_rules import get_weather_rules
+from tools.geo_cache import get_location_cache, get_weather_grid, grid_cell
+from tools.forecast import daily_summaries, pyowm_fields
+from tools.laundry_manager import laundry_schedule
+from tools import telemetry, cassette, llm_policy, heuristics, precompute, packing
 
 load_dotenv()
 
+# Optional endpoint overrides, used to point the pipeline at local stand-ins (see tools/benchmark.py)
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL")
+OWM_BASE_URL = os.getenv("OWM_BASE_URL")
+
+# Prompt size caps: at most this many items per slot are inlined, chosen by local retrieval
+FILTER_ITEMS_PER_SLOT = 25
+GENERATOR_ITEMS_PER_SLOT = 10
+
+# How many ranked alternatives per slot generate_outfit asks for, so swaps need no extra LLM call
+MAX_ALTERNATIVES = 5
+
+# WEATHER_NARRATIVE=1 adds an LLM-written weather summary on top of the rule-based analysis
+WEATHER_NARRATIVE = os.getenv("WEATHER_NARRATIVE") == "1"
+
+# suggest_outfit answers from the local heuristic if the LLM stages take longer than this (0 disables).
+# The LLM path is two calls in a row (wardrobe filter, then generator) of roughly 2-4 s each on the
+# default models, so a tighter budget would hand most requests to the heuristic.
+SUGGEST_DEADLINE_SECONDS = float(os.getenv("OUTFIT_DEADLINE_SECONDS", "8"))
+# How long the fallback waits for a weather observation the pipeline didn't already fetch
+FALLBACK_WEATHER_SECONDS = 2
+
+# Longest plan_week accepts; OWM's 3-hourly forecast covers about five days, later days repeat the last one
+MAX_PLAN_DAYS = 14
+
+_pipeline_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="outfit-pipeline")
+_observation_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="outfit-weather")
+
+def _mistral_llm(stage: str):
+    """Build the Mistral LLM for a pipeline stage, with the model, temperature and output cap routed to it."""
+    route = get_route(stage)
+    return LLM(
+        model=route['model'],
+        api_key=os.getenv("MISTRAL_API_KEY"),
+        temperature=route['temperature'],
+        max_tokens=route.get('max_tokens'),
+        base_url=f"{MISTRAL_SERVER_URL}/v1" if MISTRAL_SERVER_URL else None
+    )
+
+def _stopped(cancelled):
+    """Whether the caller gave up on a pipeline run, checked between its LLM stages"""
+    return cancelled is not None and cancelled.is_set()
+
+def _kickoff(crew, task, call):
+    """Run a crew under the shared LLM rate limit and retry policy, recording or replaying
+    its output when a cassette is active.
+
+    Crews keep per-run state, so they are retried but never hedged.
+    """
+    return cassette.call(
+        'llm', task.description, lambda: llm_policy.call(call['stage'], crew.kickoff, call),
+        encode=cassette.encode_crew_output, decode=cassette.decode_crew_output
+    )
+
+def _parse_json_output(result):
+    """Parse an LLM result into JSON, stripping markdown code fences if present."""
+    result_str = result if isinstance(result, str) else (result.raw if hasattr(result, 'raw') else str(result))
+    if result_str.startswith('```json'):
+        result_str = result_str[7:]  # Remove ```json
+    if result_str.startswith('```'):
+        result_str = result_str[3:]  # Remove ```
+    if result_str.endswith('```'):
+        result_str = result_str[:-3]  # Remove trailing ```
+    return json.loads(result_str.strip())
+
 class WeatherAgent:
-    def __init__(self):
+    def __init__(self, narrative: bool = WEATHER_NARRATIVE):
         self.owm = pyowm.OWM(os.getenv('PYTHON_WEATHER_API_KEY'))
+        self.rules = get_weather_rules()
+        self.narrative = narrative
+        if not narrative:
+            return
 
-        self.llm = LLM(
-            model="mistral/mistral-large-latest",
-            api_key=os.getenv("MISTRAL_API_KEY"),
-            temperature=0.7
-        )
+        self.llm = _mistral_llm('weather_analysis')
         
         self.agent = Agent(
             role='Weather Analyst',
@@ -36,89 +112,144 @@ class WeatherAgent:
             llm=self.llm
         )
     
-    def get_weather(self, location: str) -> Dict[str, Any]:
-        """Fetch weather data using Python Weather."""
-        try:
-            # Get weather data
-            observation = self.owm.weather_manager().weather_at_place(location)
-            if not observation:
+    def _observe(self, location: str) -> Dict[str, Any]:
+        """Fetch the current observation for a location as plain weather fields.
+
+        The location is geocoded once and cached; observations are shared per grid cell,
+        so nearby users and repeat requests within the TTL don't hit OWM again.
+        """
+        place = get_location_cache().resolve(location, self._geocode)
+        cell = grid_cell(place['lat'], place['lon'])
+        return get_weather_grid().get(
+            cell,
+            lambda: cassette.call('owm', {'cell': list(cell)}, lambda: self._fetch_observation(*cell))
+        )
+
+    def _geocode(self, location: str) -> Dict[str, Any]:
+        return cassette.call('owm_geocode', {'location': location}, lambda: self._fetch_geocode(location))
+
+    def _fetch_geocode(self, location: str) -> Dict[str, Any]:
+        if OWM_BASE_URL:
+            response = requests.get(
+                f"{OWM_BASE_URL}/geo/1.0/direct",
+                params={'q': location, 'limit': 1, 'appid': os.getenv('PYTHON_WEATHER_API_KEY')},
+                timeout=10
+            )
+            response.raise_for_status()
+            matches = response.json()
+            if not matches:
                 raise ValueError(f"No weather data found for location: {location}")
-            
-            weather = observation.weather
-            
-            # Get temperature in Fahrenheit
-            temp_f = weather.temperature('fahrenheit')['temp']
-            
-            # Create weather analysis prompt
-            weather_prompt = f"""Analyze the following weather data and provide clothing recommendations:
-            Temperature: {temp_f}°F
-            Conditions: {weather.detailed_status}
-            Humidity: {weather.humidity}%
-            Wind Speed: {weather.wind()['speed']} mph
-            
-            Provide recommendations in JSON format:
-            {{
-                "temperature_category": "cold|cool|mild|warm|hot",
-                "weather_conditions": ["rainy", "windy", "sunny", etc],
-                "clothing_recommendations": ["light layers", "rain gear", etc],
-                "special_considerations": ["UV protection", "wind resistance", etc]
-            }}"""
-            
-            weather_task = Task(
-                description=weather_prompt,
-                agent=self.agent,
-                expected_output="JSON formatted weather analysis with clothing recommendations with no ``` or 'JSON' text outside the JSON code."
+            match = matches[0]
+            return {'lat': match['lat'], 'lon': match['lon'], 'name': match.get('name'), 'country': match.get('country')}
+
+        matches = self.owm.geocoding_manager().geocode(location, limit=1)
+        if not matches:
+            raise ValueError(f"No weather data found for location: {location}")
+        match = matches[0]
+        return {'lat': match.lat, 'lon': match.lon, 'name': match.name, 'country': match.country}
+
+    def _fetch_observation(self, lat: float, lon: float) -> Dict[str, Any]:
+        if OWM_BASE_URL:
+            response = requests.get(
+                f"{OWM_BASE_URL}/data/2.5/weather",
+                params={'lat': lat, 'lon': lon, 'appid': os.getenv('PYTHON_WEATHER_API_KEY'), 'units': 'imperial'},
+                timeout=10
             )
-            
-            crew = Crew(
-                agents=[self.agent],
-                tasks=[weather_task],
-                verbose=True
+            if response.status_code == 404:
+                raise ValueError(f"No weather data found at {lat}, {lon}")
+            response.raise_for_status()
+            data = response.json()
+            return {
+                'temperature': data['main']['temp'],
+                'conditions': data['weather'][0]['description'],
+                'humidity': data['main']['humidity'],
+                'wind_speed': data['wind']['speed']
+            }
+
+        observation = self.owm.weather_manager().weather_at_coords(lat, lon)
+        if not observation:
+            raise ValueError(f"No weather data found at {lat}, {lon}")
+
+        return pyowm_fields(observation.weather)
+
+    def _forecast(self, location: str) -> Dict[str, Any]:
+        """Fetch the 3-hourly forecast for a location, shared per grid cell like observations."""
+        place = get_location_cache().resolve(location, self._geocode)
+        cell = grid_cell(place['lat'], place['lon'])
+        return get_weather_grid().get(
+            ('forecast',) + cell,
+            lambda: cassette.call('owm_forecast', {'cell': list(cell)}, lambda: self._fetch_forecast(*cell))
+        )
+
+    def _fetch_forecast(self, lat: float, lon: float) -> Dict[str, Any]:
+        if OWM_BASE_URL:
+            response = requests.get(
+                f"{OWM_BASE_URL}/data/2.5/forecast",
+                params={'lat': lat, 'lon': lon, 'appid': os.getenv('PYTHON_WEATHER_API_KEY'), 'units': 'imperial'},
+                timeout=10
             )
-            
-            result = crew.kickoff()
-            
-            # Parse the result
-            try:
-                if isinstance(result, str):
-                    # Remove markdown code block formatting if present
-                    if result.startswith('```json'):
-                        result = result[7:]  # Remove ```json
-                    if result.startswith('```'):
-                        result = result[3:]  # Remove ```
-                    if result.endswith('```'):
-                        result = result[:-3]  # Remove trailing ```
-                    result = result.strip()  # Remove any extra whitespace
-                    weather_analysis = json.loads(result)
-                else:
-                    # Handle non-string results
-                    result_str = result.raw if hasattr(result, 'raw') else str(result)
-                    if result_str.startswith('```json'):
-                        result_str = result_str[7:]
-                    if result_str.startswith('```'):
-                        result_str = result_str[3:]
-                    if result_str.endswith('```'):
-                        result_str = result_str[:-3]
-                    result_str = result_str.strip()
-                    weather_analysis = json.loads(result_str)
-            except json.JSONDecodeError as e:
-                print(f"Error parsing weather analysis: {str(e)}")
-                print(f"Raw result: {result}")
-                # Create a default analysis based on temperature
-                weather_analysis = {
-                    "temperature_category": "mild" if 60 <= temp_f <= 75 else "warm" if temp_f > 75 else "cool",
-                    "weather_conditions": [weather.detailed_status.lower()],
-                    "clothing_recommendations": ["appropriate layers for the temperature"],
-                    "special_considerations": ["check local weather conditions"]
-                }
+            response.raise_for_status()
+            data = response.json()
+            return {
+                'utc_offset': data.get('city', {}).get('timezone', 0),
+                'entries': [
+                    {
+                        'dt': entry['dt'],
+                        'temperature': entry['main']['temp'],
+                        'conditions': entry['weather'][0]['description'],
+                        'humidity': entry['main']['humidity'],
+                        'wind_speed': entry['wind']['speed']
+                    }
+                    for entry in data['list']
+                ]
+            }
+
+        forecaster = self.owm.weather_manager().forecast_at_coords(lat, lon, '3h')
+        return {
+            # pyowm doesn't expose the location's UTC offset, so approximate it from the longitude
+            'utc_offset': round(lon / 15) * 3600,
+            'entries': [
+                dict(pyowm_fields(weather), dt=weather.reference_time())
+                for weather in forecaster.forecast.weathers
+            ]
+        }
+
+    def get_forecast(self, location: str, days: int) -> List[Dict[str, Any]]:
+        """Weather for each of the next `days` local days from a single forecast call.
+
+        Each day has the same raw_data/analysis shape as get_weather, plus its date and an
+        'estimated' flag for days past the forecast horizon. Returns None on failure.
+        """
+        try:
+            forecast = self._forecast(location)
+        except Exception as e:
+            print(f"Error fetching weather forecast: {str(e)}")
+            return None
+
+        today = (datetime.now(timezone.utc) + timedelta(seconds=forecast['utc_offset'])).date()
+        return [
+            {
+                'date': day.isoformat(),
+                'raw_data': raw_data or {},
+                'analysis': heuristics.weather_analysis(raw_data),
+                'estimated': estimated
+            }
+            for day, raw_data, estimated in daily_summaries(forecast['entries'], forecast['utc_offset'], today, days)
+        ]
+
+    def get_weather(self, location: str) -> Dict[str, Any]:
+        """Fetch weather data and derive clothing tags and recommendations from the local rules."""
+        try:
+            # Get weather data
+            raw_data = self._observe(location)
+            weather_analysis = self.rules.analyze(raw_data)
+            if self.narrative:
+                narrative = self._narrate(raw_data, weather_analysis)
+                if narrative:
+                    weather_analysis['narrative'] = narrative
             
             return {
-                'raw_data': {
-                    'temperature': temp_f,
-                    'conditions': weather.detailed_status,
-                    'humidity': weather.humidity,
-                    'wind_speed': weather.wind()['speed']
-                },
+                'raw_data': raw_data,
                 'analysis': weather_analysis
             }
             
@@ -129,14 +260,44 @@ class WeatherAgent:
             print(f"Error fetching weather data: {str(e)}")
             return None
 
+    def _narrate(self, raw_data: Dict[str, Any], weather_analysis: Dict[str, Any]) -> str:
+        """Ask the LLM for a short, friendly weather summary; the analysis itself never depends on it."""
+        narrative_prompt = f"""Write two or three friendly sentences describing today's weather and what to wear.
+        Temperature: {raw_data['temperature']}°F
+        Conditions: {raw_data['conditions']}
+        Humidity: {raw_data['humidity']}%
+        Wind Speed: {raw_data['wind_speed']} mph
+        Clothing recommendations: {", ".join(weather_analysis['clothing_recommendations'])}
+        Special considerations: {", ".join(weather_analysis['special_considerations']) or "none"}"""
+        
+        narrative_task = Task(
+            description=narrative_prompt,
+            agent=self.agent,
+            expected_output="A short plain-text weather summary, with no JSON or markdown."
+        )
+        
+        crew = Crew(
+            agents=[self.agent],
+            tasks=[narrative_task],
+            verbose=True
+        )
+        
+        try:
+            with telemetry.track('weather_analysis', agent='Weather Analyst', model=self.llm.model) as call:
+                result = _kickoff(crew, narrative_task, call)
+                call.set_usage(result)
+                narrative = (result if isinstance(result, str) else getattr(result, 'raw', str(result))).strip()
+                call.set_parsed(bool(narrative))
+                return narrative
+        except Exception as e:
+            # The narrative is optional, so a failing LLM only costs the summary text
+            print(f"Warning: Weather narrative unavailable: {str(e)}")
+            return ""
+
 
 class WardrobeAgent:
-    def __init__(self, wardrobe_items: List[Dict[str, Any]]):
-        self.llm = LLM(
-            model="mistral/mistral-large-latest",
-            api_key=os.getenv("MISTRAL_API_KEY"),
-            temperature=0.7
-        )
+    def __init__(self, wardrobe_items: List[Dict[str, Any]], wear_index=None):
+        self.llm = _mistral_llm('filter')
         
         self.agent = Agent(
             role='Wardrobe Manager',
@@ -148,8 +309,11 @@ class WardrobeAgent:
             llm=self.llm
         )
         self.wardrobe_items = wardrobe_items
+        self.wardrobe_version = wardrobe_version(wardrobe_items)
+        self.wear_index = wear_index or get_wear_index()
 
     def filter(self, context: Dict[str, Any]):
+        candidates = prune_items(self.wardrobe_items, context, FILTER_ITEMS_PER_SLOT, version=self.wardrobe_version, wear_index=self.wear_index)
         filter_task = Task(
             description=f"""Filter the wardrobe items based on the following context:
             Weather: {context.get('weather', {})}
@@ -157,7 +321,7 @@ class WardrobeAgent:
             Activity: {context.get('activity', 'general')}
             
             Available Items:
-            {json.dumps(self.wardrobe_items, indent=2)}
+            {json.dumps(candidates, indent=2)}
             
             Return filtered items in JSON format:
             {{
@@ -179,73 +343,67 @@ class WardrobeAgent:
             verbose=True
         )
         
-        result = crew.kickoff()
+        with telemetry.track('filter', agent='Wardrobe Manager', model=self.llm.model) as call:
+            result = _kickoff(crew, filter_task, call)
+            call.set_usage(result)
 
-        try:
-            if isinstance(result, str):
-                # Remove markdown code block formatting if present
-                if result.startswith('```json'):
-                    result = result[7:]  # Remove ```json
-                if result.startswith('```'):
-                    result = result[3:]  # Remove ```
-                if result.endswith('```'):
-                    result = result[:-3]  # Remove trailing ```
-                result = result.strip()  # Remove any extra whitespace
-                return json.loads(result)
-            else:
-                # Handle non-string results
-                result_str = result.raw if hasattr(result, 'raw') else str(result)
-                if result_str.startswith('```json'):
-                    result_str = result_str[7:]
-                if result_str.startswith('```'):
-                    result_str = result_str[3:]
-                if result_str.endswith('```'):
-                    result_str = result_str[:-3]
-                result_str = result_str.strip()
-                return json.loads(result_str)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing wardrobe items: {str(e)}")
-            print(f"Raw result: {result}")
-            # Return a default filtered wardrobe
-            return {
-                "matching_items": [
-                    {
-                        "id": "default",
-                        "type": "t-shirt",
-                        "form": "casual",
-                        "weather": ["mild"],
-                        "color": "neutral",
-                        "notes": "Basic casual item"
-                    }
-                ],
-                "excluded_items": [
-                    {
-                        "id": "all_others",
-                        "reason": "Error occurred while filtering items"
-                    }
-                ]
-            }
+            try:
+                filtered = _parse_json_output(result)
+                call.set_parsed(True)
+                return filtered
+            except json.JSONDecodeError as e:
+                call.set_parsed(False)
+                print(f"Error parsing wardrobe items: {str(e)}")
+                print(f"Raw result: {result}")
+                # Return a default filtered wardrobe
+                return {
+                    "matching_items": [
+                        {
+                            "id": "default",
+                            "type": "t-shirt",
+                            "form": "casual",
+                            "weather": ["mild"],
+                            "color": "neutral",
+                            "notes": "Basic casual item"
+                        }
+                    ],
+                    "excluded_items": [
+                        {
+                            "id": "all_others",
+                            "reason": "Error occurred while filtering items"
+                        }
+                    ]
+                }
 
 class OutfitGeneratorAgent:
-    def __init__(self):
-        self.llm = LLM(
-            model="mistral/mistral-large-latest",
-            api_key=os.getenv("MISTRAL_API_KEY"),
-            temperature=0.7
-        )
+    def __init__(self, wear_index=None):
+        self.llm = _mistral_llm('outfit')
+        # Single-slot swaps are a simpler task, so they get their own (usually smaller) model
+        self.swap_llm = _mistral_llm('swap')
+        self.plan_llm = _mistral_llm('plan')
+        self.packing_llm = _mistral_llm('packing')
+        self.wear_index = wear_index or get_wear_index()
         
-        self.agent = Agent(
+        self.agent = self._build_agent(self.llm)
+        self.swap_agent = self._build_agent(self.swap_llm)
+        self.plan_agent = self._build_agent(self.plan_llm)
+        self.packing_agent = self._build_agent(self.packing_llm)
+
+    @staticmethod
+    def _build_agent(llm):
+        return Agent(
             role='Outfit Generator',
             goal='Generate appropriate outfit combinations',
             backstory="""You are an expert at creating stylish and appropriate outfit combinations.
             You understand how to match different clothing items, consider weather conditions,
             and maintain a good balance of style and comfort.""",
             verbose=True,
-            llm=self.llm
+            llm=llm
         )
     
-    def generate_tops(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_bottoms: List[Dict[str, Any]], current_shoes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_tops(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_bottoms: List[Dict[str, Any]], current_shoes: List[Dict[str, Any]], wardrobe_version: str = None) -> Dict[str, Any]:
         """Generate alternative top suggestions while keeping the same bottoms and shoes."""
+        available_items = prune_items(available_items, context, GENERATOR_ITEMS_PER_SLOT, slots=('top',), extra_items=current_bottoms + current_shoes, version=wardrobe_version, wear_index=self.wear_index)
         tops_task = Task(
             description=f"""Generate alternative top suggestions while keeping the same bottoms and shoes.
             Current Bottoms: {json.dumps(current_bottoms, indent=2)}
@@ -272,23 +430,27 @@ class OutfitGeneratorAgent:
                     "recommendation2"
                 ]
             }}""",
-            agent=self.agent,
+            agent=self.swap_agent,
             expected_output="JSON formatted top suggestions with recommendations."
         )
         
         crew = Crew(
-            agents=[self.agent],
+            agents=[self.swap_agent],
             tasks=[tops_task],
             verbose=True
         )
         
-        result = crew.kickoff()
-        output = self._parse_result(result)
+        with telemetry.track('swap_tops', agent='Outfit Generator', model=self.swap_llm.model) as call:
+            result = _kickoff(crew, tops_task, call)
+            call.set_usage(result)
+            output = self._parse_result(result)
+            call.set_parsed('error' not in output)
         output["tops"] = [output["tops"][0]]
         return output
 
-    def generate_bottoms(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_tops: List[Dict[str, Any]], current_shoes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_bottoms(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_tops: List[Dict[str, Any]], current_shoes: List[Dict[str, Any]], wardrobe_version: str = None) -> Dict[str, Any]:
         """Generate alternative bottom suggestions while keeping the same tops and shoes."""
+        available_items = prune_items(available_items, context, GENERATOR_ITEMS_PER_SLOT, slots=('bottom',), extra_items=current_tops + current_shoes, version=wardrobe_version, wear_index=self.wear_index)
         bottoms_task = Task(
             description=f"""Generate alternative bottom suggestions while keeping the same tops and shoes.
             Current Tops: {json.dumps(current_tops, indent=2)}
@@ -317,23 +479,27 @@ class OutfitGeneratorAgent:
             }}
             REMEMBER TO RETURN ONLY THE NEW SUGGESTION (NOT THE OLD BOTTOMS) IN JSON FORMAT.
             """,
-            agent=self.agent,
+            agent=self.swap_agent,
             expected_output="JSON formatted bottom suggestions with recommendations."
         )
         
         crew = Crew(
-            agents=[self.agent],
+            agents=[self.swap_agent],
             tasks=[bottoms_task],
             verbose=True
         )
         
-        result = crew.kickoff()
-        output = self._parse_result(result)
+        with telemetry.track('swap_bottoms', agent='Outfit Generator', model=self.swap_llm.model) as call:
+            result = _kickoff(crew, bottoms_task, call)
+            call.set_usage(result)
+            output = self._parse_result(result)
+            call.set_parsed('error' not in output)
         output["bottoms"] = [output["bottoms"][0]]
         return output
 
-    def generate_shoes(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_tops: List[Dict[str, Any]], current_bottoms: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def generate_shoes(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], current_tops: List[Dict[str, Any]], current_bottoms: List[Dict[str, Any]], wardrobe_version: str = None) -> Dict[str, Any]:
         """Generate alternative shoe suggestions while keeping the same tops and bottoms."""
+        available_items = prune_items(available_items, context, GENERATOR_ITEMS_PER_SLOT, slots=('shoes',), extra_items=current_tops + current_bottoms, version=wardrobe_version, wear_index=self.wear_index)
         shoes_task = Task(
             description=f"""Generate alternative shoe suggestions while keeping the same tops and bottoms.
             Current Tops: {json.dumps(current_tops, indent=2)}
@@ -360,45 +526,28 @@ class OutfitGeneratorAgent:
                     "recommendation2"
                 ]
             }}""",
-            agent=self.agent,
+            agent=self.swap_agent,
             expected_output="JSON formatted shoe suggestions with recommendations."
         )
         
         crew = Crew(
-            agents=[self.agent],
+            agents=[self.swap_agent],
             tasks=[shoes_task],
             verbose=True
         )
         
-        result = crew.kickoff()
-        output = self._parse_result(result)
+        with telemetry.track('swap_shoes', agent='Outfit Generator', model=self.swap_llm.model) as call:
+            result = _kickoff(crew, shoes_task, call)
+            call.set_usage(result)
+            output = self._parse_result(result)
+            call.set_parsed('error' not in output)
         output["shoes"] = [output["shoes"][0]]
         return output
 
     def _parse_result(self, result) -> Dict[str, Any]:
         """Helper method to parse the result from the LLM."""
         try:
-            if isinstance(result, str):
-                # Remove markdown code block formatting if present
-                if result.startswith('```json'):
-                    result = result[7:]  # Remove ```json
-                if result.startswith('```'):
-                    result = result[3:]  # Remove ```
-                if result.endswith('```'):
-                    result = result[:-3]  # Remove trailing ```
-                result = result.strip()  # Remove any extra whitespace
-                return json.loads(result)
-            else:
-                # Handle non-string results
-                result_str = result.raw if hasattr(result, 'raw') else str(result)
-                if result_str.startswith('```json'):
-                    result_str = result_str[7:]
-                if result_str.startswith('```'):
-                    result_str = result_str[3:]
-                if result_str.endswith('```'):
-                    result_str = result_str[:-3]
-                result_str = result_str.strip()
-                return json.loads(result_str)
+            return _parse_json_output(result)
         except json.JSONDecodeError as e:
             print(f"Error parsing suggestions: {str(e)}")
             print(f"Raw result: {result}")
@@ -407,8 +556,19 @@ class OutfitGeneratorAgent:
                 "raw_result": str(result)
             }
 
-    def generate_outfit(self, context: Dict[str, Any], available_items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate outfit suggestions based on context and available items."""
+    def generate_outfit(self, context: Dict[str, Any], available_items: List[Dict[str, Any]], wardrobe_version: str = None) -> Dict[str, Any]:
+        """Generate outfit suggestions based on context and available items.
+
+        wardrobe_version, the version the items were taken from, lets repeat calls reuse the retrieval index.
+        """
+        wear_index = self.wear_index
+        available_items = prune_items(available_items, context, GENERATOR_ITEMS_PER_SLOT, version=wardrobe_version, wear_index=wear_index)
+        recently_worn = wear_index.recently_worn(item.get('id') for item in available_items if isinstance(item, dict))
+        rotation_note = ""
+        if recently_worn:
+            rotation_note = "Recently worn (prefer other items when they fit just as well): " + ", ".join(
+                f"{item_id} ({days} days ago)" for item_id, days in sorted(recently_worn.items(), key=lambda pair: pair[1])
+            )
         outfit_task = Task(
         description=f"""You must create an outfit that includes EXACTLY one top, one bottom, and one shoe. This is a strict requirement.
         If there are no bottoms (pants/shorts) in the available items, you MUST find one from the worn items.
@@ -419,6 +579,7 @@ class OutfitGeneratorAgent:
         Weather: {context.get('weather', {})}
         Formality: {context.get('formality', 'casual')}
         Activity: {context.get('activity', 'general')}
+        {rotation_note}
 
         Available Items:
         {json.dumps(available_items, indent=2)}
@@ -438,11 +599,17 @@ class OutfitGeneratorAgent:
                     "formality_level": "formality_level"
                 }}
             ],
+            "alternatives": {{
+                "top": ["item_id", ...],     # Other tops that go with the chosen bottom and shoes, best first
+                "bottom": ["item_id", ...],  # Other bottoms that go with the chosen top and shoes, best first
+                "shoes": ["item_id", ...]    # Other shoes that go with the chosen top and bottom, best first
+            }},
             "recommendations": [
                 "recommendation1",
                 "recommendation2"
             ]
-        }}""",           
+        }}
+        List up to {MAX_ALTERNATIVES} alternatives per slot, only from the Available Items, and never repeat the chosen item.""",           
             agent=self.agent,
             expected_output="JSON formatted outfit suggestions with recommendations."
         )
@@ -453,288 +620,651 @@ class OutfitGeneratorAgent:
             verbose=True
         )
         
-        result = crew.kickoff()
+        with telemetry.track('outfit', agent='Outfit Generator', model=self.llm.model) as call:
+            result = _kickoff(crew, outfit_task, call)
+            call.set_usage(result)
+
+            # Parse the result
+            try:
+                outfit = _parse_json_output(result)
+                call.set_parsed(True)
+                return outfit
+            except json.JSONDecodeError as e:
+                call.set_parsed(False)
+                print(f"Error parsing outfit suggestions: {str(e)}")
+                print(f"Raw result: {result}")
+                # Return a default outfit suggestion
+                return {
+                    "outfits": [
+                        {
+                            "name": "Default Casual Outfit",
+                            "items": [
+                                "item_id1",
+                                "item_id2",
+                                "item_id3"
+                            ],
+                            "style_notes": "Basic casual outfit",
+                            "weather_compatibility": "Suitable for mild weather",
+                            "formality_level": "casual"
+                        }
+                    ],
+                    "recommendations": [
+                        "Check the weather forecast for more specific recommendations",
+                        "Consider your activity level when choosing layers",
+                        "Make sure your shoes are appropriate for the weather conditions"
+                    ]
+                }
         
-        # Parse the result
+    def generate_plan(self, days: List[Dict[str, Any]], available_items: List[Dict[str, Any]], laundry_cycle_days: int) -> Dict[str, Any]:
+        """Plan an outfit for every day in one call; the caller still checks it against the laundry rules."""
+        day_lines = "\n".join(
+            f"        {day['date']}: Weather: {day['analysis']}; Formality: {day['formality']}; "
+            f"Activity: {day['activity']}; Calendar activities: {[a['type'] for a in day['calendar_info']['activities']] or 'none'}"
+            for day in days
+        )
+        plan_task = Task(
+        description=f"""Plan one outfit for each of the days below. Every outfit must include EXACTLY one top, one bottom, and one shoe.
+        IMPORTANT: You can ONLY use items that are listed in the Available Items below. Each item_id in your response MUST match exactly with an id from the Available Items list.
+        A worn item goes to the laundry for {laundry_cycle_days} days, so do not use any item on two days less than {laundry_cycle_days} days apart.
+        Only if a slot has no unused item left may you reuse the one worn longest ago.
+
+        Days:
+{day_lines}
+
+        Available Items:
+        {json.dumps(available_items, indent=2)}
+
+        Return the plan in JSON format:
+        {{
+            "days": [
+                {{
+                    "date": "YYYY-MM-DD",
+                    "name": "outfit_name",
+                    "items": ["top_id", "bottom_id", "shoe_id"],
+                    "style_notes": "style_notes"
+                }}
+            ],
+            "recommendations": [
+                "recommendation1"
+            ]
+        }}""",
+            agent=self.plan_agent,
+            expected_output="JSON formatted outfit plan with one entry per day."
+        )
+
+        crew = Crew(
+            agents=[self.plan_agent],
+            tasks=[plan_task],
+            verbose=True
+        )
+
+        with telemetry.track('plan', agent='Outfit Planner', model=self.plan_llm.model) as call:
+            result = _kickoff(crew, plan_task, call)
+            call.set_usage(result)
+
+            try:
+                plan = _parse_json_output(result)
+                call.set_parsed(True)
+                return plan
+            except json.JSONDecodeError as e:
+                call.set_parsed(False)
+                print(f"Error parsing outfit plan: {str(e)}")
+                print(f"Raw result: {result}")
+                # Every day is then picked locally
+                return {"days": [], "recommendations": []}
+
+    def explain_packing(self, days: List[Dict[str, Any]], packed_items: List[Dict[str, Any]], packing_result: Dict[str, Any]) -> str:
+        """Ask the LLM to explain a packing list that was already chosen locally; returns "" on failure."""
+        day_lines = "\n".join(
+            f"        {day['date']} in {day['location']}: {day['weather']['raw_data'].get('temperature', 'N/A')}°F, "
+            f"{day['weather']['raw_data'].get('conditions', 'unknown')} ({day['analysis'].get('temperature_category', 'mild')})"
+            for day in days
+        )
+        item_lines = "\n".join(
+            f"        {item['id']}: {item.get('color', '')} {item.get('form', '')} {item.get('type', '')}, for {', '.join(item.get('weather', [])) or 'any weather'}"
+            for item in packed_items
+        )
+        explain_task = Task(
+            description=f"""Explain this packing list for a trip in three or four friendly sentences: why these items cover
+        every day's weather, which pieces do double duty, and anything to watch out for. Do not add or remove items.
+
+        Days:
+{day_lines}
+
+        Packed items:
+{item_lines}
+
+        Most wears per item: {packing_result['max_wears']}
+        Coverage warnings: {"; ".join(packing_result['gaps']) or "none"}""",
+            agent=self.packing_agent,
+            expected_output="A short plain-text explanation, with no JSON or markdown."
+        )
+
+        crew = Crew(
+            agents=[self.packing_agent],
+            tasks=[explain_task],
+            verbose=True
+        )
+
         try:
-            if isinstance(result, str):
-                # Remove markdown code block formatting if present
-                if result.startswith('```json'):
-                    result = result[7:]  # Remove ```json
-                if result.startswith('```'):
-                    result = result[3:]  # Remove ```
-                if result.endswith('```'):
-                    result = result[:-3]  # Remove trailing ```
-                result = result.strip()  # Remove any extra whitespace
-                return json.loads(result)
-            else:
-                # Handle non-string results
-                result_str = result.raw if hasattr(result, 'raw') else str(result)
-                if result_str.startswith('```json'):
-                    result_str = result_str[7:]
-                if result_str.startswith('```'):
-                    result_str = result_str[3:]
-                if result_str.endswith('```'):
-                    result_str = result_str[:-3]
-                result_str = result_str.strip()
-                return json.loads(result_str)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing outfit suggestions: {str(e)}")
-            print(f"Raw result: {result}")
-            # Return a default outfit suggestion
-            return {
-                "outfits": [
-                    {
-                        "name": "Default Casual Outfit",
-                        "items": [
-                            "item_id1",
-                            "item_id2",
-                            "item_id3"
-                        ],
-                        "style_notes": "Basic casual outfit",
-                        "weather_compatibility": "Suitable for mild weather",
-                        "formality_level": "casual"
-                    }
-                ],
-                "recommendations": [
-                    "Check the weather forecast for more specific recommendations",
-                    "Consider your activity level when choosing layers",
-                    "Make sure your shoes are appropriate for the weather conditions"
-                ]
-            }
-        
+            with telemetry.track('packing', agent='Outfit Generator', model=self.packing_llm.model) as call:
+                result = _kickoff(crew, explain_task, call)
+                call.set_usage(result)
+                explanation = (result if isinstance(result, str) else getattr(result, 'raw', str(result))).strip()
+                call.set_parsed(bool(explanation))
+                return explanation
+        except Exception as e:
+            # The packing list stands on its own, so a failing LLM only costs the explanation
+            print(f"Warning: Packing explanation unavailable: {str(e)}")
+            return ""
+
+
+def wardrobe_version(items: List[Dict[str, Any]]) -> str:
+    """Fingerprint a list of wardrobe items so a snapshot can tell when it went stale."""
+    return hashlib.sha1(json.dumps(items, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class OutfitContext:
+    """Snapshot of the weather analysis, calendar info and filtered items behind a suggestion.
+
+    suggest_outfit returns it under 'context'; passing it back to the swap methods lets them
+    skip the weather, calendar and filtering stages and pay only for their generation call.
+    """
+    def __init__(self, request, prompt_context, weather, calendar_info, filtered_items, wardrobe_version):
+        self.request = request
+        self.prompt_context = prompt_context
+        self.weather = weather
+        self.calendar_info = calendar_info
+        self.filtered_items = filtered_items
+        self.wardrobe_version = wardrobe_version
+        self.created_at = datetime.now()
+
+    def matches(self, request, wardrobe_version: str) -> bool:
+        """Check the snapshot was built for the same location, formality, activity and wardrobe."""
+        return self.request == tuple(request) and self.wardrobe_version == wardrobe_version
 
 class OutfitSuggestionCrew:
-    def __init__(self, wardrobe_items: List[Dict[str, Any]]):
+    def __init__(self, wardrobe_items: List[Dict[str, Any]], calendar_ids: List[str] = None, store=None):
+        self.store = store or get_store()
+        wear_index = get_wear_index(self.store)
         self.weather_agent = WeatherAgent()
-        self.wardrobe_agent = WardrobeAgent(wardrobe_items)
-        self.outfit_generator = OutfitGeneratorAgent()
+        self.wardrobe_agent = WardrobeAgent(wardrobe_items, wear_index)
+        self.outfit_generator = OutfitGeneratorAgent(wear_index)
+        self.wardrobe_version = wardrobe_version(wardrobe_items)
         
-        # Initialize calendar manager
+        # Initialize calendar manager, with the user's own Google token
         credentials_path = os.getenv('GOOGLE_CALENDAR_CREDENTIALS_PATH')
         if credentials_path:
-            self.calendar_manager = CalendarManager(credentials_path)
+            self.calendar_manager = get_calendar_manager(credentials_path, calendar_ids, self.store.token_path)
         else:
             self.calendar_manager = None
     
     def _check_calendar_events(self) -> Dict[str, Any]:
         """Check calendar events for today to determine formality and activities."""
-        if not self.calendar_manager:
-            return {
-                'formality': 'casual',
-                'activities': []
-            }
-        
-        try:
-            # Get today's events
-            today = datetime.now().date()
-            events = self.calendar_manager.get_events(1)  # Get events for next 24 hours
-            
-            formality = 'casual'
-            activities = []
-            
-            for event in events:
-                start = datetime.fromisoformat(event['start']['dateTime'].replace('Z', '+00:00'))
-                if start.date() == today:
-                    # Check for formal events
-                    if any(keyword in event['summary'].lower() for keyword in ['meeting', 'interview', 'competition', 'presentation']):
-                        formality = 'formal'
-                    
-                    # Check for athletic activities
-                    if any(keyword in event['summary'].lower() for keyword in ['practice', 'training', 'workout', 'gym']):
-                        activities.append({
-                            'type': 'athletic',
-                            'time': start.strftime('%H:%M'),
-                            'duration': event.get('duration', '1h')
-                        })
-            
-            return {
-                'formality': formality,
-                'activities': activities
-            }
-            
-        except Exception as e:
-            print(f"Warning: Could not check calendar events: {str(e)}")
-            return {
-                'formality': 'casual',
-                'activities': []
-            }
+        # Same computation as the multi-day planner, since both share the per-day memo
+        today = datetime.now().date()
+        return self._calendar_for_days([today])[today]
     
-    def suggest_outfit(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", available_items=None) -> Dict[str, Any]:
-        """Generate outfit suggestions based on weather, wardrobe, and context."""
+    def build_context(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", available_items: List[Dict[str, Any]] = None, progress: Dict[str, Any] = None, cancelled: threading.Event = None) -> "OutfitContext":
+        """Gather calendar, weather and filtered items once so several generation calls can share them.
+
+        Each stage's result is also stored in progress, if given, so a fallback can reuse it.
+        Returns None without running the wardrobe filter once cancelled is set.
+        """
+        progress = progress if progress is not None else {}
         # Get calendar events
-        calendar_info = self._check_calendar_events()
-        
-        # Use calendar formality if not specified
-        if formality is None:
-            formality = calendar_info['formality']
+        calendar_info = progress['calendar_info'] = self._check_calendar_events()
         
         # Get weather data
         weather_data = self.weather_agent.get_weather(location)
-        if not weather_data:
-            return {"error": "Could not fetch weather data"}
-        
-        # Create context
+        if not weather_data or _stopped(cancelled):
+            return None
+        progress['weather'] = weather_data
+        return self._filtered_context(location, formality, activity, available_items, calendar_info, weather_data)
+
+    def _filtered_context(self, location, formality, activity, available_items, calendar_info, weather_data) -> "OutfitContext":
+        """Run the wardrobe filter for gathered weather and calendar info and wrap it all in a snapshot."""
+        resolved_formality = formality if formality is not None else calendar_info['formality']
         context = {
             'weather': weather_data['analysis'],
-            'formality': formality,
+            'formality': resolved_formality,
             'activity': activity
         }
         
         # Filter wardrobe items
         if available_items is not None:
             filtered_items = {"matching_items": available_items}
+            version = wardrobe_version(available_items)
         else:
             filtered_items = self.wardrobe_agent.filter(context)
+            filtered_items['matching_items'] = self._resolve_items(filtered_items.get('matching_items', []))
+            version = self.wardrobe_version
+        
+        return OutfitContext(
+            request=(location, formality, activity),
+            prompt_context=context,
+            weather=weather_data,
+            calendar_info=calendar_info,
+            filtered_items=filtered_items,
+            wardrobe_version=version
+        )
+
+    def _resolve_items(self, matching_items):
+        """Swap the bare ids the filter returns for the full item records, so later stages can rank them."""
+        items_by_id = {item['id']: item for item in self.wardrobe_agent.wardrobe_items}
+        return [items_by_id.get(item, item) if isinstance(item, str) else item for item in matching_items]
+
+    def _reuse_context(self, context, location, formality, activity, available_items, progress=None, cancelled=None):
+        """Return the given snapshot if it still fits the request, otherwise build a fresh one."""
+        version = wardrobe_version(available_items) if available_items is not None else self.wardrobe_version
+        if context is not None and context.matches((location, formality, activity), version):
+            return context
+        return self.build_context(location, formality, activity, available_items, progress, cancelled)
+
+    def _response(self, snapshot, suggestions):
+        return {
+            'weather': snapshot.weather,
+            'available_items': snapshot.filtered_items,
+            'suggestions': suggestions,
+            'calendar_info': snapshot.calendar_info,
+            'context': snapshot
+        }
+
+    def suggest_outfit(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", available_items=None, context: "OutfitContext" = None, deadline: float = SUGGEST_DEADLINE_SECONDS) -> Dict[str, Any]:
+        """Generate outfit suggestions based on weather, wardrobe, and context.
+
+        If the LLM stages can't finish within deadline seconds, fail, or the circuit breaker
+        is open, a local heuristic picks the outfit instead and the response is marked
+        'degraded'. A deadline of 0 or None waits for the LLM however long it takes.
+        """
+        if not deadline:
+            return self._suggest_outfit(location, formality, activity, available_items, context)
+
+        progress = {}
+        if llm_policy.breaker.is_open():
+            return self._heuristic_outfit(location, formality, activity, available_items, context, progress, "AI stylist unavailable")
+
+        cancelled = threading.Event()
+        future = _pipeline_pool.submit(self._suggest_outfit, location, formality, activity, available_items, context, progress, cancelled)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeout:
+            # A running LLM call can't be interrupted, so the pipeline stops before its next stage
+            # instead of holding a pool worker for calls whose result would be discarded
+            cancelled.set()
+            future.cancel()
+            reason = f"AI stylist took longer than {deadline:g}s"
+        except Exception as e:
+            print(f"Error generating outfit, falling back to the local picker: {str(e)}")
+            reason = "AI stylist unavailable"
+        return self._heuristic_outfit(location, formality, activity, available_items, context, progress, reason)
+
+    def _suggest_outfit(self, location, formality, activity, available_items, context, progress=None, cancelled=None) -> Dict[str, Any]:
+        """The LLM stages of suggest_outfit; returns None before the next stage once cancelled is set."""
+        snapshot = self._reuse_context(context, location, formality, activity, available_items, progress, cancelled)
+        if _stopped(cancelled):
+            return None
+        if snapshot is None:
+            return {"error": "Could not fetch weather data"}
         
         # Generate outfit suggestions
         outfit_suggestions = self.outfit_generator.generate_outfit(
-            context,
-            filtered_items['matching_items']
+            snapshot.prompt_context,
+            snapshot.filtered_items['matching_items'],
+            wardrobe_version=snapshot.wardrobe_version
         )
         
+        if _stopped(cancelled):
+            return None
+
         # If there are athletic activities, generate additional athletic outfits
-        if calendar_info['activities']:
-            athletic_context = context.copy()
+        if any(a['type'] == 'athletic' for a in snapshot.calendar_info['activities']):
+            athletic_context = snapshot.prompt_context.copy()
             athletic_context['activity'] = 'athletic'
             athletic_outfits = self.outfit_generator.generate_outfit(
                 athletic_context,
-                filtered_items['matching_items']
+                snapshot.filtered_items['matching_items'],
+                wardrobe_version=snapshot.wardrobe_version
             )
             
             # Add athletic outfits to suggestions
             outfit_suggestions['athletic_outfits'] = athletic_outfits['outfits']
             outfit_suggestions['athletic_recommendations'] = athletic_outfits['recommendations']
         
-        return {
-            'weather': weather_data,
-            'available_items': filtered_items,
-            'suggestions': outfit_suggestions,
-            'calendar_info': calendar_info
-        }
+        return self._response(snapshot, outfit_suggestions)
+
+    def suggest_for_day(self, location: str = "Chicago, US", day_offset: int = 1, formality: str = "Casual", activity: str = "General") -> Dict[str, Any]:
+        """Full suggestion for a later day from its forecast and calendar, e.g. tomorrow's for tools/precompute.py."""
+        forecast = self.weather_agent.get_forecast(location, day_offset + 1)
+        if not forecast:
+            return {"error": "Could not fetch weather forecast"}
+        weather_data = forecast[day_offset]
+        day = datetime.fromisoformat(weather_data['date']).date()
+        calendar_info = self._calendar_for_days([day])[day]
+        snapshot = self._filtered_context(location, formality, activity, None, calendar_info, weather_data)
+        return self._suggest_outfit(location, formality, activity, None, snapshot)
+
+    def precomputed_outfit(self, location: str, formality: str, activity: str, claim: bool = True) -> Dict[str, Any]:
+        """Return the suggestion precomputed overnight for today if it still fits, otherwise None.
+
+        It fits when it was made for this request, its items are all still in the wardrobe and
+        today's forecast is in the same weather bucket as when it was computed. The check costs
+        one forecast lookup, usually already cached for the grid cell. Each entry is served
+        once, so asking again generates a fresh outfit. With claim=False the entry is only looked
+        up; whoever shows it to the user must then call precompute.claim for its date.
+        """
+        entry = precompute.load(self.store)
+        if not entry or entry.get('served') or entry.get('request') != [location, formality, activity]:
+            return None
+        outfits = entry['response']['suggestions'].get('outfits', [])
+        wardrobe_ids = {item['id'] for item in self.wardrobe_agent.wardrobe_items}
+        if not outfits or not set(outfits[0].get('items', [])) <= wardrobe_ids:
+            return None
+
+        forecast = self.weather_agent.get_forecast(location, 1)
+        if not forecast or forecast[0]['date'] != entry['date']:
+            return None
+        if precompute.weather_bucket(forecast[0]['analysis']) != entry['weather_bucket']:
+            return None
+        if claim and not precompute.claim(self.store, entry['date']):
+            return None
 
-    def suggest_tops(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_bottoms: List[Dict[str, Any]] = None, current_shoes: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = dict(entry['response'], weather=forecast[0])
+        response['precomputed'] = True
+        return response
+
+    def prefetch_outfit(self, location: str, formality: str, activity: str, cancelled) -> Dict[str, Any]:
+        """suggest_outfit for a speculative request, preferring the overnight precompute.
+
+        Checks the cancelled event before each LLM stage and returns None once it is set. The
+        overnight entry isn't claimed here, since the user may never ask; see precomputed_outfit.
+        """
+        precomputed = self.precomputed_outfit(location, formality, activity, claim=False)
+        if precomputed or cancelled.is_set():
+            return precomputed
+        snapshot = self.build_context(location, formality, activity, cancelled=cancelled)
+        if snapshot is None or cancelled.is_set():
+            return None
+        return self.suggest_outfit(location, formality, activity, context=snapshot)
+
+    def _fallback_weather(self, location: str) -> Dict[str, Any]:
+        """Observation plus rule-based analysis, giving up on the observation after FALLBACK_WEATHER_SECONDS."""
+        try:
+            raw_data = _observation_pool.submit(self.weather_agent._observe, location).result(timeout=FALLBACK_WEATHER_SECONDS)
+        except Exception as e:
+            print(f"Warning: No weather for the fallback outfit: {str(e)}")
+            raw_data = None
+        return {'raw_data': raw_data or {}, 'analysis': heuristics.weather_analysis(raw_data)}
+
+    def _heuristic_outfit(self, location, formality, activity, available_items, context, progress, reason) -> Dict[str, Any]:
+        """Pick an outfit locally, reusing whatever the interrupted pipeline had already gathered."""
+        version = wardrobe_version(available_items) if available_items is not None else self.wardrobe_version
+        if context is not None and context.matches((location, formality, activity), version):
+            progress = {'calendar_info': context.calendar_info, 'weather': context.weather}
+
+        calendar_info = progress.get('calendar_info') or {'formality': 'casual', 'activities': []}
+        weather = progress.get('weather') or self._fallback_weather(location)
+        items = available_items if available_items is not None else self.wardrobe_agent.wardrobe_items
+        resolved_formality = formality if formality is not None else calendar_info['formality']
+
+        suggestions = heuristics.pick_outfit(
+            items, weather['analysis'], resolved_formality, activity, self.outfit_generator.wear_index
+        )
+        snapshot = OutfitContext(
+            request=(location, formality, activity),
+            prompt_context={'weather': weather['analysis'], 'formality': resolved_formality, 'activity': activity},
+            weather=weather,
+            calendar_info=calendar_info,
+            filtered_items={'matching_items': items},
+            wardrobe_version=version
+        )
+        response = self._response(snapshot, suggestions)
+        response['degraded'] = True
+        response['degraded_reason'] = reason
+        return response
+
+    def suggest_tops(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_bottoms: List[Dict[str, Any]] = None, current_shoes: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None, context: "OutfitContext" = None) -> Dict[str, Any]:
         """Generate top suggestions based on weather, wardrobe, and context."""
-        # Get calendar events
-        calendar_info = self._check_calendar_events()
-        
-        # Use calendar formality if not specified
-        if formality is None:
-            formality = calendar_info['formality']
-        
-        # Get weather data
-        weather_data = self.weather_agent.get_weather(location)
-        if not weather_data:
+        snapshot = self._reuse_context(context, location, formality, activity, available_items)
+        if snapshot is None:
             return {"error": "Could not fetch weather data"}
         
-        # Create context
-        context = {
-            'weather': weather_data['analysis'],
-            'formality': formality,
-            'activity': activity
-        }
-        
-        # Filter wardrobe items
-        if available_items is not None:
-            filtered_items = {"matching_items": available_items}
-        else:
-            filtered_items = self.wardrobe_agent.filter(context)
-        
         # Generate top suggestions
         top_suggestions = self.outfit_generator.generate_tops(
-            context,
-            filtered_items['matching_items'],
+            snapshot.prompt_context,
+            snapshot.filtered_items['matching_items'],
             current_bottoms or [],
-            current_shoes or []
+            current_shoes or [],
+            wardrobe_version=snapshot.wardrobe_version
         )
         
-        return {
-            'weather': weather_data,
-            'available_items': filtered_items,
-            'suggestions': top_suggestions,
-            'calendar_info': calendar_info
-        }
+        return self._response(snapshot, top_suggestions)
 
-    def suggest_bottoms(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_tops: List[Dict[str, Any]] = None, current_shoes: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def suggest_bottoms(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_tops: List[Dict[str, Any]] = None, current_shoes: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None, context: "OutfitContext" = None) -> Dict[str, Any]:
         """Generate bottom suggestions based on weather, wardrobe, and context."""
-        # Get calendar events
-        calendar_info = self._check_calendar_events()
-        
-        # Use calendar formality if not specified
-        if formality is None:
-            formality = calendar_info['formality']
-        
-        # Get weather data
-        weather_data = self.weather_agent.get_weather(location)
-        if not weather_data:
+        snapshot = self._reuse_context(context, location, formality, activity, available_items)
+        if snapshot is None:
             return {"error": "Could not fetch weather data"}
         
-        # Create context
-        context = {
-            'weather': weather_data['analysis'],
-            'formality': formality,
-            'activity': activity
-        }
-        
-        # Filter wardrobe items
-        if available_items is not None:
-            filtered_items = {"matching_items": available_items}
-        else:
-            filtered_items = self.wardrobe_agent.filter(context)
-        
         # Generate bottom suggestions
         bottom_suggestions = self.outfit_generator.generate_bottoms(
-            context,
-            filtered_items['matching_items'],
+            snapshot.prompt_context,
+            snapshot.filtered_items['matching_items'],
             current_tops or [],
-            current_shoes or []
+            current_shoes or [],
+            wardrobe_version=snapshot.wardrobe_version
         )
         
-        return {
-            'weather': weather_data,
-            'available_items': filtered_items,
-            'suggestions': bottom_suggestions,
-            'calendar_info': calendar_info
-        }
+        return self._response(snapshot, bottom_suggestions)
 
-    def suggest_shoes(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_tops: List[Dict[str, Any]] = None, current_bottoms: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def suggest_shoes(self, location: str = "Chicago, US", formality: str = "Casual", activity: str = "School", current_tops: List[Dict[str, Any]] = None, current_bottoms: List[Dict[str, Any]] = None, available_items: List[Dict[str, Any]] = None, context: "OutfitContext" = None) -> Dict[str, Any]:
         """Generate shoe suggestions based on weather, wardrobe, and context."""
-        # Get calendar events
-        calendar_info = self._check_calendar_events()
-        
-        # Use calendar formality if not specified
-        if formality is None:
-            formality = calendar_info['formality']
-        
-        # Get weather data
-        weather_data = self.weather_agent.get_weather(location)
-        if not weather_data:
+        snapshot = self._reuse_context(context, location, formality, activity, available_items)
+        if snapshot is None:
             return {"error": "Could not fetch weather data"}
         
-        # Create context
-        context = {
-            'weather': weather_data['analysis'],
-            'formality': formality,
-            'activity': activity
-        }
-        
-        # Filter wardrobe items
-        if available_items is not None:
-            filtered_items = {"matching_items": available_items}
-        else:
-            filtered_items = self.wardrobe_agent.filter(context)
-        
         # Generate shoe suggestions
         shoe_suggestions = self.outfit_generator.generate_shoes(
-            context,
-            filtered_items['matching_items'],
+            snapshot.prompt_context,
+            snapshot.filtered_items['matching_items'],
             current_tops or [],
-            current_bottoms or []
+            current_bottoms or [],
+            wardrobe_version=snapshot.wardrobe_version
         )
         
+        return self._response(snapshot, shoe_suggestions)
+
+    def _calendar_for_days(self, dates) -> Dict[Any, Dict[str, Any]]:
+        """Formality and activities for each date, from a single calendar query covering all of them.
+
+        A day's events are those taking place on it, including ones that started earlier and are
+        still running. Verdicts are memoized per date until the synced events change.
+        """
+        default = {'formality': 'casual', 'activities': []}
+        if not self.calendar_manager:
+            return {day: default for day in dates}
+
+        try:
+            days_ahead = (max(dates) - datetime.now().date()).days + 1
+            events = self.calendar_manager.get_events(max(days_ahead, 1))
+            classifier = get_classifier()
+            return {
+                day: self.calendar_manager.day_verdict(
+                    day, lambda day=day: classifier.classify_events([e for e in events if occurs_on(e, day)], event_start)
+                )
+                for day in dates
+            }
+        except Exception as e:
+            print(f"Warning: Could not check calendar events: {str(e)}")
+            return {day: default for day in dates}
+
+    def plan_week(self, location: str = "Chicago, US", days: int = 7, formality: str = None, activity: str = "General", available_items: List[Dict[str, Any]] = None, laundry_cycle_days: int = 7, deadline: float = SUGGEST_DEADLINE_SECONDS) -> Dict[str, Any]:
+        """Plan an outfit for each of the next `days` days.
+
+        Costs one forecast call, one calendar query and one LLM call for the whole range. The
+        plan is then checked locally so no item is worn again within laundry_cycle_days and
+        items already in the laundry wait until they are clean. A formality of None takes each
+        day's formality from the calendar. On deadline, failure or an open circuit breaker the
+        whole plan is picked locally and marked 'degraded', as in suggest_outfit.
+        """
+        days = max(1, min(int(days), MAX_PLAN_DAYS))
+        forecast = self.weather_agent.get_forecast(location, days)
+        if not forecast:
+            return {"error": "Could not fetch weather forecast"}
+
+        dates = [datetime.fromisoformat(day['date']).date() for day in forecast]
+        calendar = self._calendar_for_days(dates)
+        day_contexts = []
+        for date, weather in zip(dates, forecast):
+            calendar_info = calendar[date]
+            day_contexts.append({
+                'date': weather['date'],
+                'weather': weather,
+                'analysis': weather['analysis'],
+                'calendar_info': calendar_info,
+                'formality': formality if formality is not None else calendar_info['formality'],
+                'activity': activity
+            })
+
+        items = list(available_items if available_items is not None else self.wardrobe_agent.wardrobe_items)
+        version = wardrobe_version(available_items) if available_items is not None else self.wardrobe_version
+        clean_on = {}
+        if available_items is None:
+            # Items in the laundry can be planned for once they are back
+            for item, days_until_clean in laundry_schedule(laundry_cycle_days, self.store):
+                if days_until_clean < days:
+                    items.append(item)
+                    clean_on[item['id']] = days_until_clean
+
+        if not deadline:
+            return self._plan_week(day_contexts, items, laundry_cycle_days, clean_on, version)
+        if llm_policy.breaker.is_open():
+            return self._heuristic_plan(day_contexts, items, laundry_cycle_days, clean_on, "AI stylist unavailable")
+
+        cancelled = threading.Event()
+        future = _pipeline_pool.submit(self._plan_week, day_contexts, items, laundry_cycle_days, clean_on, version, cancelled)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeout:
+            cancelled.set()
+            future.cancel()
+            reason = f"AI stylist took longer than {deadline:g}s"
+        except Exception as e:
+            print(f"Error planning outfits, falling back to the local picker: {str(e)}")
+            reason = "AI stylist unavailable"
+        return self._heuristic_plan(day_contexts, items, laundry_cycle_days, clean_on, reason)
+
+    def _plan_week(self, day_contexts, items, laundry_cycle_days, clean_on, version=None, cancelled=None) -> Dict[str, Any]:
+        wear_index = self.outfit_generator.wear_index
+        # Enough candidates per slot to cover every day without repeats, ranked for any of the days
+        per_slot = max(GENERATOR_ITEMS_PER_SLOT, len(day_contexts))
+        candidates = {}
+        for day in day_contexts:
+            context = {'weather': day['analysis'], 'formality': day['formality'], 'activity': day['activity']}
+            # One retrieval index serves every day: the items are the same, only the query changes
+            for item in prune_items(items, context, per_slot, version=version, wear_index=wear_index):
+                if isinstance(item, dict):
+                    candidates.setdefault(item['id'], item)
+        if _stopped(cancelled):
+            return None
+
+        proposal = self.outfit_generator.generate_plan(day_contexts, list(candidates.values()), laundry_cycle_days)
+        proposed_days = {
+            day.get('date'): day for day in proposal.get('days', []) if isinstance(day, dict)
+        }
+        return self._plan_response(day_contexts, items, laundry_cycle_days, clean_on, proposed_days, proposal.get('recommendations', []))
+
+    def _heuristic_plan(self, day_contexts, items, laundry_cycle_days, clean_on, reason) -> Dict[str, Any]:
+        response = self._plan_response(day_contexts, items, laundry_cycle_days, clean_on, {}, [])
+        response['degraded'] = True
+        response['degraded_reason'] = reason
+        return response
+
+    def _plan_response(self, day_contexts, items, laundry_cycle_days, clean_on, proposed_days, recommendations) -> Dict[str, Any]:
+        plan = heuristics.plan_days(
+            items, day_contexts, self.outfit_generator.wear_index, laundry_cycle_days,
+            proposed={date: day.get('items', []) for date, day in proposed_days.items()},
+            clean_on=clean_on
+        )
+        planned_days = []
+        for day, picked in zip(day_contexts, plan):
+            proposed = proposed_days.get(day['date'], {})
+            # Keep the LLM's notes only when its outfit survived the laundry check unchanged
+            kept = list(proposed.get('items', [])) == picked['items']
+            category = day['analysis'].get('temperature_category', 'mild')
+            planned_days.append({
+                'date': day['date'],
+                'weather': day['weather'],
+                'calendar_info': day['calendar_info'],
+                'outfit': {
+                    'name': proposed.get('name') if kept and proposed.get('name') else f"{str(day['formality']).title()} {category} pick",
+                    'items': picked['items'],
+                    'style_notes': proposed.get('style_notes', '') if kept else "Picked locally from weather tags, formality and laundry",
+                    'weather_compatibility': f"Suited to {category} weather",
+                    'formality_level': str(day['formality']).lower()
+                },
+                'reused': picked['reused']
+            })
+        return {'days': planned_days, 'recommendations': recommendations}
+
+    def plan_trip(self, stops, formality: str = "Casual", activity: str = "General", available_items: List[Dict[str, Any]] = None, explain: bool = True) -> Dict[str, Any]:
+        """Packing list for a trip: the fewest items that still give a suitable outfit every day.
+
+        stops are (location, first day, last day) tuples, with dates or ISO date strings. Each
+        destination costs one forecast call; the packing is solved locally (tools/packing.py) and
+        the LLM, if explain is set, only writes a short explanation of the result. A formality of
+        None takes each day's formality from the calendar.
+        """
+        trip_days = []
+        for location, first, last in stops:
+            first = first if not isinstance(first, str) else datetime.fromisoformat(first).date()
+            last = last if not isinstance(last, str) else datetime.fromisoformat(last).date()
+            if last < first:
+                return {"error": f"The stay in {location} ends before it starts"}
+            forecast = self.weather_agent.get_forecast(location, max((last - datetime.now().date()).days + 2, 1))
+            if not forecast:
+                return {"error": f"Could not fetch the weather forecast for {location}"}
+            by_date = {day['date']: day for day in forecast}
+            for offset in range((last - first).days + 1):
+                date = first + timedelta(days=offset)
+                weather = by_date.get(date.isoformat())
+                if weather is None:
+                    # Outside the forecast, e.g. a stay that started yesterday
+                    nearest = forecast[0] if date.isoformat() < forecast[0]['date'] else forecast[-1]
+                    weather = dict(nearest, date=date.isoformat(), estimated=True)
+                trip_days.append((date, location, weather))
+        if not trip_days:
+            return {"error": "The trip has no days"}
+
+        trip_days.sort(key=lambda day: day[0])
+        calendar = self._calendar_for_days([date for date, _, _ in trip_days])
+        days = []
+        for date, location, weather in trip_days:
+            calendar_info = calendar[date]
+            days.append({
+                'date': date.isoformat(),
+                'location': location,
+                'weather': weather,
+                'analysis': weather['analysis'],
+                'calendar_info': calendar_info,
+                'formality': formality if formality is not None else calendar_info['formality'],
+                'activity': activity
+            })
+
+        items = available_items if available_items is not None else self.wardrobe_agent.wardrobe_items
+        result = packing.pack(items, days)
+        explanation = ""
+        if explain and not llm_policy.breaker.is_open():
+            items_by_id = {item['id']: item for item in items if isinstance(item, dict)}
+            explanation = self.outfit_generator.explain_packing(days, [items_by_id[item_id] for item_id in result['items']], result)
+
         return {
-            'weather': weather_data,
-            'available_items': filtered_items,
-            'suggestions': shoe_suggestions,
-            'calendar_info': calendar_info
-        }
\ No newline at end of file
+            'days': [
+                dict(planned, weather=day['weather'], calendar_info=day['calendar_info'])
+                for day, planned in zip(days, result['days'])
+            ],
+            'packing_list': result['items'],
+            'by_slot': result['by_slot'],
+            'max_wears': result['max_wears'],
+            'gaps': result['gaps'],
+            'explanation': explanation
+        }
@@ -1,6 +1,7 @@
 from src.Wardrobe import OutfitSuggestionCrew
 from tools.laundry_manager import filter_wardrobe_items, increment_laundry_count
 from tools.db_manager import remove_item, add_item
+from tools.json_store import write_json
 import json
 from typing import Dict, Any
 import requests
@@ -10,10 +11,8 @@ BASE_URL = "http://127.0.0.1:8000"
 
 def save_state(wardrobe: Dict[str, Any], worn: Dict[str, Any]):
     """Save the current state of wardrobe and worn items to their respective JSON files."""
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(wardrobe, f, indent=2)
-    with open("data/worn.json", "w") as f:
-        json.dump(worn, f, indent=2)
+    write_json("data/wardrobe.json", wardrobe)
+    write_json("data/worn.json", worn)
 
 def main():
     # Load wardrobe items
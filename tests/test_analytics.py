@@ -0,0 +1,37 @@
+import json
+
+from tools.analytics import WardrobeAnalytics
+from tools.wear_index import WearIndex
+
+
+def test_concurrent_sessions_keep_each_others_counts(tmp_path):
+    history_path = tmp_path / "outfit_history.json"
+    history_path.write_text("[]")
+    path = str(tmp_path / "analytics.json")
+    wear_index = WearIndex(str(tmp_path / "wear_index.json"), str(history_path))
+    first = WardrobeAnalytics(path, wear_index)
+    second = WardrobeAnalytics(path, wear_index)
+
+    first.item_added({"id": "top1", "type": "shirt"})
+    second.item_added({"id": "bottom1", "type": "pants"})
+    first.outfit_logged({"date": "2026-10-19", "top": "top1", "pants": "bottom1"})
+
+    with open(path) as f:
+        stored = json.load(f)
+    assert stored["total_items"] == 2
+    assert stored["items_by_slot"] == {"top": 1, "bottom": 1}
+    assert stored["wears_by_type"] == {"shirt": 1, "pants": 1}
+    assert second.count_by_slot("top") == 1
+    assert second.data["total_wears"] == 2
+
+
+def test_removing_an_item_updates_its_counters(tmp_path):
+    history_path = tmp_path / "outfit_history.json"
+    history_path.write_text("[]")
+    analytics = WardrobeAnalytics(str(tmp_path / "analytics.json"), WearIndex(str(tmp_path / "wear_index.json"), str(history_path)))
+
+    analytics.item_added({"id": "shoe1", "type": "shoes"})
+    analytics.item_removed("shoe1")
+
+    assert analytics.data["total_items"] == 0
+    assert analytics.count_by_slot("shoes") == 0
@@ -0,0 +1,52 @@
+from tools.event_classifier import DEFAULT_RULES, EventClassifier
+
+
+def test_overlapping_rules_all_apply():
+    classifier = EventClassifier([
+        {"keyword": "client", "formality": "business casual"},
+        {"regex": r"client dinner", "activity": "social"},
+    ])
+
+    # A single alternation would consume "client" and never see "client dinner"
+    assert classifier.classify({"summary": "Client dinner"}) == ("business casual", {"social"})
+
+
+def test_highest_formality_wins_across_fields():
+    classifier = EventClassifier(DEFAULT_RULES)
+
+    level, activities = classifier.classify({
+        "summary": "Team practice",
+        "description": "Followed by a short meeting",
+        "location": None
+    })
+
+    assert level == "formal"
+    assert activities == {"athletic"}
+
+
+def test_unmatched_event_is_casual():
+    classifier = EventClassifier(DEFAULT_RULES)
+
+    assert classifier.classify({"summary": "Lunch"}) == (None, set())
+    assert classifier.classify_events([{"summary": "Lunch"}], lambda event: None) == {"formality": "casual", "activities": []}
+
+
+def test_default_rules_for_dressy_and_office_events():
+    classifier = EventClassifier(DEFAULT_RULES)
+
+    assert classifier.classify({"summary": "Sam's wedding"})[0] == "formal"
+    assert classifier.classify({"summary": "Charity gala"})[0] == "formal"
+    assert classifier.classify({"summary": "Client check-in"})[0] == "business casual"
+    assert classifier.classify({"summary": "Focus time", "location": "Main office"})[0] == "business casual"
+    # A formal event outranks business casual in the same event
+    assert classifier.classify({"summary": "Client meeting"})[0] == "formal"
+
+
+def test_default_rules_for_athletic_and_social_events():
+    classifier = EventClassifier(DEFAULT_RULES)
+
+    assert classifier.classify({"summary": "Morning yoga"}) == (None, {"athletic"})
+    assert classifier.classify({"summary": "Hiking with Alex"}) == (None, {"athletic"})
+    assert classifier.classify({"summary": "Birthday party", "description": "dinner after"}) == (None, {"social"})
+    assert classifier.classify({"summary": "Run payroll"}) == (None, set())
+    assert classifier.classify({"summary": "Report due date"}) == (None, set())
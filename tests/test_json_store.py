@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+from tools.json_store import CorruptJSON, read_json, read_versioned, update_json, write_json
+
+
+def test_update_json_refuses_to_overwrite_corrupt_file(tmp_path):
+    path = str(tmp_path / "wardrobe.json")
+    with open(path, "w") as f:
+        f.write('{"items": [{"id": "top1"')
+
+    with pytest.raises(CorruptJSON) as raised:
+        update_json(path, lambda data: data["items"].append({"id": "top2"}), default=lambda: {"items": []})
+
+    # The unreadable contents are kept for recovery instead of being replaced by the default
+    with open(raised.value.moved_to) as f:
+        assert f.read() == '{"items": [{"id": "top1"'
+    assert not os.path.exists(path)
+
+
+def test_read_versioned_refuses_corrupt_file(tmp_path):
+    path = str(tmp_path / "wardrobe.json")
+    with open(path, "w") as f:
+        f.write("not json")
+
+    with pytest.raises(CorruptJSON):
+        read_versioned(path, default=dict)
+
+
+def test_read_json_falls_back_to_default_without_touching_the_file(tmp_path):
+    path = str(tmp_path / "settings.json")
+    with open(path, "w") as f:
+        f.write("not json")
+
+    assert read_json(path, default=dict) == {}
+    with open(path) as f:
+        assert f.read() == "not json"
+
+
+def test_update_json_applies_mutation(tmp_path):
+    path = str(tmp_path / "worn.json")
+    write_json(path, {"laundry": []})
+
+    update_json(path, lambda data: data["laundry"].append("top1"))
+
+    with open(path) as f:
+        assert json.load(f) == {"laundry": ["top1"]}
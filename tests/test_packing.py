@@ -0,0 +1,32 @@
+from tools.packing import pack
+
+
+def _day(date, category):
+    return {"date": date, "analysis": {"temperature_category": category}, "formality": "casual", "activity": "General"}
+
+
+ITEMS = [
+    {"id": "top1", "type": "sweater", "weather": ["cold"]},
+    {"id": "top2", "type": "t-shirt", "weather": ["warm"]},
+    {"id": "bottom1", "type": "pants", "weather": ["cold", "mild"]},
+    {"id": "shoe1", "type": "shoes", "weather": []},
+]
+
+
+def test_every_day_gets_an_outfit_within_the_wear_limit():
+    days = [_day(f"2026-10-{20 + i}", "cold" if i < 2 else "warm") for i in range(4)]
+
+    result = pack(ITEMS, days)
+
+    assert [day["items"][0] for day in result["days"]] == ["top1", "top1", "top2", "top2"]
+    assert set(result["items"]) == {"top1", "top2", "bottom1", "shoe1"}
+
+
+def test_custom_temperature_category_does_not_crash():
+    # A custom band in data/weather_rules.json can name a category outside the defaults
+    days = [_day("2026-10-20", "freezing"), _day("2026-10-21", "cold"), _day("2026-10-22", "freezing")]
+
+    result = pack(ITEMS, days)
+
+    assert len(result["days"]) == 3
+    assert all(len(day["items"]) == 3 for day in result["days"])
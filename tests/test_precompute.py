@@ -0,0 +1,71 @@
+import json
+import threading
+from datetime import date
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("pyowm")
+
+from src import Wardrobe  # noqa: E402
+from tools import precompute  # noqa: E402
+from tools.user_store import UserStore  # noqa: E402
+
+ITEMS = [
+    {"id": "top1", "type": "shirt", "weather": ["mild"]},
+    {"id": "bottom1", "type": "pants", "weather": ["mild"]},
+    {"id": "shoe1", "type": "shoes", "weather": ["mild"]},
+]
+ANALYSIS = {"temperature_category": "mild", "weather_conditions": ["sunny"]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = UserStore("precompute_test").ensure()
+    with open(store.wardrobe_path, "w") as f:
+        json.dump({"items": ITEMS}, f)
+    # Preferences that differ from the defaults, as the lookup has to use the same ones
+    with open(store.settings_path, "w") as f:
+        json.dump({"location": "Denver, US", "preferred_formality": "Formal", "preferred_activity": "Work"}, f)
+    return store
+
+
+@pytest.fixture
+def stubbed_pipeline(monkeypatch):
+    today = date.today().isoformat()
+    weather = {"date": today, "raw_data": {}, "analysis": ANALYSIS, "estimated": False}
+    monkeypatch.setattr(Wardrobe.WeatherAgent, "get_forecast", lambda self, location, days: [dict(weather)] * days)
+    monkeypatch.setattr(Wardrobe.OutfitSuggestionCrew, "suggest_for_day", lambda self, location, day_offset, formality, activity: {
+        "weather": weather,
+        "suggestions": {"outfits": [{"name": "Stub", "items": ["top1", "bottom1", "shoe1"]}]},
+        "calendar_info": {"formality": "casual", "activities": []}
+    })
+
+
+def test_precomputed_entry_is_served_once_for_the_saved_preferences(store, stubbed_pipeline):
+    assert precompute.precompute_user(store) is not None
+
+    # The app starts each session from the same saved settings
+    settings = store.load_settings()
+    request = (settings["location"], settings["preferred_formality"], settings["preferred_activity"])
+    crew = Wardrobe.OutfitSuggestionCrew(ITEMS, store=store)
+
+    served = crew.precomputed_outfit(*request)
+    assert served is not None and served["precomputed"]
+    assert served["suggestions"]["outfits"][0]["items"] == ["top1", "bottom1", "shoe1"]
+    assert crew.precomputed_outfit(*request) is None
+
+
+def test_prefetch_leaves_the_entry_for_the_user(store, stubbed_pipeline):
+    precompute.precompute_user(store)
+    settings = store.load_settings()
+    request = (settings["location"], settings["preferred_formality"], settings["preferred_activity"])
+    crew = Wardrobe.OutfitSuggestionCrew(ITEMS, store=store)
+
+    prefetched = crew.prefetch_outfit(*request, cancelled=threading.Event())
+
+    assert prefetched["precomputed"]
+    assert not precompute.load(store).get("served")
+    assert precompute.claim(store, prefetched["weather"]["date"])
+    assert crew.precomputed_outfit(*request) is None
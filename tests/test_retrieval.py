@@ -0,0 +1,36 @@
+from tools import retrieval
+from tools.retrieval import get_index, prune_items
+
+
+def _wardrobe():
+    items = [{"id": f"top{i}", "type": "shirt", "color": "blue" if i % 2 else "red"} for i in range(6)]
+    items += [{"id": f"bottom{i}", "type": "pants", "form": "denim"} for i in range(6)]
+    items += [{"id": f"shoe{i}", "type": "shoes"} for i in range(6)]
+    items.append({"id": "acc1", "type": "scarf", "weather": ["cold"]})
+    return items
+
+
+def test_prune_keeps_items_of_unknown_slot():
+    pruned = prune_items(_wardrobe(), {"formality": "casual", "weather": "cold"}, per_slot=2)
+
+    ids = [item["id"] for item in pruned]
+    assert len(ids) == 7
+    assert "acc1" in ids
+
+
+def test_small_wardrobe_with_unknown_slot_is_untouched():
+    items = _wardrobe()[:1] + _wardrobe()[-1:]
+
+    assert prune_items(items, {"formality": "casual"}, per_slot=2) == items
+
+
+def test_index_is_cached_per_version_and_subset():
+    retrieval._index_cache.clear()
+    items = _wardrobe()
+
+    full = get_index(items, "v1")
+    assert get_index(list(items), "v1") is full
+    # The same wardrobe version with a different subset of items needs its own index
+    subset = get_index(items[:6], "v1")
+    assert subset is not full
+    assert [item["id"] for item in subset.items] == [item["id"] for item in items[:6]]
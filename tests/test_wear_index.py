@@ -0,0 +1,39 @@
+import json
+
+from tools import wear_index
+from tools.wear_index import WearIndex
+
+
+def _paths(tmp_path, history):
+    history_path = tmp_path / "outfit_history.json"
+    history_path.write_text(json.dumps(history))
+    return str(tmp_path / "wear_index.json"), str(history_path)
+
+
+def test_concurrent_writers_keep_each_others_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(wear_index, "RELOAD_CHECK_SECONDS", 0)
+    index_path, history_path = _paths(tmp_path, [])
+    # Two sessions (or processes) holding their own copy of the same user's index
+    first = WearIndex(index_path, history_path)
+    second = WearIndex(index_path, history_path)
+
+    first.record_outfit({"date": "2026-10-18", "top": "top1", "pants": "bottom1"})
+    second.record_outfit({"date": "2026-10-19", "top": "top1", "shoes": "shoe1"})
+
+    with open(index_path) as f:
+        stored = json.load(f)
+    assert stored["history_length"] == 2
+    assert stored["items"]["top1"] == {"last_worn": "2026-10-19", "count": 2}
+    assert stored["items"]["bottom1"]["count"] == 1
+    # The first session picks up the second one's write on its next lookup
+    assert first.wear_count("top1") == 2
+    assert first.wear_count("shoe1") == 1
+
+
+def test_loads_out_of_step_index_by_rebuilding(tmp_path):
+    index_path, history_path = _paths(tmp_path, [{"date": "2026-10-19", "top": "top1"}])
+
+    index = WearIndex(index_path, history_path)
+
+    assert index.wear_count("top1") == 1
+    assert str(index.last_worn("top1")) == "2026-10-19"
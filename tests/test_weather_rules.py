@@ -0,0 +1,39 @@
+from tools.forecast import pyowm_fields
+from tools.weather_rules import DEFAULT_RULES, WeatherRules
+
+MPH_PER_METER_SEC = 2.23694
+
+
+class FakeWeather:
+    """Stands in for pyowm's Weather, which reports wind in m/s unless asked for another unit"""
+
+    def __init__(self, temperature_f, status, humidity, wind_meters_sec):
+        self._temperature_f = temperature_f
+        self.detailed_status = status
+        self.humidity = humidity
+        self._wind = wind_meters_sec
+
+    def temperature(self, unit):
+        assert unit == "fahrenheit"
+        return {"temp": self._temperature_f}
+
+    def wind(self, unit="meters_sec"):
+        factor = {"meters_sec": 1, "miles_hour": MPH_PER_METER_SEC}[unit]
+        return {"speed": self._wind * factor, "deg": 0}
+
+
+def test_pyowm_wind_is_converted_to_mph():
+    fields = pyowm_fields(FakeWeather(50, "few clouds", 60, 8))
+    assert abs(fields["wind_speed"] - 8 * MPH_PER_METER_SEC) < 0.01
+
+
+def test_pyowm_observation_in_meters_per_second_reaches_wind_rules():
+    # 8 m/s is about 18 mph: windy, though 8 alone would be under the 15 mph threshold
+    analysis = WeatherRules(DEFAULT_RULES).analyze(pyowm_fields(FakeWeather(50, "few clouds", 60, 8)))
+    assert "windy" in analysis["weather_conditions"]
+    assert "wind-resistant outer layer" in analysis["clothing_recommendations"]
+
+
+def test_light_pyowm_wind_is_not_windy():
+    analysis = WeatherRules(DEFAULT_RULES).analyze(pyowm_fields(FakeWeather(50, "few clouds", 60, 3)))
+    assert "windy" not in analysis["weather_conditions"]
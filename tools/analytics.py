@@ -0,0 +1,155 @@
+import threading
+
+from tools.item_slots import slot_of
+from tools.json_store import CorruptJSON, file_version, read_versioned, update_versioned, write_json
+from tools.user_store import get_store
+from tools.wear_index import WORN_FIELDS, get_wear_index
+
+
+def _bump(counter, key, delta):
+    counter[key] = counter.get(key, 0) + delta
+    if counter[key] <= 0:
+        del counter[key]
+
+
+class WardrobeAnalytics:
+    """Wardrobe and wear aggregates kept as counters, updated on every add, remove and outfit log.
+
+    Updates are applied to the counters file's latest contents under its lock, so concurrent
+    sessions don't lose each other's changes, and reads reload the file once it changed.
+    """
+
+    def __init__(self, path, wear_index):
+        self.path = path
+        self.wear_index = wear_index
+        self._lock = threading.Lock()
+        self.data = self._empty()
+        self._version = None
+        self._load()
+
+    def _load(self):
+        try:
+            data, self._version = read_versioned(self.path, default=dict)
+        except CorruptJSON as e:
+            # Counters can be recomputed; ensure_consistent rebuilds them from the wardrobe
+            print(f"Warning: {str(e)}, starting from empty analytics")
+            data, self._version = {}, None
+        self.data = dict(self._empty(), **data)
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if file_version(self.path) != self._version:
+                self._load()
+
+    def _update(self, change):
+        """Run change() against the latest stored counters, then save and keep them"""
+        def mutate(data):
+            self.data = dict(self._empty(), **data)
+            change()
+            return self.data
+
+        with self._lock:
+            self.data, self._version = update_versioned(self.path, mutate, default=dict)
+
+    @staticmethod
+    def _empty():
+        return {
+            "total_items": 0,
+            "items_by_type": {},
+            "items_by_slot": {},
+            "total_wears": 0,
+            "wears_by_type": {},
+            # id -> {"type", "price"} so removals and logs can be applied without the wardrobe
+            "items": {}
+        }
+
+    def _add(self, item):
+        item_type = item.get("type", "").lower()
+        self.data["items"][item["id"]] = {"type": item_type, "price": item.get("price")}
+        self.data["total_items"] += 1
+        _bump(self.data["items_by_type"], item_type, 1)
+        _bump(self.data["items_by_slot"], slot_of(item) or "other", 1)
+
+    def _remove(self, item_id):
+        entry = self.data["items"].pop(item_id, None)
+        if entry is None:
+            return
+        self.data["total_items"] -= 1
+        _bump(self.data["items_by_type"], entry["type"], -1)
+        _bump(self.data["items_by_slot"], slot_of(entry) or "other", -1)
+
+    def _log(self, outfit_log):
+        for field in WORN_FIELDS:
+            item_id = outfit_log.get(field)
+            if not item_id:
+                continue
+            entry = self.data["items"].get(item_id)
+            self.data["total_wears"] += 1
+            _bump(self.data["wears_by_type"], entry["type"] if entry else "unknown", 1)
+
+    def rebuild(self, wardrobe_items, history):
+        """Recompute every counter from the wardrobe and the full outfit history"""
+        with self._lock:
+            self.data = self._empty()
+            for item in wardrobe_items:
+                self._add(item)
+            for outfit_log in history:
+                self._log(outfit_log)
+            self._version = write_json(self.path, self.data)
+
+    def ensure_consistent(self, wardrobe_items, history):
+        """Rebuild when the stored counters don't match the wardrobe, e.g. after manual edits"""
+        self._reload_if_changed()
+        if set(self.data["items"]) != {item["id"] for item in wardrobe_items}:
+            self.rebuild(wardrobe_items, history)
+
+    def item_added(self, item):
+        def change():
+            self._remove(item["id"])
+            self._add(item)
+        self._update(change)
+
+    def item_removed(self, item_id):
+        self._update(lambda: self._remove(item_id))
+
+    def outfit_logged(self, outfit_log):
+        self._update(lambda: self._log(outfit_log))
+
+    def count_by_slot(self, slot):
+        self._reload_if_changed()
+        return self.data["items_by_slot"].get(slot, 0)
+
+    def wear_ranking(self):
+        """Items ordered from most to least worn, as (item_id, wear count)"""
+        self._reload_if_changed()
+        return sorted(
+            ((item_id, self.wear_index.wear_count(item_id)) for item_id in self.data["items"]),
+            key=lambda pair: (-pair[1], pair[0])
+        )
+
+    def cost_per_wear(self):
+        """Cost per wear for every item with a price, cheapest first"""
+        self._reload_if_changed()
+        costs = []
+        for item_id, entry in self.data["items"].items():
+            if entry.get("price") is None:
+                continue
+            wears = self.wear_index.wear_count(item_id)
+            costs.append((item_id, entry["price"] / max(wears, 1), wears))
+        return sorted(costs, key=lambda row: row[1])
+
+
+_analytics = {}
+_analytics_lock = threading.Lock()
+
+
+def get_analytics(store=None):
+    """Return the analytics counters for a user's shard (the default user if None), loading them on first use
+    and reloading them if another session changed them since"""
+    store = store or get_store()
+    with _analytics_lock:
+        if store.root not in _analytics:
+            _analytics[store.root] = WardrobeAnalytics(store.analytics_path, get_wear_index(store))
+        analytics = _analytics[store.root]
+    analytics._reload_if_changed()
+    return analytics
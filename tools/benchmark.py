@@ -0,0 +1,418 @@
+"""Offline benchmark for the outfit pipeline.
+
+Starts local stand-ins for the Mistral chat API and OpenWeatherMap, builds
+synthetic wardrobes and reports end-to-end and per-stage latency, peak memory
+and prompt sizes. No network access is needed.
+
+    python -m tools.benchmark --sizes 10 100 1000 10000 --latency-ms 50
+
+Compare model routing configs (see tools/model_routes.py) on latency and estimated cost:
+
+    python -m tools.benchmark --sizes 100 --latency-ms 200 --routes all_large.json data/model_routes.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+TOPS = ["t-shirt", "shirt", "sweater", "parka"]
+BOTTOMS = ["pants", "shorts"]
+FORMS = ["cotton", "denim", "wool", "linen", "leather", "polyester", "chinos"]
+COLORS = ["black", "white", "navy", "grey", "olive", "beige", "red", "blue", "brown", "green"]
+WEATHER_TAGS = ["cold", "cool", "mild", "warm", "hot", "rainy", "snowy", "windy", "sunny"]
+
+# The stub answers smaller models faster: latency_ms is scaled by the first matching factor
+MODEL_LATENCY_FACTORS = [("ministral", 0.2), ("small", 0.35), ("nemo", 0.35), ("pixtral-12b", 0.5), ("medium", 0.6)]
+
+
+def model_latency_factor(model):
+    for name, factor in MODEL_LATENCY_FACTORS:
+        if name in (model or ""):
+            return factor
+    return 1.0
+
+
+def synthetic_wardrobe(size, seed=0):
+    """Build a wardrobe of `size` items split roughly evenly between tops, bottoms and shoes"""
+    rng = random.Random(seed)
+    items = []
+    counters = {"top": 0, "bottom": 0, "shoe": 0}
+    for i in range(size):
+        prefix = ("top", "bottom", "shoe")[i % 3]
+        counters[prefix] += 1
+        if prefix == "top":
+            item_type = rng.choice(TOPS)
+        elif prefix == "bottom":
+            item_type = rng.choice(BOTTOMS)
+        else:
+            item_type = "shoes"
+        color = rng.choice(COLORS)
+        form = rng.choice(FORMS)
+        items.append({
+            "id": f"{prefix}{counters[prefix]}",
+            "type": item_type,
+            "form": form,
+            "weather": rng.sample(WEATHER_TAGS, 2),
+            "color": color,
+            "notes": f"A {color} {form} {item_type}",
+            "count": 1,
+            "image": ""
+        })
+    return items
+
+
+def _ids_in(prompt, prefix):
+    return list(dict.fromkeys(re.findall(r'"id": "(%s\d+)"' % prefix, prompt)))
+
+
+def canned_reply(prompt):
+    """Return a plausible JSON answer for each prompt the pipeline sends"""
+    if "Describe the clothing item" in prompt:
+        return json.dumps(synthetic_wardrobe(1, seed=len(prompt))[0])
+    if "friendly sentences describing today's weather" in prompt:
+        return "A mild, sunny day. Light layers will keep you comfortable."
+    if "Explain this packing list" in prompt:
+        return "Layers cover the cooler mornings and the same shoes work every day."
+    if "Plan one outfit for each of the days" in prompt:
+        dates = re.findall(r"(\d{4}-\d{2}-\d{2}): Weather", prompt)
+        ids = {prefix: _ids_in(prompt, prefix) or [f"{prefix}1"] for prefix in ("top", "bottom", "shoe")}
+        return json.dumps({
+            "days": [
+                {
+                    "date": date,
+                    "name": f"Stub Day {i + 1}",
+                    "items": [ids[prefix][i % len(ids[prefix])] for prefix in ("top", "bottom", "shoe")],
+                    "style_notes": "Stub"
+                }
+                for i, date in enumerate(dates)
+            ],
+            "recommendations": ["Stub recommendation"]
+        })
+    if "Filter the wardrobe items" in prompt:
+        ids = re.findall(r'"id": "([^"]+)"', prompt)
+        return json.dumps({"matching_items": ids})
+    for slot, prefix in (("tops", "top"), ("bottoms", "bottom"), ("shoes", "shoe")):
+        if f"Generate alternative {prefix} suggestions" in prompt:
+            ids = _ids_in(prompt, prefix) or [f"{prefix}1"]
+            return json.dumps({
+                slot: [{"item_id": ids[-1], "compatibility_notes": "Matches", "style_notes": "Stub"}],
+                "recommendations": ["Stub recommendation"]
+            })
+    items = [(_ids_in(prompt, prefix) or [f"{prefix}1"])[0] for prefix in ("top", "bottom", "shoe")]
+    return json.dumps({
+        "outfits": [{
+            "name": "Stub Outfit",
+            "items": items,
+            "style_notes": "Stub",
+            "weather_compatibility": "Stub",
+            "formality_level": "casual"
+        }],
+        "recommendations": ["Stub recommendation"]
+    })
+
+
+def _message_text(message):
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class StubServer:
+    """A threaded local HTTP server that answers Mistral chat and OWM weather requests"""
+
+    def __init__(self, latency_ms=0, temperature=68.0, conditions="clear sky"):
+        self.latency_ms = latency_ms
+        self.temperature = temperature
+        self.conditions = conditions
+        self.prompt_sizes = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(stub.latency_ms / 1000)
+                if self.path.startswith("/geo/1.0/direct"):
+                    self._send_json([{"name": "Chicago", "lat": 41.8781, "lon": -87.6298, "country": "US"}])
+                elif self.path.startswith("/data/2.5/forecast"):
+                    # Five days of 3-hourly slots starting now, like OWM's free forecast
+                    start = int(time.time()) // 10800 * 10800
+                    self._send_json({
+                        "city": {"name": "Chicago", "timezone": -18000},
+                        "list": [
+                            {
+                                "dt": start + slot * 10800,
+                                "weather": [{"main": "Clear", "description": stub.conditions}],
+                                "main": {"temp": stub.temperature - 10 + slot % 8 * 2.5, "humidity": 40},
+                                "wind": {"speed": 5.0}
+                            }
+                            for slot in range(40)
+                        ]
+                    })
+                elif self.path.startswith("/data/2.5/weather"):
+                    self._send_json({
+                        "weather": [{"main": "Clear", "description": stub.conditions}],
+                        "main": {"temp": stub.temperature, "humidity": 40},
+                        "wind": {"speed": 5.0}
+                    })
+                else:
+                    self._send_json({"message": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json({"message": "not found"}, status=404)
+                    return
+                request = json.loads(raw or b"{}")
+                time.sleep(stub.latency_ms * model_latency_factor(request.get("model")) / 1000)
+                prompt = "\n".join(_message_text(m) for m in request.get("messages", []))
+                with stub._lock:
+                    stub.prompt_sizes.append(len(prompt))
+                answer = canned_reply(prompt)
+                # CrewAI agents expect a ReAct style final answer; Pixtral calls get the bare JSON
+                if "Describe the clothing item" not in prompt:
+                    answer = "Thought: I now know the final answer\nFinal Answer: " + answer
+                self._send_json({
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": len(prompt) // 4,
+                        "completion_tokens": len(answer) // 4,
+                        "total_tokens": (len(prompt) + len(answer)) // 4
+                    }
+                })
+
+        return Handler
+
+
+def _measure(fn, repeat):
+    """Run fn `repeat` times and return latency stats (ms) and the peak traced memory (KiB)"""
+    timings = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "mean_ms": round(statistics.mean(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def _write_wardrobe(items):
+    with open("data/wardrobe.json", "w") as f:
+        json.dump({"items": items}, f, indent=2)
+    with open("data/worn.json", "w") as f:
+        json.dump({"laundry": []}, f, indent=2)
+
+
+def _point_at(stub):
+    """Aim already-imported modules at this run's stub and drop state left by an earlier run.
+
+    src.Wardrobe reads the endpoints once at import, the Pixtral client keeps the server URL it was
+    built with, and the caches are keyed by relative paths and grid cells that every run reuses.
+    """
+    from src import Wardrobe, FitIdentification
+    from tools import analytics, geo_cache, llm_policy, wear_index
+
+    Wardrobe.MISTRAL_SERVER_URL = stub.url
+    Wardrobe.OWM_BASE_URL = stub.url
+    FitIdentification.reset_clients()
+    with geo_cache._singletons_lock:
+        geo_cache._location_cache = None
+        geo_cache._weather_grid = None
+    with wear_index._indexes_lock:
+        wear_index._indexes.clear()
+    with analytics._analytics_lock:
+        analytics._analytics.clear()
+    # Failures in an earlier run must not send this one to the local fallback
+    llm_policy.breaker.reset()
+
+
+def run(sizes, latency_ms=0, repeat=3, routes_path=None):
+    """Run every benchmark against the stub server and return the results.
+
+    routes_path switches every stage to the model routes in that file for this run.
+    """
+    stub = StubServer(latency_ms=latency_ms).start()
+    workdir = tempfile.mkdtemp(prefix="fitify-bench-")
+    cwd = os.getcwd()
+
+    os.environ["MISTRAL_SERVER_URL"] = stub.url
+    os.environ["OWM_BASE_URL"] = stub.url
+    os.environ.setdefault("MISTRAL_API_KEY", "stub")
+    os.environ.setdefault("PYTHON_WEATHER_API_KEY", "stub")
+    os.environ.pop("GOOGLE_CALENDAR_CREDENTIALS_PATH", None)
+    os.environ["FITIFY_METRICS_PATH"] = os.path.join(workdir, "metrics.jsonl")
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    # Import after the environment is set so the modules pick up the stub endpoints
+    from src.Wardrobe import OutfitSuggestionCrew
+    from src.FitIdentification import image_to_json, classify_images
+    from tools import telemetry
+    from tools.db_manager import add_item, remove_item
+    from tools.laundry_manager import filter_wardrobe_items
+    from tools import model_routes
+    # Set explicitly since telemetry may already be imported from an earlier run
+    telemetry.METRICS_PATH = os.environ["FITIFY_METRICS_PATH"]
+    _point_at(stub)
+    model_routes.use(routes_path or model_routes.ROUTES_PATH)
+
+    results = []
+    try:
+        os.chdir(workdir)
+        os.makedirs("data", exist_ok=True)
+        sample_image = os.path.join(REPO_ROOT, "data", "shirt.png")
+
+        for size in sizes:
+            items = synthetic_wardrobe(size)
+            _write_wardrobe(items)
+            stub.prompt_sizes.clear()
+            first_record = len(telemetry.load_records())
+
+            crew = OutfitSuggestionCrew(items)
+            row = {"size": size}
+            # deadline=0 waits for the LLM pipeline, so slow runs are timed rather than the local fallback
+            row["suggest_outfit"] = _measure(lambda: crew.suggest_outfit(location="Chicago, US", deadline=0), repeat)
+            row["suggest_tops"] = _measure(
+                lambda: crew.suggest_tops(location="Chicago, US", current_bottoms=items[1:2], current_shoes=items[2:3]),
+                repeat
+            )
+            row["plan_week"] = _measure(lambda: crew.plan_week(location="Chicago, US", days=7, deadline=0), repeat)
+            trip = [("Chicago, US", date.today(), date.today() + timedelta(days=6))]
+            # The packing itself is local; the explanation is the trip's only LLM call
+            row["pack_trip"] = _measure(lambda: crew.plan_trip(trip, explain=False), repeat)
+            existing_ids = {item["id"] for item in items}
+            row["image_to_json"] = _measure(lambda: image_to_json(sample_image, existing_ids=existing_ids), repeat)
+            row["classify_batch8"] = _measure(
+                lambda: classify_images([sample_image] * 8, existing_ids=existing_ids), repeat
+            )
+
+            extra = dict(items[0], id="bench_extra")
+            row["db_add_remove"] = _measure(lambda: (add_item(extra), remove_item("bench_extra")), repeat)
+            row["laundry_filter"] = _measure(filter_wardrobe_items, repeat)
+
+            row["stages"] = telemetry.stage_stats(telemetry.load_records()[first_record:])
+            row["prompt_chars"] = {
+                "max": max(stub.prompt_sizes, default=0),
+                "mean": round(statistics.mean(stub.prompt_sizes), 1) if stub.prompt_sizes else 0
+            }
+            results.append(row)
+    finally:
+        os.chdir(cwd)
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_report(results):
+    for row in results:
+        print(f"\n=== {row['size']} items ===")
+        for name in ("suggest_outfit", "suggest_tops", "plan_week", "pack_trip", "image_to_json", "classify_batch8", "db_add_remove", "laundry_filter"):
+            m = row[name]
+            print(f"{name:<16} mean {m['mean_ms']:>10.2f} ms   max {m['max_ms']:>10.2f} ms   peak {m['peak_kib']:>10.1f} KiB")
+        print(f"prompt chars     mean {row['prompt_chars']['mean']:>10}      max {row['prompt_chars']['max']:>10}")
+        for stage, s in sorted(row["stages"].items()):
+            print(f"  stage {stage:<20} calls {s['calls']:>3}   p50 {s['p50_ms']} ms   p95 {s['p95_ms']} ms   prompt tokens {s['prompt_tokens']}")
+
+
+def print_route_comparison(results_by_route):
+    """Per-stage latency and estimated cost for each routing config, side by side"""
+    for size_index, row in enumerate(next(iter(results_by_route.values()))):
+        print(f"\n=== routes at {row['size']} items ===")
+        stages = sorted({stage for rows in results_by_route.values() for stage in rows[size_index]["stages"]})
+        print(f"{'stage':<22}" + "".join(f"{label[-30:]:>34}" for label in results_by_route))
+        for stage in stages:
+            cells = []
+            for rows in results_by_route.values():
+                s = rows[size_index]["stages"].get(stage)
+                cells.append(f"p50 {s['p50_ms']:>8} ms ${s['cost_usd']:.5f}" if s else "-")
+            print(f"{stage:<22}" + "".join(f"{cell:>34}" for cell in cells))
+        totals = []
+        for rows in results_by_route.values():
+            r = rows[size_index]
+            cost = sum(s["cost_usd"] for s in r["stages"].values())
+            totals.append(f"outfit {r['suggest_outfit']['mean_ms']:>7.1f} ms, run ${cost:.5f}")
+        print(f"{'total':<22}" + "".join(f"{cell:>34}" for cell in totals))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the outfit pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated latency per stub request")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="Also write the raw results to this file")
+    parser.add_argument("--routes", nargs="+", metavar="ROUTES_JSON",
+                        help="Compare these model routing files instead of running the size report")
+    args = parser.parse_args()
+
+    if args.routes:
+        results = {
+            path: run(args.sizes, latency_ms=args.latency_ms, repeat=args.repeat, routes_path=path)
+            for path in args.routes
+        }
+        print_route_comparison(results)
+    else:
+        results = run(args.sizes, latency_ms=args.latency_ms, repeat=args.repeat)
+        print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,43 +7,274 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import os
 import pickle
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from tools import cassette
+
+# How long a synced event cache is trusted before asking Google for changes
+FRESHNESS_SECONDS = int(os.getenv('CALENDAR_FRESHNESS_SECONDS', '300'))
+# How far ahead the full sync looks at least; incremental syncs keep this window up to date
+SYNC_WINDOW_DAYS = 14
+# Extra days fetched past a longer request, so repeating it doesn't resync as the window slides
+SYNC_SLACK_DAYS = 2
+# Calendars read when the caller doesn't pick any, e.g. "primary,work@group.calendar.google.com"
+DEFAULT_CALENDAR_IDS = [c.strip() for c in os.getenv('GOOGLE_CALENDAR_IDS', 'primary').split(',') if c.strip()]
+# Google rejects batches with more than 50 requests
+BATCH_LIMIT = 50
+TOKEN_PATH = os.getenv('GOOGLE_CALENDAR_TOKEN_PATH', 'token.pickle')
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+# Refresh the access token this long before it expires instead of waiting for a 401
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+# Credentials and built services are shared by every manager in the process
+_credentials = {}
+_services = {}
+_auth_lock = threading.RLock()
+
+def _save_credentials(creds, token_path):
+    with open(token_path, 'wb') as token:
+        pickle.dump(creds, token)
+
+def _needs_refresh(creds):
+    if not creds.valid:
+        return True
+    # google-auth stores expiry as a naive UTC datetime
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+def get_credentials(credentials_path, token_path=None):
+    """Return in-memory credentials, loading them once and refreshing them before they expire."""
+    token_path = token_path or TOKEN_PATH
+    with _auth_lock:
+        creds = _credentials.get(token_path)
+        if creds is None and os.path.exists(token_path):
+            with open(token_path, 'rb') as token:
+                creds = pickle.load(token)
+
+        if creds and creds.refresh_token and _needs_refresh(creds):
+            creds.refresh(Request())
+            _save_credentials(creds, token_path)
+        elif not creds or not creds.valid:
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
+            creds = flow.run_local_server(port=0)
+            _save_credentials(creds, token_path)
+
+        _credentials[token_path] = creds
+        return creds
+
+def get_calendar_service(credentials_path, token_path=None):
+    """Return the process-wide Calendar service, built once from the bundled discovery document."""
+    token_path = token_path or TOKEN_PATH
+    with _auth_lock:
+        creds = get_credentials(credentials_path, token_path)
+        cached = _services.get(token_path)
+        # Refreshes update creds in place; only a brand new login needs a new service
+        if cached is None or cached[0] is not creds:
+            # static_discovery uses the document shipped with google-api-python-client, so no network fetch
+            service = build('calendar', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+            cached = _services[token_path] = (creds, service)
+        return cached[1]
+
+def get_calendar_manager(credentials_path, calendar_ids=None, token_path=None):
+    """Return the process-wide CalendarManager for a credentials file, token and calendar set, creating it once."""
+    calendar_ids = tuple(calendar_ids or DEFAULT_CALENDAR_IDS)
+    token_path = token_path or TOKEN_PATH
+    with _managers_lock:
+        key = (credentials_path, calendar_ids, token_path)
+        if key not in _managers:
+            _managers[key] = CalendarManager(credentials_path, calendar_ids, token_path)
+        return _managers[key]
+
+def _event_time(value):
+    if 'dateTime' in value:
+        return datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+    if 'date' in value:
+        return datetime.fromisoformat(value['date']).replace(tzinfo=timezone.utc)
+    return None
+
+def event_start(event):
+    """Return the start of an event as an aware datetime, handling all-day events."""
+    return _event_time(event.get('start', {}))
+
+def event_end(event):
+    """Return the end of an event as an aware datetime; all-day events end at the (exclusive) end date."""
+    return _event_time(event.get('end', {})) or event_start(event)
+
+def occurs_on(event, day):
+    """Whether an event takes place on a date: it starts that day, or started earlier and is still running."""
+    start = event_start(event)
+    if start is None:
+        return False
+    # Ends are exclusive, so an all-day event ending on the next day's midnight doesn't spill into it
+    last = max(event_end(event) - timedelta(microseconds=1), start)
+    return start.date() <= day <= last.date()
 
 class CalendarManager:
-    def __init__(self, credentials_path):
+    def __init__(self, credentials_path, calendar_ids=None, token_path=None):
         self.credentials_path = credentials_path
-        self.service = self._get_calendar_service()
+        self.token_path = token_path or TOKEN_PATH
+        self.calendar_ids = list(calendar_ids or DEFAULT_CALENDAR_IDS)
 
-    def _get_calendar_service(self):
-        creds = None
-        if os.path.exists('token.pickle'):
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
+        self._lock = threading.RLock()
+        # calendar id -> event id -> event
+        self._events = {calendar_id: {} for calendar_id in self.calendar_ids}
+        self._sync_tokens = {}
+        self._window_end = None
+        self._window_days = SYNC_WINDOW_DAYS
+        self._last_sync = None
+        self._day_verdicts = {}
+        # Bumped whenever the cached events change, so derived results can be invalidated
+        self.version = 0
+
+    @property
+    def service(self):
+        # Credentials are checked on every access so long sessions refresh before expiry;
+        # the service itself is only built once per process
+        return get_calendar_service(self.credentials_path, self.token_path)
+
+    def _execute_batch(self, requests):
+        """Run one events().list per calendar as a single batched HTTP request.
+
+        Returns {calendar_id: {'result': response, 'gone': bool}}, where 'gone' marks
+        a 410 response meaning that calendar's sync token expired.
+        """
+        def run():
+            results = {}
+            errors = []
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    results[request_id] = {'result': response, 'gone': False}
+                elif isinstance(exception, HttpError) and exception.resp.status == 410:
+                    results[request_id] = {'result': None, 'gone': True}
+                else:
+                    errors.append(exception)
+
+            calendar_ids = list(requests)
+            for offset in range(0, len(calendar_ids), BATCH_LIMIT):
+                batch = self.service.new_batch_http_request(callback=callback)
+                for calendar_id in calendar_ids[offset:offset + BATCH_LIMIT]:
+                    batch.add(
+                        self.service.events().list(calendarId=calendar_id, **requests[calendar_id]),
+                        request_id=calendar_id
+                    )
+                batch.execute()
+            if errors:
+                raise errors[0]
+            return results
+
+        # Replayed sessions never touch self.service, so they skip the OAuth flow entirely
+        return cassette.call(
+            'calendar',
+            {
+                calendar_id: {k: v for k, v in params.items() if k not in ('timeMin', 'timeMax')}
+                for calendar_id, params in requests.items()
+            },
+            run
+        )
+
+    def _full_sync_params(self, now):
+        return {
+            'timeMin': (now - timedelta(days=1)).isoformat(),
+            'timeMax': self._window_end.isoformat(),
+            'singleEvents': True
+        }
+
+    def _sync(self, now, full, days_ahead=1):
+        """Sync every calendar in batched rounds until no calendar has pages left.
+
+        A full sync covers SYNC_WINDOW_DAYS, widened to days_ahead plus some slack when that is
+        further; the window never shrinks back, so long plans keep being served incrementally.
+        """
+        if full:
+            # Sync tokens can't change the queried range, so a wider window means a full sync
+            if days_ahead + SYNC_SLACK_DAYS > self._window_days:
+                self._window_days = days_ahead + SYNC_SLACK_DAYS
+            self._window_end = now + timedelta(days=self._window_days)
+            self._sync_tokens = {}
+
+        pending = {}
+        changed = False
+        for calendar_id in self.calendar_ids:
+            token = self._sync_tokens.get(calendar_id)
+            if token:
+                pending[calendar_id] = {'syncToken': token, 'singleEvents': True}
             else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path, ['https://www.googleapis.com/auth/calendar.readonly'])
-                creds = flow.run_local_server(port=0)
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
+                self._events[calendar_id] = {}
+                pending[calendar_id] = self._full_sync_params(now)
+                changed = True
+
+        while pending:
+            results = self._execute_batch(pending)
+            next_round = {}
+            for calendar_id, params in pending.items():
+                outcome = results[calendar_id]
+                if outcome['gone']:
+                    # The sync token expired, so this calendar needs a full sync
+                    self._events[calendar_id] = {}
+                    self._sync_tokens.pop(calendar_id, None)
+                    next_round[calendar_id] = self._full_sync_params(now)
+                    changed = True
+                    continue
+
+                result = outcome['result']
+                events = self._events[calendar_id]
+                for event in result.get('items', []):
+                    changed = True
+                    if event.get('status') == 'cancelled':
+                        events.pop(event['id'], None)
+                    else:
+                        events[event['id']] = event
+
+                if result.get('nextPageToken'):
+                    next_round[calendar_id] = dict(params, pageToken=result['nextPageToken'])
+                else:
+                    self._sync_tokens[calendar_id] = result.get('nextSyncToken')
+            pending = next_round
 
-        return build('calendar', 'v3', credentials=creds)
+        if changed:
+            self.version += 1
+            self._day_verdicts = {}
+
+    def refresh(self, days_ahead=1, force=False):
+        """Bring the local event cache up to date, skipping the API while it is still fresh."""
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            in_window = self._window_end is not None and now + timedelta(days=days_ahead) <= self._window_end
+            fresh = self._last_sync is not None and time.monotonic() - self._last_sync < FRESHNESS_SECONDS
+            if fresh and in_window and not force:
+                return
+
+            self._sync(now, full=not in_window, days_ahead=days_ahead)
+            self._last_sync = time.monotonic()
 
     def get_events(self, days_ahead=1):
-        now = datetime.utcnow().isoformat() + 'Z'
-        end = (datetime.utcnow() + timedelta(days=days_ahead)).isoformat() + 'Z'
-        
-        events_result = self.service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            timeMax=end,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        return events_result.get('items', []) 
\ No newline at end of file
+        """Return cached events from every calendar still to come or under way within the next `days_ahead` days, in start order.
+
+        Events that already started but haven't ended, including today's all-day events, are included.
+        """
+        with self._lock:
+            self.refresh(days_ahead)
+            now = datetime.now(timezone.utc)
+            end = now + timedelta(days=days_ahead)
+            upcoming = []
+            for event in (e for events in self._events.values() for e in events.values()):
+                start = event_start(event)
+                if start is not None and event_end(event) > now and start <= end:
+                    upcoming.append((start, event))
+            upcoming.sort(key=lambda pair: pair[0])
+            return [event for _, event in upcoming]
+
+    def day_verdict(self, day, compute):
+        """Memoize compute() for a date until the cached events change."""
+        with self._lock:
+            self.refresh()
+            if day not in self._day_verdicts:
+                self._day_verdicts[day] = compute()
+            return self._day_verdicts[day]
@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+# FITIFY_CASSETTE_MODE=record stores every external call made during a session,
+# FITIFY_CASSETTE_MODE=replay answers the same calls from disk without touching the network.
+MODE = os.getenv("FITIFY_CASSETTE_MODE")
+PATH = os.getenv("FITIFY_CASSETTE_PATH", "data/cassette.jsonl.gz")
+
+_lock = threading.Lock()
+_tape = None
+_cursors = {}
+
+
+def use(mode, path=None):
+    """Switch the cassette mode ("record", "replay" or None) at runtime"""
+    global MODE, PATH, _tape
+    with _lock:
+        MODE = mode
+        if path:
+            PATH = path
+        _tape = None
+        _cursors.clear()
+
+
+def replaying():
+    return MODE == "replay"
+
+
+def _key(kind, request):
+    payload = json.dumps([kind, request], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_tape():
+    global _tape
+    if _tape is None:
+        _tape = {}
+        try:
+            with gzip.open(PATH, "rt") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        _tape.setdefault(entry["key"], []).append(entry["response"])
+        except FileNotFoundError:
+            pass
+    return _tape
+
+
+def _replay(kind, request, decode):
+    key = _key(kind, request)
+    with _lock:
+        responses = _load_tape().get(key)
+        if not responses:
+            raise KeyError(f"No recorded {kind} call for request {key[:12]} in {PATH}")
+        index = _cursors.get(key, 0)
+        _cursors[key] = index + 1
+        response = responses[min(index, len(responses) - 1)]
+    return decode(response) if decode else response
+
+
+def _record(kind, request, result, encode):
+    entry = {"key": _key(kind, request), "kind": kind, "response": encode(result) if encode else result}
+    with _lock:
+        directory = os.path.dirname(PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(PATH, "at") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+
+def call(kind, request, fn, encode=None, decode=None):
+    """Run fn(), recording its response under (kind, request) or replaying a recorded one.
+
+    Responses recorded more than once for the same request are replayed in order,
+    repeating the last one when the tape runs out.
+    """
+    if MODE == "replay":
+        return _replay(kind, request, decode)
+
+    result = fn()
+    if MODE == "record":
+        _record(kind, request, result, encode)
+    return result
+
+
+async def call_async(kind, request, fn, encode=None, decode=None):
+    """Like call(), for an fn that returns an awaitable"""
+    if MODE == "replay":
+        return _replay(kind, request, decode)
+
+    result = await fn()
+    if MODE == "record":
+        _record(kind, request, result, encode)
+    return result
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return {"prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None)
+    }
+
+
+def encode_crew_output(result):
+    """Reduce a CrewOutput to its raw text and token usage"""
+    raw = result if isinstance(result, str) else (result.raw if hasattr(result, "raw") else str(result))
+    return {"raw": raw, "usage": _usage_dict(getattr(result, "token_usage", None))}
+
+
+def decode_crew_output(response):
+    """Rebuild an object that looks like a CrewOutput to the parsing and telemetry code"""
+    return SimpleNamespace(raw=response["raw"], token_usage=response["usage"])
+
+
+def encode_chat_response(response):
+    """Reduce a Mistral chat response to its message content and token usage"""
+    return {
+        "content": response.choices[0].message.content,
+        "usage": _usage_dict(getattr(response, "usage", None))
+    }
+
+
+def decode_chat_response(response):
+    """Rebuild an object that looks like a Mistral chat response"""
+    message = SimpleNamespace(content=response["content"])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=response["usage"])
@@ -1,21 +1,30 @@
-import json
+from tools.analytics import get_analytics
+from tools.json_store import update_json
+from tools.user_store import get_store
 
-def remove_item(item_id):
-    with open("data/wardrobe.json", "r") as f:
-        data = json.load(f)
-    # Filter out the item with the given id
-    data["items"] = [item for item in data["items"] if item["id"] != item_id]
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(data, f, indent=2)
-
-def add_item(new_item):
-    with open("data/wardrobe.json", "r") as f:
-        data = json.load(f)
+def _items(data):
     # Ensure "items" key exists and is a list
     if "items" not in data or not isinstance(data["items"], list):
         data["items"] = []
-    data["items"].append(new_item)
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(data, f, indent=2)
-    with open("data/wardrobe.json", "w") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+    return data["items"]
+
+def remove_item(item_id, store=None):
+    store = store or get_store()
+    def remove(data):
+        # Filter out the item with the given id
+        data["items"] = [item for item in _items(data) if item["id"] != item_id]
+    update_json(store.wardrobe_path, remove, default=dict)
+    get_analytics(store).item_removed(item_id)
+
+def add_item(new_item, store=None):
+    store = store or get_store()
+    update_json(store.wardrobe_path, lambda data: _items(data).append(new_item), default=dict)
+    get_analytics(store).item_added(new_item)
+
+def update_item(updated_item, store=None):
+    """Replace the stored item with the same id, leaving every other item as it is on disk"""
+    store = store or get_store()
+    def replace(data):
+        data["items"] = [updated_item if item["id"] == updated_item["id"] else item for item in _items(data)]
+    update_json(store.wardrobe_path, replace, default=dict)
+    get_analytics(store).item_added(updated_item)
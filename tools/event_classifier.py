@@ -0,0 +1,103 @@
+import json
+import re
+
+RULES_PATH = "data/event_rules.json"
+
+# Each rule is a keyword (matched as a case-insensitive substring) or a regex, and
+# sets a formality level, an activity type, or both, for any event it matches.
+DEFAULT_RULES = [
+    {"keyword": "meeting", "formality": "formal"},
+    {"keyword": "interview", "formality": "formal"},
+    {"keyword": "competition", "formality": "formal"},
+    {"keyword": "presentation", "formality": "formal"},
+    {"keyword": "wedding", "formality": "formal"},
+    {"keyword": "gala", "formality": "formal"},
+    {"keyword": "client", "formality": "business casual"},
+    {"keyword": "office", "formality": "business casual"},
+    {"keyword": "practice", "activity": "athletic"},
+    {"keyword": "training", "activity": "athletic"},
+    {"keyword": "workout", "activity": "athletic"},
+    {"keyword": "gym", "activity": "athletic"},
+    # Whole words only: "run" or "date" alone would also match "run payroll" and "due date"
+    {"regex": r"\b(?:running|jog|yoga|swim(?:ming)?|hik(?:e|ing))\b", "activity": "athletic"},
+    {"regex": r"\b(?:party|dinner|drinks)\b", "activity": "social"},
+]
+
+FORMALITY_RANK = {"casual": 0, "business casual": 1, "formal": 2}
+
+
+class EventClassifier:
+    """Classifies calendar events against keyword and regex rules.
+
+    All rules are also compiled into one combined pattern, so an event no rule matches (most of
+    them) costs a single regex pass. Events that do match are checked rule by rule, because the
+    combined pattern consumes the text it matches and would hide overlapping matches of other rules.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._patterns = [
+            re.compile(rule["regex"] if "regex" in rule else re.escape(rule["keyword"]), re.IGNORECASE)
+            for rule in self.rules
+        ]
+        combined = "|".join(f"(?:{pattern.pattern})" for pattern in self._patterns)
+        self._any = re.compile(combined, re.IGNORECASE) if self._patterns else None
+
+    def classify(self, event):
+        """Return (formality or None, set of activity types) for one event."""
+        # Summary, description and location are scanned together
+        text = "\n".join(event.get(field) or "" for field in ("summary", "description", "location"))
+        if self._any is None or not self._any.search(text):
+            return None, set()
+
+        formality = None
+        activities = set()
+        for rule, pattern in zip(self.rules, self._patterns):
+            if not pattern.search(text):
+                continue
+            level = rule.get("formality")
+            if level and (formality is None or FORMALITY_RANK.get(level, 0) > FORMALITY_RANK.get(formality, 0)):
+                formality = level
+            if rule.get("activity"):
+                activities.add(rule["activity"])
+        return formality, activities
+
+    def classify_events(self, events, start_of):
+        """Summarize a day's events into the overall formality and a list of timed activities."""
+        formality = "casual"
+        activities = []
+        for event in events:
+            level, types = self.classify(event)
+            if level and FORMALITY_RANK.get(level, 0) > FORMALITY_RANK.get(formality, 0):
+                formality = level
+            start = start_of(event)
+            for activity_type in sorted(types):
+                activities.append({
+                    "type": activity_type,
+                    "time": start.strftime("%H:%M") if start else None,
+                    "duration": event.get("duration", "1h")
+                })
+        return {"formality": formality, "activities": activities}
+
+
+def load_rules(path=RULES_PATH):
+    """Load user rules from JSON, falling back to the defaults"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)["rules"]
+    except FileNotFoundError:
+        return DEFAULT_RULES
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"Warning: Could not load event rules: {str(e)}")
+        return DEFAULT_RULES
+
+
+_classifier = None
+
+
+def get_classifier():
+    """Return the shared classifier, compiling the rules on first use"""
+    global _classifier
+    if _classifier is None:
+        _classifier = EventClassifier(load_rules())
+    return _classifier
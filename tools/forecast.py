@@ -0,0 +1,65 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# Forecast slots between these local hours describe the part of the day an outfit is worn for
+DAYTIME_HOURS = range(8, 21)
+PRECIPITATION_KEYWORDS = ("thunderstorm", "rain", "drizzle", "shower", "snow", "sleet")
+
+
+def pyowm_fields(weather):
+    """Observation fields from a pyowm Weather, in the units of the imperial OWM API (°F, mph)"""
+    return {
+        "temperature": weather.temperature("fahrenheit")["temp"],
+        "conditions": weather.detailed_status,
+        "humidity": weather.humidity,
+        # pyowm reports wind in m/s unless asked, but the weather rules' thresholds are in mph
+        "wind_speed": weather.wind(unit="miles_hour")["speed"]
+    }
+
+
+def _local_date(entry, utc_offset):
+    return datetime.fromtimestamp(entry["dt"] + utc_offset, tz=timezone.utc)
+
+
+def summarize_day(entries):
+    """Collapse one day's 3-hourly forecast slots into a single observation-shaped dict"""
+    descriptions = [entry["conditions"] for entry in entries]
+    # Rain at any point of the day matters more than the most common sky
+    wet = [d for d in descriptions if any(keyword in d.lower() for keyword in PRECIPITATION_KEYWORDS)]
+    conditions = Counter(wet or descriptions).most_common(1)[0][0]
+    return {
+        "temperature": round(sum(entry["temperature"] for entry in entries) / len(entries), 1),
+        "temperature_min": min(entry["temperature"] for entry in entries),
+        "temperature_max": max(entry["temperature"] for entry in entries),
+        "conditions": conditions,
+        "humidity": round(sum(entry["humidity"] for entry in entries) / len(entries)),
+        "wind_speed": max(entry["wind_speed"] for entry in entries)
+    }
+
+
+def daily_summaries(entries, utc_offset, start, days):
+    """Return [(date, observation, estimated)] for days local dates from start.
+
+    Days outside the forecast horizon reuse the nearest forecast day and are marked estimated.
+    """
+    by_date = {}
+    for entry in entries:
+        local = _local_date(entry, utc_offset)
+        by_date.setdefault(local.date(), []).append((local.hour, entry))
+
+    summaries = {}
+    for day, slots in by_date.items():
+        daytime = [entry for hour, entry in slots if hour in DAYTIME_HOURS]
+        summaries[day] = summarize_day(daytime or [entry for _, entry in slots])
+
+    result = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if day in summaries:
+            result.append((day, summaries[day], False))
+        elif summaries:
+            nearest = min(summaries, key=lambda known: abs((known - day).days))
+            result.append((day, dict(summaries[nearest]), True))
+        else:
+            result.append((day, None, True))
+    return result
@@ -0,0 +1,106 @@
+import math
+import os
+import threading
+import time
+
+from tools.json_store import read_json, write_json
+
+LOCATIONS_PATH = "data/locations.json"
+# Width of a weather grid cell in degrees (0.1° is roughly 11 km); everyone in a cell shares one observation
+GRID_DEGREES = 0.1
+WEATHER_TTL_SECONDS = float(os.getenv("WEATHER_TTL_SECONDS", "600"))
+
+
+def normalize(location):
+    """Canonical cache key for a free-text location, e.g. ' chicago ,US' -> 'chicago,us'"""
+    return ",".join(part.strip().lower() for part in location.split(",") if part.strip())
+
+
+def grid_cell(lat, lon, size=GRID_DEGREES):
+    """Center of the grid cell containing a point, used both as cache key and as query coordinates"""
+    def center(value):
+        return round(math.floor(value / size) * size + size / 2, 4)
+    return center(lat), center(lon)
+
+
+class LocationCache:
+    """Free-text locations resolved to coordinates once, and kept on disk across restarts."""
+
+    def __init__(self, path=LOCATIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.places = read_json(path, default=dict)
+
+    def resolve(self, location, geocode):
+        """Return {lat, lon, name, country} for a location, calling geocode(location) only on a miss"""
+        key = normalize(location)
+        with self._lock:
+            place = self.places.get(key)
+        if place is not None:
+            return place
+
+        place = geocode(location)
+        with self._lock:
+            self.places[key] = place
+            try:
+                write_json(self.path, self.places)
+            except OSError as e:
+                print(f"Warning: Could not save location cache: {str(e)}")
+        return place
+
+
+class WeatherGrid:
+    """Observations per grid cell for WEATHER_TTL_SECONDS; concurrent misses on a cell fetch once."""
+
+    def __init__(self, ttl=WEATHER_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._cell_locks = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, cell):
+        entry = self._entries.get(cell)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return dict(entry[1])
+        return None
+
+    def get(self, cell, fetch):
+        with self._lock:
+            cached = self._fresh(cell)
+            if cached is not None:
+                return cached
+            cell_lock = self._cell_locks.setdefault(cell, threading.Lock())
+
+        with cell_lock:
+            # Another session may have filled the cell while we waited
+            with self._lock:
+                cached = self._fresh(cell)
+            if cached is not None:
+                return cached
+            observation = fetch()
+            with self._lock:
+                self._entries[cell] = (time.monotonic(), observation)
+            return dict(observation)
+
+
+_location_cache = None
+_weather_grid = None
+_singletons_lock = threading.Lock()
+
+
+def get_location_cache():
+    """Return the shared location cache, loading it on first use"""
+    global _location_cache
+    with _singletons_lock:
+        if _location_cache is None:
+            _location_cache = LocationCache()
+        return _location_cache
+
+
+def get_weather_grid():
+    """Return the process-wide weather grid cache"""
+    global _weather_grid
+    with _singletons_lock:
+        if _weather_grid is None:
+            _weather_grid = WeatherGrid()
+        return _weather_grid
@@ -0,0 +1,134 @@
+"""Local, LLM-free stand-ins for the weather analysis and outfit generation stages.
+
+Used when the LLM backend is slow or failing, so a suggestion can still be made in milliseconds.
+"""
+from tools.item_slots import slot_of
+from tools.weather_rules import get_weather_rules
+
+TEMPERATURE_ORDER = ["cold", "cool", "mild", "warm", "hot"]
+
+FORMALITY_HINTS = {
+    "formal": ("dress", "blazer", "oxford", "loafer", "wool", "suit", "button"),
+    "business casual": ("chinos", "polo", "button", "sweater", "leather", "loafer"),
+    "casual": ("t-shirt", "denim", "jeans", "sneaker", "cotton", "hoodie", "shorts"),
+    "athletic": ("athletic", "running", "sneaker", "gym", "shorts", "sport"),
+}
+
+MAX_ALTERNATIVES = 5
+SLOTS = ("top", "bottom", "shoes")
+
+
+def weather_analysis(raw_data):
+    """Rule-based weather analysis, or a neutral one when there is no observation"""
+    if not raw_data:
+        return {
+            "temperature_category": "mild",
+            "weather_conditions": [],
+            "clothing_recommendations": ["light layers"],
+            "special_considerations": ["weather unavailable, check conditions before heading out"]
+        }
+    return get_weather_rules().analyze(raw_data)
+
+
+def _item_text(item):
+    return " ".join(str(item.get(field, "")) for field in ("type", "form", "color", "notes")).lower()
+
+
+def score_item(item, analysis, formality, activity, wear_index=None):
+    """Higher is better: weather tag fit, formality/activity hints, minus a recent-wear penalty"""
+    tags = {str(tag).lower() for tag in item.get("weather", [])}
+    category = analysis.get("temperature_category", "mild")
+    score = 0.0
+    if category in tags:
+        score += 2
+    elif category in TEMPERATURE_ORDER:
+        position = TEMPERATURE_ORDER.index(category)
+        neighbours = TEMPERATURE_ORDER[max(position - 1, 0):position + 2]
+        if tags & set(neighbours):
+            score += 1
+    score += sum(1 for condition in analysis.get("weather_conditions", []) if condition in tags)
+
+    text = _item_text(item)
+    score += sum(0.5 for hint in FORMALITY_HINTS.get(str(formality).lower(), ()) if hint in text)
+    if str(activity).lower() in ("athletic", "exercise"):
+        score += sum(0.5 for hint in FORMALITY_HINTS["athletic"] if hint in text)
+
+    if wear_index is not None:
+        score -= 2 * wear_index.penalty(item.get("id"))
+    return score
+
+
+def pick_outfit(items, analysis, formality="casual", activity="general", wear_index=None):
+    """Deterministically pick the best top, bottom and shoes, in generate_outfit's response shape"""
+    ranked = {"top": [], "bottom": [], "shoes": []}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        slot = slot_of(item)
+        if slot in ranked:
+            ranked[slot].append((-score_item(item, analysis, formality, activity, wear_index), item["id"]))
+    for slot in ranked:
+        # Ties are broken by id so the same inputs always give the same outfit
+        ranked[slot] = [item_id for _, item_id in sorted(ranked[slot])]
+
+    chosen = [ranked[slot][0] for slot in ("top", "bottom", "shoes") if ranked[slot]]
+    category = analysis.get("temperature_category", "mild")
+    return {
+        "outfits": [
+            {
+                "name": f"{str(formality).title()} {category} pick",
+                "items": chosen,
+                "style_notes": "Picked locally from weather tags and formality while the AI stylist was unavailable",
+                "weather_compatibility": f"Suited to {category} weather",
+                "formality_level": str(formality).lower()
+            }
+        ],
+        "alternatives": {slot: ranked[slot][1:1 + MAX_ALTERNATIVES] for slot in ranked},
+        "recommendations": analysis.get("clothing_recommendations", [])
+    }
+
+
+def plan_days(items, days, wear_index=None, laundry_cycle_days=7, proposed=None, clean_on=None):
+    """Pick one outfit per day so nothing is worn again before it is back from the laundry.
+
+    days are dicts with date, analysis, formality and activity. proposed maps a date to the
+    item ids suggested for it (e.g. by the LLM), which are kept wherever they fill an open slot
+    and are clean; the rest is picked by score. clean_on maps item ids already in the laundry
+    to the day index they come back. Returns [{date, items, reused}], where reused lists items
+    worn again early because everything else for their slot was in the laundry.
+    """
+    by_id = {item["id"]: item for item in items if isinstance(item, dict)}
+    by_slot = {slot: [] for slot in SLOTS}
+    for item in by_id.values():
+        slot = slot_of(item)
+        if slot in by_slot:
+            by_slot[slot].append(item)
+    clean_on = dict(clean_on or {})
+
+    plan = []
+    for index, day in enumerate(days):
+        chosen, reused = {}, []
+        for item_id in (proposed or {}).get(day["date"], []):
+            item = by_id.get(item_id)
+            slot = slot_of(item) if item else None
+            if slot in by_slot and slot not in chosen and clean_on.get(item_id, 0) <= index:
+                chosen[slot] = item_id
+
+        for slot in SLOTS:
+            if slot in chosen or not by_slot[slot]:
+                continue
+            clean = [item for item in by_slot[slot] if clean_on.get(item["id"], 0) <= index]
+            if clean:
+                best = min(clean, key=lambda item: (
+                    -score_item(item, day["analysis"], day["formality"], day["activity"], wear_index), item["id"]
+                ))
+            else:
+                # Everything for this slot is in the laundry, so rewear whatever is back soonest
+                best = min(by_slot[slot], key=lambda item: (clean_on[item["id"]], item["id"]))
+                reused.append(best["id"])
+            chosen[slot] = best["id"]
+
+        for item_id in chosen.values():
+            clean_on[item_id] = index + laundry_cycle_days
+        plan.append({"date": day["date"], "items": [chosen[slot] for slot in SLOTS if slot in chosen], "reused": reused})
+    return plan
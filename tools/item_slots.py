@@ -0,0 +1,17 @@
+TOP_TYPES = ['shirt', 't-shirt', 'sweater', 'parka', 'top']
+BOTTOM_TYPES = ['pants', 'shorts', 'bottom']
+SHOE_TYPES = ['shoes']
+
+# Outfit slot -> the key the swap prompts use for that slot
+SLOT_KEYS = {'top': 'tops', 'bottom': 'bottoms', 'shoes': 'shoes'}
+
+def slot_of(item):
+    """Return the outfit slot ('top', 'bottom' or 'shoes') an item fills, or None"""
+    item_type = item.get('type', '').lower()
+    if item_type in TOP_TYPES:
+        return 'top'
+    if item_type in BOTTOM_TYPES:
+        return 'bottom'
+    if item_type in SHOE_TYPES:
+        return 'shoes'
+    return None
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, atomic replace still applies
+    fcntl = None
+
+
+class WriteConflict(Exception):
+    """Raised when a file changed on disk since the version the caller read."""
+
+
+class CorruptJSON(Exception):
+    """Raised instead of overwriting a file that isn't valid JSON; the bad file is kept at .moved_to."""
+
+    def __init__(self, path, moved_to):
+        super().__init__(f"{path} is not valid JSON; moved it to {moved_to}")
+        self.path = path
+        self.moved_to = moved_to
+
+
+def file_version(path):
+    """Identify the current contents of a file; every atomic write produces a new inode"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on path's sidecar .lock file.
+
+    flock locks belong to the open file, so this serializes threads as well as processes.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _read(path, default, strict=False):
+    """Load a JSON file, or default when it is missing.
+
+    A file that isn't valid JSON also reads as default, unless strict: callers that write the
+    data back must not replace it with the default, so the bad file is moved aside (for manual
+    recovery; later reads start from default) and CorruptJSON is raised. Call it under the lock.
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        if strict:
+            moved_to = f"{path}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(path, moved_to)
+            raise CorruptJSON(path, moved_to)
+        print(f"Warning: {path} is not valid JSON, using the default")
+    return default() if callable(default) else default
+
+
+def _replace(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    # Make the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def read_json(path, default=None):
+    """Read a JSON file, returning default when it is missing or unreadable (read_json never writes)"""
+    return _read(path, default)
+
+
+def read_versioned(path, default=None):
+    """Read a JSON file together with its version, for a later write_json(expected_version=...)
+
+    Raises CorruptJSON rather than handing back a default that would be written over the file.
+    """
+    with file_lock(path):
+        return _read(path, default, strict=True), file_version(path)
+
+
+def write_json(path, data, expected_version=None):
+    """Atomically replace a JSON file: write a temp file, fsync it, then rename it over the original.
+
+    With expected_version, raise WriteConflict instead of overwriting a file someone else changed.
+    Returns the new version.
+    """
+    with file_lock(path):
+        if expected_version is not None and file_version(path) != expected_version:
+            raise WriteConflict(f"{path} was changed by another session")
+        _replace(path, data)
+        return file_version(path)
+
+
+def update_json(path, mutate, default=None):
+    """Read, modify and atomically write a JSON file under its lock.
+
+    mutate changes the data in place (or returns a replacement). Keep it quick: the lock
+    is held while it runs, so never call an LLM or the network from inside it.
+    Raises CorruptJSON, leaving the file's contents unchanged, if it isn't valid JSON.
+    """
+    return update_versioned(path, mutate, default)[0]
+
+
+def update_versioned(path, mutate, default=None):
+    """update_json that also returns the new version, for callers caching the file in memory"""
+    with file_lock(path):
+        data = _read(path, default, strict=True)
+        result = mutate(data)
+        if result is not None:
+            data = result
+        _replace(path, data)
+        return data, file_version(path)
@@ -1,32 +1,41 @@
-import json
 from tools.db_manager import add_item, remove_item
+from tools.json_store import read_json, update_json
+from tools.user_store import get_store
 
-def filter_wardrobe_items():
-    LAUNDRY_CYCLE = 2
+# Laundry runs an item goes through before it is back in the wardrobe
+LAUNDRY_CYCLE = 2
 
-    with open("data/wardrobe.json", "r") as f:
-        wardrobe = json.load(f)
-    with open("data/worn.json", "r") as f:
-        worn = json.load(f)
-    
-    for item in worn.get("laundry", [])[:]:
-        if item["count"] >= LAUNDRY_CYCLE:
-            print(f"Item {item['id']} has been through the laundry. It will be removed from the worn list.")
-            worn["laundry"].remove(item)
-            add_item(item)
-            with open("data/worn.json", "w") as f:
-                json.dump(worn, f, indent=2)
+def filter_wardrobe_items(store=None):
+    store = store or get_store()
 
+    clean = []
+    def take_clean(worn):
+        for item in worn.get("laundry", [])[:]:
+            if item["count"] >= LAUNDRY_CYCLE:
+                print(f"Item {item['id']} has been through the laundry. It will be removed from the worn list.")
+                worn["laundry"].remove(item)
+                clean.append(item)
+    worn = update_json(store.worn_path, take_clean, default=lambda: {"laundry": []})
+    for item in clean:
+        add_item(item, store)
+
+    wardrobe = read_json(store.wardrobe_path, default=lambda: {"items": []})
     worn_ids = {item["id"] for item in worn.get("laundry", [])}
     filtered_wardrobe_items = [item for item in wardrobe["items"] if item["id"] not in worn_ids]
     return filtered_wardrobe_items
 
-def increment_laundry_count():
-    with open("data/worn.json", "r") as f:
-        worn = json.load(f)
-    
-    for item in worn.get("laundry", []):
-        item["count"] += 1
+def increment_laundry_count(store=None):
+    store = store or get_store()
+    def increment(worn):
+        for item in worn.get("laundry", []):
+            item["count"] += 1
+    update_json(store.worn_path, increment, default=lambda: {"laundry": []})
 
-    with open("data/worn.json", "w") as f:
-        json.dump(worn, f, indent=2)
\ No newline at end of file
+def laundry_schedule(laundry_cycle_days, store=None):
+    """Return [(item, days until clean)] for everything in the laundry, one run every laundry_cycle_days"""
+    store = store or get_store()
+    worn = read_json(store.worn_path, default=lambda: {"laundry": []})
+    return [
+        (item, max(LAUNDRY_CYCLE - item.get("count", 0), 0) * laundry_cycle_days)
+        for item in worn.get("laundry", [])
+    ]
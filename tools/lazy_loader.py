@@ -0,0 +1,71 @@
+"""Lazy imports for the heavy AI, weather and calendar layers, with timing.
+
+Run `python -m tools.lazy_loader` to measure the cold import cost of the app's
+dependencies, each in a fresh interpreter, and catch start-up regressions.
+"""
+import importlib
+import subprocess
+import sys
+import threading
+import time
+
+# Modules the app only needs once the user asks for AI features
+HEAVY_MODULES = ["src.Wardrobe", "src.FitIdentification"]
+# Modules imported when app.py starts
+STARTUP_MODULES = ["streamlit", "PIL.Image", "tools.telemetry", "tools.analytics", "tools.wear_index"]
+
+_lock = threading.Lock()
+_timings = {}
+
+
+def load(module_name):
+    """Import a module on first use and remember how long the import took"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _timings.setdefault(module_name, round(elapsed_ms, 1))
+    print(f"[imports] loaded {module_name} in {elapsed_ms:.1f} ms")
+    return module
+
+
+def record(name, elapsed_ms):
+    """Record an import timing measured elsewhere, e.g. the app's own start-up imports.
+
+    The first measurement is kept, so Streamlit reruns with warm modules don't hide the cold start.
+    """
+    with _lock:
+        _timings.setdefault(name, round(elapsed_ms, 1))
+
+
+def timings():
+    with _lock:
+        return dict(_timings)
+
+
+def measure_cold(module_name, python=sys.executable):
+    """Import time of a module in a fresh interpreter, in milliseconds"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module_name}; print((time.perf_counter() - start) * 1000)"
+    )
+    result = subprocess.run([python, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'module':<28} {'cold import (ms)':>18}")
+    for module_name in STARTUP_MODULES + HEAVY_MODULES:
+        elapsed = measure_cold(module_name)
+        shown = f"{elapsed:.1f}" if elapsed is not None else "failed"
+        lazy = " (lazy)" if module_name in HEAVY_MODULES else ""
+        print(f"{module_name:<28} {shown:>18}{lazy}")
+
+
+if __name__ == "__main__":
+    main()
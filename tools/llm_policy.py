@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Requests per second allowed to the LLM provider across every session in this process
+RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "4"))
+BURST = int(os.getenv("LLM_BURST", "8"))
+# Retries after the first attempt for rate limits, 5xx responses, timeouts and dropped connections
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 20.0
+# LLM_HEDGE=1 sends a duplicate of a slow stateless call once it passes the stage's p95 latency
+HEDGE_ENABLED = os.getenv("LLM_HEDGE") == "1"
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Consecutive failed requests (after retries) that open the circuit, and how long it stays open
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a failing backend for a cooldown, then lets one trial request through."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial_running:
+                raise CircuitOpen("LLM backend is failing, skipping the call")
+            # Half-open: let this one request test the backend
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def reset(self):
+        """Close the breaker and forget earlier failures"""
+        self.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens per second up to capacity; acquire blocks until one is free."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+_bucket = TokenBucket(RATE_PER_SECOND, BURST)
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN_SECONDS)
+_latencies = {}
+_latencies_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+def status_code(error):
+    """HTTP status of a provider error, whichever client library raised it"""
+    for candidate in (error, getattr(error, "response", None)):
+        code = getattr(candidate, "status_code", None) or getattr(candidate, "status", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error):
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+    return (
+        "ratelimit" in name or "timeout" in name or "connection" in name
+        or "rate limit" in message or "429" in message
+    )
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff, so retrying sessions don't stampede together"""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _observe(stage, elapsed):
+    with _latencies_lock:
+        _latencies.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+
+
+def hedge_after(stage):
+    """Seconds to wait before hedging a call for this stage, or None without enough history"""
+    with _latencies_lock:
+        samples = sorted(_latencies.get(stage, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[int(0.95 * (len(samples) - 1))]
+
+
+def _attempt(stage, fn, call, hedge):
+    _bucket.acquire()
+    start = time.monotonic()
+    delay = hedge_after(stage) if hedge and HEDGE_ENABLED else None
+    if delay is None:
+        result = fn()
+    else:
+        first = _hedge_pool.submit(fn)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            result = first.result()
+        else:
+            _bucket.acquire()
+            if call is not None:
+                call["hedged"] = True
+            second = _hedge_pool.submit(fn)
+            done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+            # The loser keeps running in the background; its result is simply dropped
+            result = done.pop().result()
+    _observe(stage, time.monotonic() - start)
+    return result
+
+
+def call(stage, fn, call=None, hedge=False):
+    """Run one LLM request under the shared rate limit, retrying transient failures.
+
+    Raises CircuitOpen without calling fn while the breaker is open.
+
+    call is the telemetry record of the request, whose retries count is updated. Pass
+    hedge=True only for stateless, idempotent requests that are safe to send twice.
+    """
+    breaker.before_call()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            result = _attempt(stage, fn, call, hedge)
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                breaker.record_failure()
+                raise
+            delay = backoff_delay(attempt)
+            print(f"LLM {stage} failed with {type(e).__name__} (status {status_code(e)}), retrying in {delay:.1f}s")
+            if call is not None:
+                call["retries"] += 1
+            time.sleep(delay)
+
+
+async def _attempt_async(stage, fn, call, hedge):
+    await asyncio.to_thread(_bucket.acquire)
+    start = time.monotonic()
+    delay = hedge_after(stage) if hedge and HEDGE_ENABLED else None
+    if delay is None:
+        result = await fn()
+    else:
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait([first], timeout=delay)
+        if done:
+            result = first.result()
+        else:
+            await asyncio.to_thread(_bucket.acquire)
+            if call is not None:
+                call["hedged"] = True
+            second = asyncio.ensure_future(fn())
+            done, pending = await asyncio.wait([first, second], return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            result = done.pop().result()
+    _observe(stage, time.monotonic() - start)
+    return result
+
+
+async def call_async(stage, fn, call=None, hedge=False):
+    """Like call(), for an fn that returns an awaitable; waits without blocking the event loop"""
+    breaker.before_call()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            result = await _attempt_async(stage, fn, call, hedge)
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                breaker.record_failure()
+                raise
+            delay = backoff_delay(attempt)
+            print(f"LLM {stage} failed with {type(e).__name__} (status {status_code(e)}), retrying in {delay:.1f}s")
+            if call is not None:
+                call["retries"] += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,72 @@
+import json
+import os
+
+ROUTES_PATH = os.getenv("FITIFY_MODEL_ROUTES", "data/model_routes.json")
+
+# Model, temperature and output cap per pipeline stage. Extraction-style stages run on a
+# small model at low temperature; only the full outfit keeps the large model.
+DEFAULT_ROUTES = {
+    "weather_analysis": {"model": "mistral/mistral-small-latest", "temperature": 0.2, "max_tokens": 300},
+    "filter": {"model": "mistral/mistral-small-latest", "temperature": 0.1, "max_tokens": 800},
+    "outfit": {"model": "mistral/mistral-large-latest", "temperature": 0.7, "max_tokens": 1200},
+    # A whole multi-day plan in one call, so it needs room for several outfits
+    "plan": {"model": "mistral/mistral-large-latest", "temperature": 0.7, "max_tokens": 2500},
+    "swap": {"model": "mistral/mistral-small-latest", "temperature": 0.5, "max_tokens": 600},
+    # Only explains a packing list chosen locally
+    "packing": {"model": "mistral/mistral-small-latest", "temperature": 0.4, "max_tokens": 400},
+    "image_classification": {"model": "pixtral-12b-2409", "temperature": 0.2, "max_tokens": 400},
+}
+
+# Approximate list prices in USD per million (prompt, completion) tokens, for cost estimates
+PRICES_PER_MILLION = {
+    "mistral-large-latest": (2.0, 6.0),
+    "mistral-medium-latest": (0.4, 2.0),
+    "mistral-small-latest": (0.1, 0.3),
+    "ministral-8b-latest": (0.1, 0.1),
+    "ministral-3b-latest": (0.04, 0.04),
+    "open-mistral-nemo": (0.15, 0.15),
+    "pixtral-12b-2409": (0.15, 0.15),
+    "pixtral-large-latest": (2.0, 6.0),
+}
+
+
+def load_routes(path=ROUTES_PATH):
+    """Load per-stage routes from JSON over the defaults; a file may override only some stages or fields"""
+    routes = {stage: dict(route) for stage, route in DEFAULT_ROUTES.items()}
+    try:
+        with open(path, "r") as f:
+            overrides = json.load(f)["routes"]
+        for stage, route in overrides.items():
+            routes.setdefault(stage, {}).update(route)
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, KeyError, AttributeError) as e:
+        print(f"Warning: Could not load model routes: {str(e)}")
+    return routes
+
+
+_routes = None
+
+
+def use(path):
+    """Switch every stage to the routes in another file, e.g. to benchmark alternatives"""
+    global _routes
+    _routes = load_routes(path)
+
+
+def get_route(stage):
+    """Return {model, temperature, max_tokens} for a stage, loading the routes on first use"""
+    global _routes
+    if _routes is None:
+        _routes = load_routes()
+    return dict(_routes[stage])
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call, or None for a model without a known price"""
+    if not model:
+        return None
+    prices = PRICES_PER_MILLION.get(model.split("/")[-1])
+    if prices is None:
+        return None
+    return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
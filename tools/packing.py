@@ -0,0 +1,224 @@
+"""Packing lists for trips: the fewest wardrobe items that still give a suitable outfit every day.
+
+Per slot this is a set cover with capacities. Days are grouped by temperature category, which
+is what decides whether an item suits a day, and items by the set of categories they suit. A
+small branch and bound over those groups finds the fewest items for which every day can be
+given a suitable item without wearing any more than MAX_WEARS times (Hall's condition), then
+the days are matched to the packed items. Everything runs locally, with no LLM call.
+"""
+import math
+
+from tools.heuristics import SLOTS, TEMPERATURE_ORDER, score_item
+from tools.item_slots import slot_of
+
+# Days one item can be worn on a trip before it needs washing; None means no limit
+MAX_WEARS = {"top": 2, "bottom": 3, "shoes": None}
+# Search nodes per slot before settling for the best packing found so far
+NODE_BUDGET = 20000
+
+
+def suits(item, category):
+    """Whether an item's temperature tags fit a day: its category or a neighbouring one, or no temperature tags"""
+    tags = {str(tag).lower() for tag in item.get("weather", [])} & set(TEMPERATURE_ORDER)
+    if not tags or category not in TEMPERATURE_ORDER:
+        return True
+    position = TEMPERATURE_ORDER.index(category)
+    return bool(tags & set(TEMPERATURE_ORDER[max(position - 1, 0):position + 2]))
+
+
+def _hall_ok(counts, demand, cap):
+    """Can days be matched to items so each gets one it suits and no item exceeds cap days?"""
+    bits = list(demand)
+    for subset in range(1, 1 << len(bits)):
+        covered = need = 0
+        for j, bit in enumerate(bits):
+            if subset >> j & 1:
+                covered |= bit
+                need += demand[bit]
+        if sum(count for mask, count in counts.items() if mask & covered) * cap < need:
+            return False
+    return True
+
+
+def _greedy(groups, demand, cap):
+    """Add the group covering the most unmet demand until the days can be matched; None if they never can"""
+    counts = {mask: 0 for mask, _ in groups}
+    available = dict(groups)
+    remaining = dict(demand)
+    while not _hall_ok(counts, demand, cap):
+        candidates = [mask for mask in available if counts[mask] < available[mask]]
+        if not candidates:
+            return None
+        mask = max(candidates, key=lambda m: (sum(d for bit, d in remaining.items() if m & bit), bin(m).count("1")))
+        counts[mask] += 1
+        capacity = cap
+        for bit in sorted(remaining, key=lambda b: -remaining[b]):
+            if mask & bit and capacity:
+                used = min(capacity, remaining[bit])
+                remaining[bit] -= used
+                capacity -= used
+    return counts
+
+
+def _min_counts(groups, demand, cap):
+    """Fewest items per group meeting the demand, by branch and bound seeded with the greedy answer"""
+    best = _greedy(groups, demand, cap)
+    if best is None:
+        return None
+    best_total = sum(best.values())
+    total_demand = sum(demand.values())
+    # Groups covering more categories first, so good packings are found early
+    order = sorted(groups, key=lambda group: -bin(group[0]).count("1"))
+    counts = {mask: 0 for mask, _ in groups}
+    nodes = 0
+
+    def search(index, used):
+        nonlocal best, best_total, nodes
+        nodes += 1
+        if nodes > NODE_BUDGET or used + math.ceil(max(total_demand - cap * used, 0) / cap) >= best_total:
+            return
+        if _hall_ok(counts, demand, cap):
+            best, best_total = dict(counts), used
+            return
+        if index == len(order):
+            return
+        mask, available = order[index]
+        for count in range(min(available, best_total - used - 1), -1, -1):
+            counts[mask] = count
+            search(index + 1, used + count)
+        counts[mask] = 0
+
+    search(0, 0)
+    return best
+
+
+def _assign(days, packed, cap, day_scores):
+    """Match days to suitable packed items, at most cap days each, preferring the best-scoring item"""
+    load = {item_id: [] for item_id in packed}
+
+    def place(day, seen):
+        options = sorted((item_id for item_id in packed if packed[item_id](day)), key=lambda i: -day_scores[i][day])
+        for item_id in options:
+            if item_id in seen:
+                continue
+            seen.add(item_id)
+            if len(load[item_id]) < cap:
+                load[item_id].append(day)
+                return item_id
+            # Move one of this item's days to another item to make room
+            for other in list(load[item_id]):
+                load[item_id].remove(other)
+                if place(other, seen):
+                    load[item_id].append(day)
+                    return item_id
+                load[item_id].append(other)
+        return None
+
+    for day in days:
+        place(day, set())
+    # Augmenting paths move days between items, so read the final matching from the loads
+    assignment = {day: item_id for item_id, assigned in load.items() for day in assigned}
+    return {day: assignment.get(day) for day in days}
+
+
+def _pack_slot(slot, items, days, categories):
+    """Choose and assign one slot's items; returns (packed ids, {day: item id}, wears cap, gap categories)"""
+    day_scores = {
+        item["id"]: [score_item(item, day["analysis"], day["formality"], day["activity"]) for day in days]
+        for item in items
+    }
+    # Custom bands in data/weather_rules.json can name categories outside the defaults; they sort last
+    present = sorted(set(categories), key=lambda c: (
+        TEMPERATURE_ORDER.index(c) if c in TEMPERATURE_ORDER else len(TEMPERATURE_ORDER), c
+    ))
+    bit_of = {category: 1 << j for j, category in enumerate(present)}
+    demand = {}
+    for category in categories:
+        demand[bit_of[category]] = demand.get(bit_of[category], 0) + 1
+
+    groups = {}
+    for item in items:
+        mask = sum(bit for category, bit in bit_of.items() if suits(item, category))
+        if mask:
+            groups.setdefault(mask, []).append(item)
+    # Categories nothing in the wardrobe suits can't be covered; their days take the best packed item
+    coverable = 0
+    for mask in groups:
+        coverable |= mask
+    gaps = [category for category in present if not bit_of[category] & coverable]
+    demand = {bit: need for bit, need in demand.items() if bit & coverable}
+
+    cap = MAX_WEARS.get(slot) or len(days)
+    counts = None
+    while demand:
+        counts = _min_counts([(mask, len(group)) for mask, group in groups.items()], demand, cap)
+        if counts is not None or cap >= len(days):
+            break
+        # Not enough suitable items to stay within the wear limit, so allow more rewears
+        cap += 1
+    counts = counts or {}
+
+    packed = []
+    for mask, count in counts.items():
+        # Within a group, take the items that score best over the days they suit
+        ranked = sorted(groups[mask], key=lambda item: (
+            -sum(s for day, s in enumerate(day_scores[item["id"]]) if suits(item, categories[day])), item["id"]
+        ))
+        packed.extend(item["id"] for item in ranked[:count])
+    if not packed and items:
+        packed = [max(items, key=lambda item: (sum(day_scores[item["id"]]), item["id"]))["id"]]
+
+    by_id = {item["id"]: item for item in items}
+    suitable = {item_id: (lambda day, item=by_id[item_id]: suits(item, categories[day])) for item_id in packed}
+    covered_days = [day for day in range(len(days)) if categories[day] not in gaps]
+    assignment = _assign(covered_days, suitable, cap, day_scores)
+    wears = {item_id: 0 for item_id in packed}
+    for item_id in assignment.values():
+        if item_id is not None:
+            wears[item_id] += 1
+    for day in range(len(days)):
+        if assignment.get(day) is None and packed:
+            # Gap days get the best packed item with wears left, or the least worn one
+            item_id = max(packed, key=lambda i: (wears[i] < cap, day_scores[i][day], -wears[i]))
+            assignment[day] = item_id
+            wears[item_id] += 1
+    return packed, assignment, cap, gaps
+
+
+def pack(items, days):
+    """Return the packing list and a suggested outfit per day.
+
+    days are dicts with date, analysis, formality and activity (and optionally location).
+    The result has items (every packed id), by_slot, days ([{date, location, items}]),
+    max_wears (the limit actually used per slot) and gaps (readable coverage warnings).
+    """
+    by_slot = {slot: [] for slot in SLOTS}
+    for item in items:
+        if isinstance(item, dict) and slot_of(item) in by_slot:
+            by_slot[slot_of(item)].append(item)
+    categories = [day["analysis"].get("temperature_category", "mild") for day in days]
+
+    result = {"items": [], "by_slot": {}, "days": [], "max_wears": {}, "gaps": []}
+    assignments = {}
+    for slot in SLOTS:
+        if not by_slot[slot]:
+            result["by_slot"][slot] = []
+            result["gaps"].append(f"No {slot} in the wardrobe")
+            continue
+        packed, assignment, cap, gaps = _pack_slot(slot, by_slot[slot], days, categories)
+        result["by_slot"][slot] = packed
+        result["items"].extend(packed)
+        result["max_wears"][slot] = None if cap >= len(days) else cap
+        assignments[slot] = assignment
+        if MAX_WEARS.get(slot) and cap > MAX_WEARS[slot]:
+            result["gaps"].append(f"Not enough suitable {slot} items, some are worn up to {cap} times")
+        for category in gaps:
+            result["gaps"].append(f"No {slot} suits {category} days")
+
+    for index, day in enumerate(days):
+        result["days"].append({
+            "date": day["date"],
+            "location": day.get("location"),
+            "items": [assignments[slot][index] for slot in SLOTS if slot in assignments]
+        })
+    return result
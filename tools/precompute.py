@@ -0,0 +1,102 @@
+"""Nightly precomputation of each user's outfit for the coming day.
+
+Run it from cron after midnight (the users' local time), so it computes the coming day and
+the morning rush only pays for lookups:
+
+    0 3 * * * cd /path/to/app && python -m tools.precompute
+
+A schedule before midnight should pass --days-ahead 1 instead. The dashboard's Quick Outfit
+Suggestion serves the stored outfit once, on the day it was computed for, while that day's
+forecast stays in the same weather bucket (see OutfitSuggestionCrew.precomputed_outfit).
+"""
+import argparse
+from datetime import datetime
+
+from tools.json_store import read_json, update_json, write_json
+from tools.user_store import get_store, list_user_ids
+
+
+def weather_bucket(analysis):
+    """The part of a weather analysis an outfit depends on, e.g. 'cool|rainy,windy'"""
+    return f"{analysis.get('temperature_category', 'mild')}|{','.join(sorted(analysis.get('weather_conditions', [])))}"
+
+
+def load(store):
+    return read_json(store.precomputed_path, default=dict)
+
+
+def save(store, entry):
+    write_json(store.precomputed_path, entry)
+
+
+def claim(store, date):
+    """Mark the entry for date as served; True only for the first caller, so it is shown once"""
+    claimed = []
+
+    def mark(entry):
+        if entry.get('date') == date and not entry.get('served'):
+            entry['served'] = True
+            claimed.append(True)
+    update_json(store.precomputed_path, mark, default=dict)
+    return bool(claimed)
+
+
+def precompute_user(store, day_offset=0):
+    """Compute and store one user's suggestion for day_offset days from today; returns the entry or None"""
+    from src.Wardrobe import OutfitSuggestionCrew
+
+    # The same settings (and defaults) the app's dashboard and prefetch start from
+    settings = store.load_settings()
+    location = settings['location']
+    formality = settings['preferred_formality']
+    activity = settings['preferred_activity']
+    items = read_json(store.wardrobe_path, default=lambda: {"items": []}).get("items", [])
+    if len(items) < 3:
+        return None
+
+    crew = OutfitSuggestionCrew(items, calendar_ids=settings.get('calendar_ids'), store=store)
+    response = crew.suggest_for_day(location, day_offset, formality, activity)
+    if response.get('error'):
+        print(f"Warning: No suggestion precomputed for {store.user_id or 'default user'}: {response['error']}")
+        return None
+
+    entry = {
+        'date': response['weather']['date'],
+        'request': [location, formality, activity],
+        'weather_bucket': weather_bucket(response['weather']['analysis']),
+        'created_at': datetime.now().isoformat(),
+        'response': {
+            'weather': response['weather'],
+            'suggestions': response['suggestions'],
+            'calendar_info': response['calendar_info']
+        }
+    }
+    save(store, entry)
+    return entry
+
+
+def run(user_ids=None, day_offset=0):
+    """Precompute for the given users (every user by default), one after another"""
+    done = 0
+    for user_id in (user_ids if user_ids else list_user_ids()):
+        try:
+            if precompute_user(get_store(user_id), day_offset):
+                done += 1
+        except Exception as e:
+            # One user's failure must not stop the rest of the night's batch
+            print(f"Warning: Could not precompute for {user_id or 'default user'}: {str(e)}")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute each user's outfit for the coming day")
+    parser.add_argument("--user", dest="user_ids", action="append", help="Only this user (repeatable)")
+    parser.add_argument("--days-ahead", type=int, default=0,
+                        help="Which day to precompute: 0 is today (for runs after midnight), 1 is tomorrow")
+    args = parser.parse_args()
+    done = run(args.user_ids, args.days_ahead)
+    print(f"Precomputed {done} suggestion(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Speculative background generation of the suggestion a user is most likely to ask for next."""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# Prefetches running or queued across all sessions; past this, new ones are skipped rather than queued
+MAX_PENDING = PREFETCH_WORKERS * 2
+# A prefetched suggestion older than this is treated as stale, in line with the weather cache
+MAX_AGE_SECONDS = float(os.getenv("PREFETCH_MAX_AGE_SECONDS", "600"))
+
+_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+class Prefetch:
+    """One background job for a request key. cancel() drops it if queued and signals it to stop if running."""
+
+    def __init__(self, key, future, cancelled):
+        self.key = key
+        self.future = future
+        self.cancelled = cancelled
+        self.started_at = time.monotonic()
+        self.consumed = False
+
+    def expired(self):
+        return time.monotonic() - self.started_at > MAX_AGE_SECONDS
+
+    def cancel(self):
+        self.cancelled.set()
+        self.future.cancel()
+
+    def result(self, timeout=None):
+        """The prefetched result, waiting up to timeout seconds if it is still running.
+
+        None if it was cancelled, failed or is still running after timeout; a late prefetch is
+        cancelled, so it stops at its next step instead of holding a worker.
+        """
+        if self.cancelled.is_set():
+            return None
+        try:
+            return self.future.result(timeout=timeout)
+        except FutureTimeout:
+            print(f"Warning: Prefetched suggestion not ready after {timeout:g}s, generating a new one")
+            self.cancel()
+            return None
+        except Exception as e:
+            print(f"Warning: Prefetched suggestion unavailable: {str(e)}")
+            return None
+
+
+def start(key, fn):
+    """Run fn(cancelled) in the background, or return None when too many prefetches are pending.
+
+    fn receives a threading.Event and should return early once it is set, between its
+    expensive steps, since running LLM calls can't be interrupted.
+    """
+    if not _slots.acquire(blocking=False):
+        return None
+    cancelled = threading.Event()
+
+    def run():
+        if cancelled.is_set():
+            return None
+        return fn(cancelled)
+
+    future = _pool.submit(run)
+    future.add_done_callback(lambda _: _slots.release())
+    return Prefetch(key, future, cancelled)
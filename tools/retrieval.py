@@ -0,0 +1,142 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from tools.item_slots import slot_of
+
+# Width of the hashed bag-of-words vectors
+DIM = 512
+# Item fields that describe what an item is and when it suits
+FIELDS = ('type', 'form', 'color', 'weather', 'notes')
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)?")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _item_text(item):
+    parts = []
+    for field in FIELDS:
+        value = item.get(field)
+        if isinstance(value, list):
+            parts.extend(str(v) for v in value)
+        elif value:
+            parts.append(str(value))
+    return " ".join(parts)
+
+
+def hash_vector(text, dim=DIM):
+    """Hash the tokens of a text into a unit-length count vector"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in _tokens(text):
+        # crc32 is stable across processes, unlike hash()
+        vector[zlib.crc32(token.encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ItemIndex:
+    """Hashed bag-of-words vectors for a list of wardrobe items, one row per item."""
+
+    def __init__(self, items, dim=DIM):
+        self.items = list(items)
+        self.dim = dim
+        self.slots = np.array([slot_of(item) or '' for item in self.items], dtype=object)
+        self.matrix = np.zeros((len(self.items), dim), dtype=np.float32)
+        for row, item in enumerate(self.items):
+            self.matrix[row] = hash_vector(_item_text(item), dim)
+
+    def scores(self, query):
+        """Cosine similarity of every item to the query text"""
+        if not self.items:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ hash_vector(query, self.dim)
+
+    def top_n(self, query, n, slot=None, penalties=None):
+        """Return the n items most relevant to the query, optionally limited to one slot.
+
+        penalties is an optional array subtracted from the scores, e.g. for recently worn items.
+        """
+        scores = self.scores(query)
+        if penalties is not None:
+            scores = scores - penalties
+        candidates = np.arange(len(self.items)) if slot is None else np.flatnonzero(self.slots == slot)
+        if len(candidates) <= n:
+            ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        else:
+            best = candidates[np.argpartition(-scores[candidates], n)[:n]]
+            ranked = best[np.argsort(-scores[best], kind='stable')]
+        return [self.items[i] for i in ranked]
+
+
+_index_cache = {}
+_index_lock = threading.Lock()
+_INDEX_CACHE_SIZE = 8
+
+
+def get_index(items, version=None):
+    """Return an index for the items, reusing the last few built for the same wardrobe version.
+
+    version identifies the wardrobe the items come from; they may be any subset of it (the
+    filter's matches, a plan's candidates), since the cache key also records which items they are.
+    """
+    if version is None:
+        return ItemIndex(items)
+    key = (version, tuple(item.get('id') for item in items))
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is None:
+            if len(_index_cache) >= _INDEX_CACHE_SIZE:
+                _index_cache.pop(next(iter(_index_cache)))
+            index = _index_cache[key] = ItemIndex(items)
+        return index
+
+
+def context_query(context, extra_items=()):
+    """Describe a generation context (and any pieces already chosen) as query text"""
+    weather = context.get('weather', {})
+    parts = [str(context.get('formality', '')), str(context.get('activity', ''))]
+    if isinstance(weather, dict):
+        for value in weather.values():
+            parts.extend(value if isinstance(value, list) else [value])
+    else:
+        parts.append(weather)
+    parts.extend(_item_text(item) for item in extra_items if isinstance(item, dict))
+    return " ".join(str(p) for p in parts if p)
+
+
+def prune_items(items, context, per_slot, slots=('top', 'bottom', 'shoes'), extra_items=(), version=None, wear_index=None):
+    """Keep only the per_slot items most relevant to the context for each requested slot.
+
+    With a wear_index, recently worn items are ranked lower so suggestions rotate. Pass the
+    wardrobe version the items come from so the index is built once per wardrobe and subset.
+
+    Items are returned untouched when every slot is already within the limit, so small
+    wardrobes produce exactly the same prompts as before.
+    """
+    # Bare ids carry nothing to rank on, so they are passed through as they are
+    passthrough = [item for item in items if not isinstance(item, dict)]
+    items = [item for item in items if isinstance(item, dict)]
+    item_slots = [slot_of(item) for item in items]
+    counts = {}
+    for slot in item_slots:
+        counts[slot] = counts.get(slot, 0) + 1
+    if all(counts.get(slot, 0) <= per_slot for slot in slots) and set(counts) - {None} <= set(slots):
+        return items + passthrough
+
+    # Items of no known slot (accessories, unusual types) can't compete for a slot, so keep them too
+    unknown = [item for item, slot in zip(items, item_slots) if slot is None]
+    items = [item for item, slot in zip(items, item_slots) if slot is not None]
+    index = get_index(items, version)
+    query = context_query(context, extra_items)
+    penalties = None
+    if wear_index is not None:
+        penalties = np.array([wear_index.penalty(item.get('id')) for item in index.items], dtype=np.float32)
+    pruned = []
+    for slot in slots:
+        pruned.extend(index.top_n(query, per_slot, slot=slot, penalties=penalties))
+    return pruned + unknown + passthrough
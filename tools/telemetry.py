@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from tools.model_routes import estimate_cost
+
+METRICS_PATH = os.getenv("FITIFY_METRICS_PATH", "data/metrics.jsonl")
+
+_lock = threading.Lock()
+_records = []
+_MAX_RECORDS = 5000
+
+
+def _usage_from_result(result):
+    """Pull prompt/completion token counts out of a CrewOutput or Mistral response"""
+    usage = getattr(result, "token_usage", None) or getattr(result, "usage", None)
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+class CallRecord(dict):
+    """A single LLM call measurement, filled in while the call runs"""
+
+    def set_usage(self, result):
+        prompt_tokens, completion_tokens = _usage_from_result(result)
+        self["prompt_tokens"] = prompt_tokens
+        self["completion_tokens"] = completion_tokens
+
+    def set_parsed(self, ok):
+        self["parse_ok"] = bool(ok)
+
+
+def record(entry):
+    """Append a finished call record to the in-memory buffer and the JSONL sink"""
+    with _lock:
+        _records.append(entry)
+        if len(_records) > _MAX_RECORDS:
+            del _records[: len(_records) - _MAX_RECORDS]
+        try:
+            directory = os.path.dirname(METRICS_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(METRICS_PATH, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Warning: Could not write metrics: {str(e)}")
+
+
+@contextmanager
+def track(stage, agent=None, model=None):
+    """Time an LLM call and record its latency, token usage, retries and parse outcome"""
+    call = CallRecord(
+        timestamp=datetime.now().isoformat(),
+        stage=stage,
+        agent=agent,
+        model=model,
+        prompt_tokens=None,
+        completion_tokens=None,
+        retries=0,
+        hedged=False,
+        parse_ok=None,
+        error=None,
+    )
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call["error"] = type(e).__name__
+        raise
+    finally:
+        call["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        record(dict(call))
+
+
+def load_records(path=None):
+    """Load every record from the JSONL sink, falling back to the in-memory buffer"""
+    path = path or METRICS_PATH
+    try:
+        with open(path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        with _lock:
+            return list(_records)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def stage_stats(records=None):
+    """Summarize latency percentiles and token usage per stage"""
+    if records is None:
+        records = load_records()
+
+    by_stage = {}
+    for entry in records:
+        by_stage.setdefault(entry.get("stage", "unknown"), []).append(entry)
+
+    stats = {}
+    for stage, entries in by_stage.items():
+        latencies = sorted(e["latency_ms"] for e in entries if e.get("latency_ms") is not None)
+        parsed = [e for e in entries if e.get("parse_ok") is not None]
+        stats[stage] = {
+            "calls": len(entries),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "prompt_tokens": sum(e.get("prompt_tokens") or 0 for e in entries),
+            "completion_tokens": sum(e.get("completion_tokens") or 0 for e in entries),
+            "cost_usd": round(sum(
+                estimate_cost(e.get("model"), e.get("prompt_tokens"), e.get("completion_tokens")) or 0 for e in entries
+            ), 6),
+            "retries": sum(e.get("retries") or 0 for e in entries),
+            "hedged": sum(1 for e in entries if e.get("hedged")),
+            "errors": sum(1 for e in entries if e.get("error")),
+            "parse_success_rate": (
+                sum(1 for e in parsed if e["parse_ok"]) / len(parsed) if parsed else None
+            ),
+        }
+    return stats
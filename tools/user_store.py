@@ -0,0 +1,116 @@
+import json
+import os
+import re
+import threading
+
+from tools.json_store import read_json
+
+DATA_ROOT = "data"
+USERS_ROOT = os.path.join(DATA_ROOT, "users")
+
+_USER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Settings for anything user_settings.json doesn't set; the app and the nightly precompute both use them
+DEFAULT_SETTINGS = {
+    "name": "User",
+    "laundry_cycle_days": 7,
+    "location": "Chicago, US",
+    "preferred_formality": "Casual",
+    "preferred_activity": "General"
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class UserStore:
+    """One user's shard: wardrobe, history, laundry state, settings, images and credentials.
+
+    The default user (user_id None) keeps the original single-user layout under data/,
+    wardrobe/ and token.pickle, so existing installs keep working. Every other user gets
+    data/users/<user_id>/. Each shard has its own lock, so users never wait on each other.
+    """
+
+    def __init__(self, user_id=None):
+        if user_id is not None and not _USER_ID_RE.match(user_id):
+            raise ValueError(f"Invalid user id: {user_id!r}")
+        self.user_id = user_id
+        if user_id is None:
+            self.root = DATA_ROOT
+            self.images_dir = "wardrobe"
+            self.token_path = os.getenv("GOOGLE_CALENDAR_TOKEN_PATH", "token.pickle")
+        else:
+            self.root = os.path.join(USERS_ROOT, user_id)
+            self.images_dir = os.path.join(self.root, "wardrobe")
+            self.token_path = os.path.join(self.root, "token.pickle")
+        # Guards read-modify-write cycles on this shard's files
+        self.lock = threading.RLock()
+
+    def path(self, filename):
+        return os.path.join(self.root, filename)
+
+    @property
+    def wardrobe_path(self):
+        return self.path("wardrobe.json")
+
+    @property
+    def worn_path(self):
+        return self.path("worn.json")
+
+    @property
+    def history_path(self):
+        return self.path("outfit_history.json")
+
+    @property
+    def settings_path(self):
+        return self.path("user_settings.json")
+
+    @property
+    def wear_index_path(self):
+        return self.path("wear_index.json")
+
+    @property
+    def analytics_path(self):
+        return self.path("analytics.json")
+
+    @property
+    def precomputed_path(self):
+        return self.path("precomputed.json")
+
+    def load_settings(self):
+        """The user's saved settings over DEFAULT_SETTINGS"""
+        return dict(DEFAULT_SETTINGS, **read_json(self.settings_path, default=dict))
+
+    def ensure(self):
+        """Create the shard's folders and empty data files if they don't exist yet"""
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            os.makedirs(self.images_dir, exist_ok=True)
+            for path, empty in (
+                (self.wardrobe_path, {"items": []}),
+                (self.worn_path, {"laundry": []}),
+                (self.history_path, []),
+            ):
+                if not os.path.exists(path):
+                    with open(path, "w") as f:
+                        json.dump(empty, f, indent=2)
+        return self
+
+
+def get_store(user_id=None):
+    """Return the shared store for a user, creating it once per process"""
+    with _stores_lock:
+        if user_id not in _stores:
+            _stores[user_id] = UserStore(user_id)
+        return _stores[user_id]
+
+
+def list_user_ids():
+    """Every user with data on disk: None for the default user, then each shard under data/users/"""
+    user_ids = [None]
+    if os.path.isdir(USERS_ROOT):
+        user_ids.extend(
+            name for name in sorted(os.listdir(USERS_ROOT))
+            if _USER_ID_RE.match(name) and os.path.isdir(os.path.join(USERS_ROOT, name))
+        )
+    return user_ids
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from datetime import date, datetime
+
+from tools.json_store import CorruptJSON, file_version, read_versioned, update_versioned, write_json
+from tools.user_store import get_store
+
+# Outfit log fields that hold worn item ids
+WORN_FIELDS = ("top", "pants", "shoes")
+# Items worn within this many days are penalized, most strongly when worn today
+ROTATION_DAYS = 7
+RECENCY_WEIGHT = 0.5
+# Lookups check the index file for other sessions' updates at most this often
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _apply(items, outfit_log):
+    worn_on = outfit_log.get("date")
+    for field in WORN_FIELDS:
+        item_id = outfit_log.get(field)
+        if not item_id:
+            continue
+        entry = items.setdefault(item_id, {"last_worn": None, "count": 0})
+        entry["count"] += 1
+        if worn_on and (entry["last_worn"] is None or worn_on > entry["last_worn"]):
+            entry["last_worn"] = worn_on
+
+
+class WearIndex:
+    """Per-item last-worn date and wear count, kept in step with the outfit history.
+
+    Every session and process shares the index file: updates are applied to its latest
+    contents under the file lock, and lookups reload it once another writer changed it.
+    """
+
+    def __init__(self, index_path, history_path):
+        self.index_path = index_path
+        self.history_path = history_path
+        self._lock = threading.Lock()
+        self.items = {}
+        self.history_length = 0
+        self._version = None
+        self._checked_at = 0.0
+        self._load()
+
+    def _read_index(self):
+        try:
+            return read_versioned(self.index_path, default=dict)
+        except CorruptJSON as e:
+            # The index is derived from the history, so a damaged one is simply rebuilt
+            print(f"Warning: {str(e)}, rebuilding the wear index")
+            return {}, None
+
+    def _use(self, data, version):
+        self.items = data.get("items", {})
+        self.history_length = data.get("history_length", 0)
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def _load(self):
+        data, version = self._read_index()
+        self._use(data, version)
+
+        # Rebuild once if the index is missing or out of step with the history file
+        history = self._read_history()
+        if data.get("history_length") != len(history):
+            self.rebuild(history)
+
+    def _reload_if_changed(self):
+        if time.monotonic() - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        with self._lock:
+            if file_version(self.index_path) != self._version:
+                self._use(*self._read_index())
+            else:
+                self._checked_at = time.monotonic()
+
+    def _read_history(self):
+        try:
+            with open(self.history_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def rebuild(self, history=None):
+        """Recompute the index from the full outfit history"""
+        with self._lock:
+            if history is None:
+                history = self._read_history()
+            items = {}
+            for outfit_log in history:
+                _apply(items, outfit_log)
+            data = {"items": items, "history_length": len(history)}
+            self._use(data, write_json(self.index_path, data))
+
+    def record_outfit(self, outfit_log):
+        """Update the index for one newly logged outfit, on top of other sessions' updates"""
+        def apply(data):
+            _apply(data.setdefault("items", {}), outfit_log)
+            data["history_length"] = data.get("history_length", 0) + 1
+
+        with self._lock:
+            self._use(*update_versioned(self.index_path, apply, default=dict))
+
+    def last_worn(self, item_id):
+        self._reload_if_changed()
+        entry = self.items.get(item_id)
+        return _parse_date(entry["last_worn"]) if entry and entry["last_worn"] else None
+
+    def wear_count(self, item_id):
+        self._reload_if_changed()
+        entry = self.items.get(item_id)
+        return entry["count"] if entry else 0
+
+    def days_since_worn(self, item_id, today=None):
+        worn_on = self.last_worn(item_id)
+        if worn_on is None:
+            return None
+        return ((today or date.today()) - worn_on).days
+
+    def penalty(self, item_id, today=None):
+        """Score penalty for an item: RECENCY_WEIGHT if worn today, fading to 0 after ROTATION_DAYS"""
+        days = self.days_since_worn(item_id, today)
+        if days is None or days >= ROTATION_DAYS:
+            return 0.0
+        return RECENCY_WEIGHT * (1 - max(days, 0) / ROTATION_DAYS)
+
+    def recently_worn(self, item_ids, today=None):
+        """Return {item_id: days since worn} for the given items worn within ROTATION_DAYS"""
+        recent = {}
+        for item_id in item_ids:
+            days = self.days_since_worn(item_id, today)
+            if days is not None and days < ROTATION_DAYS:
+                recent[item_id] = days
+        return recent
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_wear_index(store=None):
+    """Return the wear index for a user's shard (the default user if None), loading it on first use"""
+    store = store or get_store()
+    with _indexes_lock:
+        if store.root not in _indexes:
+            _indexes[store.root] = WearIndex(store.wear_index_path, store.history_path)
+        return _indexes[store.root]
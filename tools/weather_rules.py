@@ -0,0 +1,129 @@
+import json
+
+RULES_PATH = "data/weather_rules.json"
+
+# Temperature bands are checked in order; the first whose "below" (°F) exceeds the
+# temperature wins, and the last band has no upper bound. Condition rules match keywords
+# in the OWM description, wind rules a minimum speed (mph) and humidity rules a range (%),
+# optionally only in some temperature categories. Every matching rule adds its tag,
+# clothing recommendations and special considerations.
+DEFAULT_RULES = {
+    "temperature_bands": [
+        {"below": 32, "category": "cold", "clothing": ["insulated coat", "thermal layers", "hat and gloves"],
+         "considerations": ["freezing temperatures"]},
+        {"below": 45, "category": "cold", "clothing": ["warm coat", "sweater or fleece layer", "long pants"]},
+        {"below": 60, "category": "cool", "clothing": ["light jacket or sweater", "long pants"]},
+        {"below": 75, "category": "mild", "clothing": ["light layers"]},
+        {"below": 85, "category": "warm", "clothing": ["breathable fabrics", "short sleeves"]},
+        {"category": "hot", "clothing": ["lightweight, breathable clothing", "shorts"],
+         "considerations": ["stay hydrated"]},
+    ],
+    "conditions": [
+        {"keywords": ["thunderstorm"], "tag": "rainy", "clothing": ["rain gear", "water-resistant shoes"],
+         "considerations": ["thunderstorms, avoid long outdoor exposure"]},
+        {"keywords": ["rain", "drizzle", "shower"], "tag": "rainy", "clothing": ["rain gear", "water-resistant shoes"]},
+        {"keywords": ["snow", "sleet", "blizzard"], "tag": "snowy", "clothing": ["insulated, waterproof boots"],
+         "considerations": ["slippery surfaces"]},
+        {"keywords": ["clear", "sun"], "tag": "sunny", "clothing": ["sunglasses"],
+         "categories": ["mild", "warm", "hot"], "considerations": ["UV protection"]},
+        {"keywords": ["clear", "sun"], "tag": "sunny", "categories": ["cold", "cool"]},
+        {"keywords": ["cloud", "overcast"], "tag": "cloudy"},
+        {"keywords": ["fog", "mist", "haze"], "tag": "cloudy", "considerations": ["low visibility"]},
+    ],
+    "wind": [
+        {"min_mph": 15, "tag": "windy", "clothing": ["wind-resistant outer layer"], "considerations": ["wind resistance"]},
+        {"min_mph": 30, "considerations": ["strong gusts, skip loose layers and umbrellas"]},
+    ],
+    "humidity": [
+        {"min": 80, "categories": ["warm", "hot"], "considerations": ["high humidity, favor breathable fabrics"]},
+        {"min": 85, "categories": ["cold", "cool"], "considerations": ["damp cold, add a windproof layer"]},
+        {"max": 25, "considerations": ["dry air"]},
+    ],
+}
+
+
+def _add(values, additions):
+    for value in additions or ():
+        if value not in values:
+            values.append(value)
+
+
+class WeatherRules:
+    """Turns an OWM observation into the weather analysis structure with data-driven rules."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        # Lowercase keywords once instead of on every observation
+        self._conditions = [
+            (rule, [keyword.lower() for keyword in rule.get("keywords", [])])
+            for rule in rules.get("conditions", [])
+        ]
+
+    def temperature_band(self, temperature_f):
+        bands = self.rules["temperature_bands"]
+        for band in bands:
+            if "below" not in band or temperature_f < band["below"]:
+                return band
+        return bands[-1]
+
+    def analyze(self, raw_data):
+        """Return {temperature_category, weather_conditions, clothing_recommendations, special_considerations}"""
+        band = self.temperature_band(raw_data["temperature"])
+        category = band["category"]
+        conditions, clothing, considerations = [], [], []
+        _add(clothing, band.get("clothing"))
+        _add(considerations, band.get("considerations"))
+
+        def applies(rule):
+            return "categories" not in rule or category in rule["categories"]
+
+        description = str(raw_data.get("conditions", "")).lower()
+        for rule, keywords in self._conditions:
+            if applies(rule) and any(keyword in description for keyword in keywords):
+                _add(conditions, [rule["tag"]] if rule.get("tag") else [])
+                _add(clothing, rule.get("clothing"))
+                _add(considerations, rule.get("considerations"))
+
+        wind_speed = raw_data.get("wind_speed") or 0
+        for rule in self.rules.get("wind", []):
+            if wind_speed >= rule["min_mph"] and applies(rule):
+                _add(conditions, [rule["tag"]] if rule.get("tag") else [])
+                _add(clothing, rule.get("clothing"))
+                _add(considerations, rule.get("considerations"))
+
+        humidity = raw_data.get("humidity")
+        if humidity is not None:
+            for rule in self.rules.get("humidity", []):
+                if humidity >= rule.get("min", 0) and humidity <= rule.get("max", 100) and applies(rule):
+                    _add(clothing, rule.get("clothing"))
+                    _add(considerations, rule.get("considerations"))
+
+        return {
+            "temperature_category": category,
+            "weather_conditions": conditions,
+            "clothing_recommendations": clothing,
+            "special_considerations": considerations
+        }
+
+
+def load_rules(path=RULES_PATH):
+    """Load user rules from JSON, falling back to the defaults"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return DEFAULT_RULES
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not load weather rules: {str(e)}")
+        return DEFAULT_RULES
+
+
+_rules = None
+
+
+def get_weather_rules():
+    """Return the shared weather rules, loading them on first use"""
+    global _rules
+    if _rules is None:
+        _rules = WeatherRules(load_rules())
+    return _rules